@@ -0,0 +1,36 @@
+"""Общие зависимости FastAPI для API маршрутов."""
+import secrets
+
+from fastapi import Header, HTTPException, status
+
+from app.core.config import settings
+
+
+def verify_admin_token(
+    authorization: str | None = Header(default=None),
+    x_admin_token: str | None = Header(default=None),
+) -> None:
+    """
+    Проверка токена администратора для /admin/* эндпоинтов.
+
+    Токен передаётся как "Authorization: Bearer <token>" или "X-Admin-Token: <token>".
+
+    Raises:
+        HTTPException: 403 если Admin API выключен (ADMIN_TOKEN не задан)
+                     401 если токен не передан или неверный
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+
+    token = x_admin_token
+    if token is None and authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+
+    if not token or not secrets.compare_digest(token, settings.ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
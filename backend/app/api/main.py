@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
-from app.api.routes import check_ranger_access
+from app.api.routes import admin, check_ranger_access
 
 api_router = APIRouter()
 
@@ -11,3 +11,4 @@ def health_check():
     return JSONResponse(content={"status": "ok"})
 
 api_router.include_router(check_ranger_access.router)
+api_router.include_router(admin.router)
@@ -0,0 +1,146 @@
+"""Administrative routes of the gateway (require ADMIN_TOKEN)."""
+import logging
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app.api.deps import verify_admin_token
+from app.service.ip_whitelist import ip_whitelist
+from app.service.loop_watchdog import loop_watchdog
+from app.service.policy_loader import get_loader_stats, request_refresh
+from app.service.profiler import ProfilerBusyError, profiler
+from app.service.s3_actions import s3_action_registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(verify_admin_token)])
+
+
+@router.post("/refresh", tags=["admin"])
+async def refresh_policies(service: str | None = None) -> JSONResponse:
+    """
+    Немедленная (debounced) перезагрузка политик из Ranger.
+
+    Несколько вызовов подряд схлопываются в одну перезагрузку.
+
+    Args:
+        service: Сервис Ranger (по умолчанию - все загружаемые сервисы)
+
+    Returns:
+        202 со списком сервисов, для которых запланирована перезагрузка,
+        404 если сервис не загружается шлюзом
+    """
+    scheduled = request_refresh(service)
+    if not scheduled:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"detail": f"Unknown service {service}" if service else "Policy loader is not running"},
+        )
+
+    logger.info(f"Policy refresh requested for {scheduled}")
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"scheduled": scheduled})
+
+
+@router.get("/refresh", tags=["admin"])
+async def refresh_status() -> JSONResponse:
+    """Статистика обновления политик по сервисам (длительность, размер, результат)."""
+    return JSONResponse(content=get_loader_stats())
+
+
+@router.get("/audit", tags=["admin"])
+async def audit_status(request: Request) -> JSONResponse:
+    """Состояние очереди аудита: глубина, размеры пачек, потерянные события."""
+    return JSONResponse(content=request.app.state.audit_pipeline.get_stats())
+
+
+@router.post("/ip-whitelist/reload", tags=["admin"])
+async def reload_ip_whitelist() -> JSONResponse:
+    """
+    Перечитать IP whitelist (IP_WHITELIST_RAW и IP_WHITELIST_FILE) без перезапуска.
+
+    Returns:
+        Статистика нового whitelist, 500 если файл не прочитан (действует прежний список)
+    """
+    try:
+        stats = ip_whitelist.reload()
+    except OSError as e:
+        logger.error(f"Failed to reload IP whitelist: {e}")
+        return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"detail": str(e)})
+    return JSONResponse(content=stats)
+
+
+@router.get("/ip-whitelist", tags=["admin"])
+async def ip_whitelist_status() -> JSONResponse:
+    """Размер IP whitelist и статистика кэша разобранных адресов."""
+    return JSONResponse(content=ip_whitelist.get_stats())
+
+
+@router.get("/s3-actions", tags=["admin"])
+async def s3_actions_status() -> JSONResponse:
+    """Размер реестра S3-действий и действия из трафика, которых в нём нет."""
+    return JSONResponse(content=s3_action_registry.get_stats())
+
+
+@router.get("/loop", tags=["admin"])
+async def loop_status() -> JSONResponse:
+    """Лаг event loop'а и стеки последних зависаний."""
+    return JSONResponse(content=loop_watchdog.get_stats())
+
+
+@router.post("/profile", tags=["admin"])
+async def capture_profile(
+    seconds: float = 10,
+    mode: str = "sampling",
+    output_format: str = Query("collapsed", alias="format"),
+) -> Response:
+    """
+    Профиль event loop'а воркера за `seconds` секунд.
+
+    Args:
+        seconds: Длительность (не больше PROFILE_MAX_SECONDS)
+        mode: sampling - сэмплирование стеков (дёшево), deterministic - cProfile
+        output_format: query-параметр `format`: collapsed - стеки для flamegraph (sampling),
+                       pstats - бинарный pstats (deterministic), text - текстовый отчёт
+
+    Returns:
+        Профиль, 409 если уже идёт другая сессия, 400 при неверных параметрах
+    """
+    try:
+        data = await profiler.capture(seconds, mode, output_format)
+    except ProfilerBusyError as e:
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"detail": str(e)})
+
+    if output_format == "pstats":
+        return Response(
+            content=data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="gateway.pstats"'},
+        )
+    return PlainTextResponse(content=data)
+
+
+@router.post("/profile/slow", tags=["admin"])
+async def start_slow_profile(threshold_ms: float = 100, seconds: float = 60) -> JSONResponse:
+    """
+    Профилирование только медленных запросов.
+
+    В течение `seconds` секунд сэмплируется event loop; в профиль попадают
+    сэмплы, снятые пока выполнялся запрос дольше `threshold_ms`.
+    Результат - GET /admin/profile/slow.
+    """
+    try:
+        profiler.start_slow(threshold_ms, seconds)
+    except ProfilerBusyError as e:
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": str(e)})
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=profiler.slow_report()[0])
+
+
+@router.get("/profile/slow", tags=["admin"])
+async def slow_profile(output_format: str = Query("collapsed", alias="format")) -> Response:
+    """Стеки медленных запросов (collapsed) или состояние сессии (format=json)."""
+    status_info, stacks = profiler.slow_report()
+    if output_format == "json":
+        return JSONResponse(content=status_info)
+    return PlainTextResponse(content=stacks)
@@ -1,102 +1,237 @@
 """MinIO Gateway routes - proxy requests to MinIO with Ranger authorization."""
 import logging
-import time  # Добавляем импорт time
-from datetime import datetime
+import time
 
-from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.background import BackgroundTask
 from starlette.responses import JSONResponse
 
-from app.models.request import RequestBody
+from app.api.deps import verify_admin_token
+from app.core.config import settings
+from app.models.request import CheckRequest
+from app.service.admission import check_admission
+from app.service.audit_pipeline import AuditPipeline
 from app.service.authorizer import (
     check_authorization,
+    explain_authorization,
 )
-from app.service.constants import (
-    S3AccessType,
-)
-from app.service.ip_whitelist import is_ip_allowed
+from app.service.cache import is_authorization_cached
+from app.service.deadline import FALLBACK_DEFERRED_AUDIT, Deadline, DeadlineExceeded
+from app.service.metrics import CHECK_DECISIONS, CHECK_FALLBACKS, CHECK_STAGE_SECONDS
+from app.service.policy_conditions import ConditionContext
 from app.service.policy_parser import PolicyChecker
 from app.service.ranger_client import RangerClient
+from app.service.security_zones import resolve_zone
 from app.service.service import (
     extract_request_metadata,
     handle_access_denied,
     handle_access_granted,
 )
-from app.service.solr_logger import SolrLoggerClient
-from app.service.user_groups import get_user_groups_roles_from_ranger
+from app.service.service_router import resolve_service
+from app.service.user_groups import (
+    UserGroupsUnavailable,
+    get_user_groups_roles_from_ranger,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Готовые тела ответов: MinIO смотрит только на статус и result
+ALLOW_BODY = b'{"result":true}'
+DENY_BODY = b'{"result":false}'
 
-@router.api_route("/check", methods=["POST"], tags=["check"])
-async def check_ranger_access(
-    body: RequestBody,
-    request: Request
+
+_STAGE_HISTOGRAMS = {
+    stage: CHECK_STAGE_SECONDS.labels(stage)
+    for stage in ("extract_metadata", "admission", "get_user_groups", "check_authorization", "audit_and_response", "total")
+}
+
+
+async def _fallback_response(
+    request: Request,
+    deadline: Deadline | None,
+    username: str,
+    bucket: str,
+    object_path: str | None,
+    access_type: str,
+    reason: str,
+    allow: bool,
 ) -> Response:
+    """
+    Быстрый ответ без проверки политик: запрос сброшен admission control'ом
+    (CHECK_SHED_MODE) или исчерпан бюджет времени (CHECK_DEADLINE_DECISION).
+
+    Аудит разрешения, выданного после исчерпания бюджета, пишется уже после
+    отправки ответа (как и для обычных решений).
+    """
+    CHECK_DECISIONS.inc((reason, access_type))
+    if allow:
+        # Доступ выдан без проверки политик - такие решения всегда попадают в аудит
+        background = await _audit(
+            deadline,
+            handle_access_granted,
+            username=username,
+            bucket=bucket,
+            object_path=object_path,
+            access_type=access_type,
+            policy_id=None,
+            request=request,
+            audit_pipeline=request.app.state.audit_pipeline,
+            is_audited=True,
+        )
+        return Response(content=ALLOW_BODY, media_type="application/json", background=background)
+    return Response(content=DENY_BODY, status_code=status.HTTP_503_SERVICE_UNAVAILABLE, media_type="application/json")
+
+
+async def _audit(deadline: Deadline | None, handler, **kwargs) -> BackgroundTask | None:
+    """
+    Записать аудит решения; если бюджет запроса исчерпан - после отправки ответа.
+
+    Returns:
+        BackgroundTask для ответа, если аудит отложен
+    """
+    if deadline is not None and deadline.expired:
+        CHECK_FALLBACKS.inc(FALLBACK_DEFERRED_AUDIT)
+        return BackgroundTask(handler, **kwargs)
+    await handler(**kwargs)
+    return None
+
+
+def _stage(timings: dict[str, float] | None, name: str, started: float) -> float:
+    """Записать длительность этапа в метрики (и в ответ в режиме отладки), вернуть начало следующего."""
+    now = time.perf_counter()
+    _STAGE_HISTOGRAMS[name].observe(now - started)
+    if timings is not None:
+        timings[name] = round((now - started) * 1000, 2)
+    return now
+
+
+@router.api_route("/check", methods=["POST"], tags=["check"])
+async def check_ranger_access(request: Request) -> Response:
     """
     Проверка политик в Apache Ranger.
 
+    Тело запроса (формат RequestBody) разбирается один раз, из него берутся
+    только нужные для авторизации поля, без полной pydantic-валидации.
+
     Flow:
     1. Извлечь и валидировать метаданные запроса
+       (затем admission control: при перегрузке - быстрый ответ по CHECK_SHED_MODE)
     2. Получить группы пользователя из Ranger
     3. Проверить разрешения через Ranger
     4. Записать результат в аудит
     5. Вернуть ответ
 
     Args:
-        body: Данные запроса
         request: HTTP запрос
 
     Returns:
-        Response: 200 OK если доступ разрешен, 403 Forbidden если запрещен
+        Response: 200 {"result": true} если доступ разрешен,
+                  403 {"result": false} если запрещен,
+                  503 {"result": false} если запрос сброшен при перегрузке (CHECK_SHED_MODE=closed)
+                  или группы не получены за бюджет CHECK_DEADLINE_MS (CHECK_DEADLINE_DECISION=deny),
+                  или Ranger недоступен, а прежние группы пользователя неизвестны.
+                  С CHECK_DEBUG_RESPONSE в ответ добавляются тайминги этапов и детали отказа.
 
     Raises:
-        HTTPException: 400 если отсутствуют обязательные поля
-                     403 если доступ запрещен политикой
+        HTTPException: 400 если тело некорректно или отсутствуют обязательные поля
     """
-    start_time = time.time()
-    timings = {}  # Словарь для хранения времени выполнения этапов
+    start_time = time.perf_counter()
+    # Словарь для хранения времени выполнения этапов (только в режиме отладки)
+    timings: dict[str, float] | None = {} if settings.CHECK_DEBUG_RESPONSE else None
+
+    # Проверка IP по whitelist - в IPWhitelistMiddleware (IP_WHITELIST_ENABLED), до чтения тела
 
-    # client_ip = request.client.host
-    # if not is_ip_allowed(client_ip):
-    #     raise HTTPException(
-    #         status_code=403,
-    #         detail=f"Access denied from IP {client_ip}. IP is not in whitelist."
-    #     )
+    deadline = Deadline(settings.CHECK_DEADLINE_MS / 1000, start_time) if settings.CHECK_DEADLINE_MS else None
 
+    admitted = False
     try:
         # Этап 1: Извлечение метаданных
-        stage_start = time.time()
-        username, bucket, object_path, access_type = extract_request_metadata(
-            body,
+        body = CheckRequest.parse(await request.body())
+        username, bucket, object_path, access_type = extract_request_metadata(body)
+        stage_start = _stage(timings, "extract_metadata", start_time)
+
+        if access_type is None:
+            # Действие не из реестра S3 (S3_UNMAPPED_ACTION_ACCESS=deny): отказ без проверки политик
+            await handle_access_denied(
+                username=username,
+                bucket=bucket,
+                object_path=object_path,
+                access_type=body.action,
+                policy_id=None,
+                request=request,
+                audit_pipeline=request.app.state.audit_pipeline,
+                is_audited=True,
+            )
+            CHECK_DECISIONS.inc(("denied", "unmapped"))
+            return Response(content=DENY_BODY, status_code=status.HTTP_403_FORBIDDEN, media_type="application/json")
+
+        # Admission control: при перегрузке запрос ждет слот не дольше бюджета или сбрасывается
+        admitted = await check_admission.acquire(
+            lambda: is_authorization_cached(
+                resolve_service(bucket), username, bucket, object_path, access_type.value,
+                ConditionContext(body.conditions),
+            ),
+            deadline.remaining() if deadline is not None else None,
         )
-        timings["extract_metadata"] = round((time.time() - stage_start) * 1000, 2)  # мс
+        if not admitted:
+            return await _fallback_response(
+                request, deadline, username, bucket, object_path, access_type.value, "shed", check_admission.fail_open
+            )
+        stage_start = _stage(timings, "admission", stage_start)
 
         logger.debug(
-            f"Processing request: user={username}, bucket={bucket}, "
-            f"object={object_path}, access={access_type.value}"
+            "Processing request: user=%s, bucket=%s, object=%s, access=%s",
+            username, bucket, object_path, access_type.value,
         )
 
         ranger_client: RangerClient = request.app.state.ranger_client
-        solr_logger: SolrLoggerClient = request.app.state.solr_logger
+        audit_pipeline: AuditPipeline = request.app.state.audit_pipeline
 
-        # Этап 2: Получение групп пользователя из Ranger
-        stage_start = time.time()
-        user_groups, user_roles = await get_user_groups_roles_from_ranger(ranger_client, username)
-        timings["get_user_groups"] = round((time.time() - stage_start) * 1000, 2)  # мс
+        # Этап 2: Получение групп пользователя из Ranger (с дедлайном - не дольше остатка бюджета)
+        try:
+            user_groups, user_roles = await get_user_groups_roles_from_ranger(ranger_client, username, deadline)
+        except DeadlineExceeded:
+            logger.debug("Deadline exceeded resolving groups of %s, default decision", username)
+            return await _fallback_response(
+                request, deadline, username, bucket, object_path, access_type.value,
+                "deadline", settings.CHECK_DEADLINE_DECISION == "allow",
+            )
+        except UserGroupsUnavailable as e:
+            # Ranger недоступен и групп пользователя не знаем - без них решение принять нельзя
+            logger.warning("%s, denying", e)
+            return await _fallback_response(
+                request, deadline, username, bucket, object_path, access_type.value, "unavailable", False
+            )
+        stage_start = _stage(timings, "get_user_groups", stage_start)
 
-        logger.debug(f"Groups for {username}: {user_groups}")
+        logger.debug("Groups for %s: %s", username, user_groups)
+        # Security zone ресурса - для поля zone аудита (индекс зон мемоизирован по бакету)
+        zone = resolve_zone(resolve_service(bucket), bucket, object_path)
 
-        # Проверка на админа
-        if access_type == S3AccessType.ADMIN or PolicyChecker.is_admin(user_roles):
-            total_time = round((time.time() - start_time) * 1000, 2)
-            timings["total"] = total_time
-            logger.info(f"Admin access granted in {total_time}ms")
-            return JSONResponse(content={"result": True})
+        # Проверка на админа (admin-действия остальных пользователей проверяются по политикам)
+        if PolicyChecker.is_admin(user_roles):
+            # Политики Ranger не проверялись - аудит только если его явно требуют AUDIT_RULES
+            background = await _audit(
+                deadline,
+                handle_access_granted,
+                username=username,
+                bucket=bucket,
+                object_path=object_path,
+                access_type=access_type.value,
+                policy_id=None,
+                request=request,
+                audit_pipeline=audit_pipeline,
+                is_audited=False,
+                zone=zone,
+            )
+            CHECK_DECISIONS.inc(("allowed", access_type.value))
+            _stage(None, "total", start_time)
+            logger.debug("Admin access granted in %.2fms", (time.perf_counter() - start_time) * 1000)
+            return Response(content=ALLOW_BODY, media_type="application/json", background=background)
 
         # Этап 3: Проверка авторизации в Ranger
-        stage_start = time.time()
         is_allowed, is_audited, policy_id = await check_authorization(
             user=username,
             bucket=bucket,
@@ -104,94 +239,165 @@ async def check_ranger_access(
             access_type=access_type.value,
             user_groups=user_groups,
             user_roles=user_roles,
+            conditions=body.conditions,
         )
-        timings["check_authorization"] = round((time.time() - stage_start) * 1000, 2)  # мс
+        stage_start = _stage(timings, "check_authorization", stage_start)
 
         # Этап 4: Обработка результата и аудит
-        stage_start = time.time()
         if not is_allowed:
-            await handle_access_denied(
+            background = await _audit(
+                deadline,
+                handle_access_denied,
                 username=username,
                 bucket=bucket,
                 object_path=object_path,
                 access_type=access_type.value,
                 policy_id=policy_id,
                 request=request,
-                solr_logger=solr_logger
+                audit_pipeline=audit_pipeline,
+                is_audited=is_audited,
+                zone=zone,
             )
-            # Прерываем выполнение если доступ запрещен
-            timings["audit_and_response"] = round((time.time() - stage_start) * 1000, 2)
-            total_time = round((time.time() - start_time) * 1000, 2)
-            timings["total"] = total_time
+            _stage(timings, "audit_and_response", stage_start)
+            _stage(None, "total", start_time)
+            CHECK_DECISIONS.inc(("denied", access_type.value))
+            total_time = round((time.perf_counter() - start_time) * 1000, 2)
+            logger.debug("Access DENIED for %s@%s/%s in %sms", username, bucket, object_path, total_time)
 
-            # Логируем подробные тайминги для запрещенных запросов
-            logger.warning(
-                f"Access DENIED for {username}@{bucket}/{object_path} "
-                f"in {total_time}ms. Timings: {timings}"
-            )
-
-            raise HTTPException(
-                status_code=403,
-                detail={
+            if timings is None:
+                return Response(
+                    content=DENY_BODY,
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    media_type="application/json",
+                    background=background,
+                )
+            timings["total"] = total_time
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={
+                    "result": False,
                     "error": "Access denied",
                     "user": username,
                     "resource": f"{bucket}/{object_path}" if object_path else bucket,
                     "action": access_type.value,
                     "policy_id": policy_id,
-                    "timings_ms": timings  # Добавляем тайминги в ответ
-                }
+                    "timings_ms": timings,
+                },
+                background=background,
             )
 
         # Если доступ разрешен - логируем успех
-        await handle_access_granted(
+        background = await _audit(
+            deadline,
+            handle_access_granted,
             username=username,
             bucket=bucket,
             object_path=object_path,
             access_type=access_type.value,
             policy_id=policy_id,
             request=request,
-            solr_logger=solr_logger
+            audit_pipeline=audit_pipeline,
+            is_audited=is_audited,
+            zone=zone,
         )
-        timings["audit_and_response"] = round((time.time() - stage_start) * 1000, 2)
+        _stage(timings, "audit_and_response", stage_start)
+        _stage(None, "total", start_time)
+        CHECK_DECISIONS.inc(("allowed", access_type.value))
 
         # Итоговое время
-        total_time = round((time.time() - start_time) * 1000, 2)
-        timings["total"] = total_time
+        total_time = round((time.perf_counter() - start_time) * 1000, 2)
 
-        # Логируем результат с таймингами
+        # Логируем результат
         if total_time > 100:  # Если больше 100ms - логируем как warning
-            logger.warning(
-                f"SLOW request for {username}@{bucket}/{object_path} "
-                f"in {total_time}ms. Timings: {timings}"
-            )
+            # Тайминги этапов - в гистограммах gateway_check_stage_seconds (и в ответе с CHECK_DEBUG_RESPONSE)
+            logger.warning("SLOW request for %s@%s/%s in %sms", username, bucket, object_path, total_time)
         else:
-            logger.info(
-                f"Access GRANTED for {username}@{bucket}/{object_path} "
-                f"in {total_time}ms. Timings: {timings}"
-            )
+            logger.debug("Access GRANTED for %s@%s/%s in %sms", username, bucket, object_path, total_time)
 
+        if timings is None:
+            return Response(content=ALLOW_BODY, media_type="application/json", background=background)
+        timings["total"] = total_time
         return JSONResponse(content={
             "result": True,
             "timings_ms": timings  # Возвращаем тайминги в ответ для отладки
-        })
-
-    except HTTPException as e:
-        # Если это наш HTTPException - добавляем тайминги
-        total_time = round((time.time() - start_time) * 1000, 2)
-        if e.status_code == 403:
-            logger.warning(f"HTTPException 403 after {total_time}ms: {e.detail}")
-        raise e
+        }, background=background)
+
+    except HTTPException:
+        raise
     except ValueError as e:
-        total_time = round((time.time() - start_time) * 1000, 2)
-        logger.error(f"Validation error after {total_time}ms: {e}")
+        total_time = round((time.perf_counter() - start_time) * 1000, 2)
+        logger.error("Validation error after %sms: %s", total_time, e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
     except Exception as e:
-        total_time = round((time.time() - start_time) * 1000, 2)
-        logger.exception(f"Unexpected error after {total_time}ms during authorization check: {e}")
+        total_time = round((time.perf_counter() - start_time) * 1000, 2)
+        logger.exception("Unexpected error after %sms during authorization check: %s", total_time, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
-        )
\ No newline at end of file
+        )
+    finally:
+        if admitted:
+            check_admission.release()
+
+
+@router.post("/check/explain", tags=["check"], dependencies=[Depends(verify_admin_token)])
+async def explain_ranger_access(request: Request) -> JSONResponse:
+    """
+    Объяснение решения /check (требует ADMIN_TOKEN).
+
+    Принимает то же тело, что и /check, и заново проверяет политики с
+    трассировкой: какие политики просмотрены, совпали ли bucket/object,
+    какие элементы политики совпали по пользователю/группам и какие
+    access-проверки выполнены. Кэш авторизации и аудит не используются,
+    поэтому /check при этом не платит за трассировку.
+
+    Args:
+        request: HTTP запрос
+
+    Returns:
+        JSONResponse: решение, группы/роли пользователя и трассировка
+
+    Raises:
+        HTTPException: 400 если тело некорректно, 503 если группы пользователя не получены из Ranger
+    """
+    try:
+        body = CheckRequest.parse(await request.body())
+        username, bucket, object_path, access_type = extract_request_metadata(body)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    ranger_client: RangerClient = request.app.state.ranger_client
+    try:
+        user_groups, user_roles = await get_user_groups_roles_from_ranger(ranger_client, username)
+    except UserGroupsUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    explanation = {
+        "user": username,
+        "groups": user_groups,
+        "roles": user_roles,
+        "resource": f"{bucket}/{object_path}" if object_path else bucket,
+        "action": body.action,
+        "access": access_type.value if access_type is not None else None,
+    }
+    if access_type is None:
+        explanation.update(result=False, reason="unmapped_action", trace=[])
+        return JSONResponse(content=explanation)
+    if PolicyChecker.is_admin(user_roles):
+        # /check разрешает такие запросы без проверки политик
+        explanation.update(result=True, reason="admin", trace=[])
+        return JSONResponse(content=explanation)
+
+    explanation.update(explain_authorization(
+        user=username,
+        bucket=bucket,
+        object_path=object_path,
+        access_type=access_type.value,
+        user_groups=user_groups,
+        user_roles=user_roles,
+        conditions=body.conditions,
+    ))
+    return JSONResponse(content=explanation)
@@ -0,0 +1,64 @@
+"""Prometheus metrics endpoint."""
+import time
+
+from fastapi import APIRouter, Request
+from starlette.responses import Response
+
+from app.service.admission import check_admission
+from app.service.cache import get_cache_stats
+from app.service.metrics import (
+    AUDIT_PIPELINE,
+    AUDIT_SINK,
+    CACHE_ENTRIES,
+    CHECK_IN_FLIGHT,
+    POLICY_AGE_SECONDS,
+    POLICY_COUNT,
+    render_metrics,
+)
+from app.service.policy_loader import get_loader_stats
+from app.service.user_groups import get_user_groups_cache_stats
+
+router = APIRouter()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _number(value) -> float | None:
+    if isinstance(value, bool):
+        return int(value)
+    return value if isinstance(value, int | float) else None
+
+
+def _collect_gauges(request: Request) -> None:
+    """Заполнить gauge-метрики из уже существующей статистики сервисов."""
+    now = time.time()
+    for service, stats in get_loader_stats().items():
+        if "policy_count" in stats:
+            POLICY_COUNT.set((service,), stats["policy_count"])
+        if "last_success_at" in stats:
+            POLICY_AGE_SECONDS.set((service,), round(now - stats["last_success_at"], 3))
+
+    CHECK_IN_FLIGHT.set(("running",), check_admission.in_flight)
+    CHECK_IN_FLIGHT.set(("waiting",), check_admission.queued)
+
+    CACHE_ENTRIES.set(("authorization",), get_cache_stats()["authorization_cache_size"])
+    CACHE_ENTRIES.set(("user_groups",), get_user_groups_cache_stats()["size"])
+
+    audit_pipeline = getattr(request.app.state, "audit_pipeline", None)
+    if audit_pipeline is None:
+        return
+    pipeline_stats = audit_pipeline.get_stats()
+    for sink, sink_stats in pipeline_stats.pop("sinks").items():
+        for stat, value in sink_stats.items():
+            if (number := _number(value)) is not None:
+                AUDIT_SINK.set((sink, stat), number)
+    for stat, value in pipeline_stats.items():
+        if (number := _number(value)) is not None:
+            AUDIT_PIPELINE.set((stat,), number)
+
+
+@router.get("/metrics", tags=["metrics"])
+async def metrics(request: Request) -> Response:
+    """Метрики шлюза в текстовом формате Prometheus."""
+    _collect_gauges(request)
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
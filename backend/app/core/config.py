@@ -19,12 +19,106 @@ class Settings(BaseSettings):
     RANGER_SERVICE_NAME: str = os.getenv("RANGER_SERVICE_NAME", "minio-service")
     RANGER_SERVICEDEF_NAME: str = os.getenv("RANGER_SERVICEDEF_NAME", "minio-service-def")
     RANGER_CACHE_TTL: int = os.getenv("RANGER_CACHE_TTL", 300)
+    # Пагинация загрузки политик (200 - ranger.db.maxrows.default на стороне Ranger)
+    RANGER_POLICY_PAGE_SIZE: int = os.getenv("RANGER_POLICY_PAGE_SIZE", 200)
+    RANGER_POLICY_FETCH_CONCURRENCY: int = os.getenv("RANGER_POLICY_FETCH_CONCURRENCY", 4)
+    # Дополнительные сервисы Ranger через запятую: "minio-analytics,minio-logs"
+    RANGER_SERVICE_NAMES_RAW: str | None = None
+    # Маршрутизация бакетов по сервисам: "analytics=minio-analytics,logs-*=minio-logs"
+    # ("*" в конце - префикс бакета), остальные бакеты идут в RANGER_SERVICE_NAME
+    RANGER_SERVICE_ROUTES_RAW: str | None = None
+    # Планировщик обновления политик
+    RANGER_REFRESH_JITTER: float = os.getenv("RANGER_REFRESH_JITTER", 0.1)  # +-10% к интервалу
+    RANGER_REFRESH_MAX_BACKOFF: int = os.getenv("RANGER_REFRESH_MAX_BACKOFF", 900)
+    RANGER_REFRESH_MIN_INTERVAL: float = os.getenv("RANGER_REFRESH_MIN_INTERVAL", 5)
+    RANGER_REFRESH_DEBOUNCE: float = os.getenv("RANGER_REFRESH_DEBOUNCE", 1)
+    # Security zones: запрос проверяется только по политикам зоны своего ресурса
+    # (выключено - по всем политикам сервиса; включено, но зоны не загрузились - обновление политик не применяется)
+    RANGER_SECURITY_ZONES_ENABLED: bool = os.getenv("RANGER_SECURITY_ZONES_ENABLED", False)
     IP_WHITELIST_RAW: str | None = None
+    # Файл whitelist (адрес или CIDR в строке), перечитывается через POST /admin/ip-whitelist/reload
+    IP_WHITELIST_FILE: str | None = os.getenv("IP_WHITELIST_FILE")
+    # Проверка IP в ASGI middleware (до чтения тела) для путей с этим префиксом
+    IP_WHITELIST_ENABLED: bool = os.getenv("IP_WHITELIST_ENABLED", False)
+    IP_WHITELIST_PATH_PREFIX: str = os.getenv("IP_WHITELIST_PATH_PREFIX", "/api/v1/check")
 
     # --- Solr
     SOLR_AUDIT_URL: str = os.getenv("SOLR_AUDIT_URL", "http://ranger-solr:8983/solr/ranger_audits")
+    SOLR_COMMIT_WITHIN_MS: int = os.getenv("SOLR_COMMIT_WITHIN_MS", 5000)
+    # Несколько узлов Solr через запятую (если не задано - используется SOLR_AUDIT_URL)
+    SOLR_AUDIT_URLS_RAW: str | None = os.getenv("SOLR_AUDIT_URLS_RAW")
+    SOLR_NODE_COOLDOWN: float = os.getenv("SOLR_NODE_COOLDOWN", 10.0)  # секунды исключения упавшего узла
+    SOLR_MAX_CONNECTIONS: int = os.getenv("SOLR_MAX_CONNECTIONS", 20)
+    SOLR_MAX_KEEPALIVE: int = os.getenv("SOLR_MAX_KEEPALIVE", 10)
+    SOLR_KEEPALIVE_EXPIRY: float = os.getenv("SOLR_KEEPALIVE_EXPIRY", 30.0)
+    # Таймаут запроса к одному узлу; не больше трети AUDIT_SINK_TIMEOUT, чтобы зависший узел
+    # успевал упасть по таймауту httpx и пачка ушла на другой узел до отмены отправки
+    SOLR_TIMEOUT: float = os.getenv("SOLR_TIMEOUT", 0.6)
+    SOLR_CONNECT_TIMEOUT: float = os.getenv("SOLR_CONNECT_TIMEOUT", 0.5)  # быстрый переход на другой узел
+    # gzip тела пачки (Solr/Jetty должен принимать Content-Encoding: gzip)
+    SOLR_GZIP: bool = os.getenv("SOLR_GZIP", False)
+    SOLR_GZIP_MIN_BYTES: int = os.getenv("SOLR_GZIP_MIN_BYTES", 4096)
+
+    # --- Audit pipeline (фоновая отправка аудита пачками)
+    AUDIT_QUEUE_MAXSIZE: int = os.getenv("AUDIT_QUEUE_MAXSIZE", 10000)
+    AUDIT_BATCH_SIZE: int = os.getenv("AUDIT_BATCH_SIZE", 500)
+    AUDIT_FLUSH_INTERVAL: float = os.getenv("AUDIT_FLUSH_INTERVAL", 1.0)  # секунды
+    AUDIT_DRAIN_TIMEOUT: float = os.getenv("AUDIT_DRAIN_TIMEOUT", 10.0)  # секунды на shutdown
+    # Сводка одинаковых событий (user, prefix, access, result, policy) за окно, 0 - выключено
+    AUDIT_SUMMARY_WINDOW: float = os.getenv("AUDIT_SUMMARY_WINDOW", 0)  # секунды
+    AUDIT_SUMMARY_MAX_KEYS: int = os.getenv("AUDIT_SUMMARY_MAX_KEYS", 10000)
+    # Правила аудита (JSON-список, первое совпавшее правило решает, иначе - isAuditEnabled политики):
+    # [{"result": "denied", "audit": true}, {"access": ["read"], "bucket": ["logs-*"], "sample": 0.05}]
+    AUDIT_RULES: str | None = os.getenv("AUDIT_RULES", '[{"result": "denied", "audit": true}]')
+    AUDIT_SINK_TIMEOUT: float = os.getenv("AUDIT_SINK_TIMEOUT", 2.0)  # дольше - Solr считается медленным
+
+    # --- Локальный spool аудита на время недоступности Solr (выключен, если каталог не задан)
+    AUDIT_SPOOL_DIR: str | None = os.getenv("AUDIT_SPOOL_DIR")
+    AUDIT_SPOOL_SEGMENT_BYTES: int = os.getenv("AUDIT_SPOOL_SEGMENT_BYTES", 16 * 1024 * 1024)
+    AUDIT_SPOOL_MAX_BYTES: int = os.getenv("AUDIT_SPOOL_MAX_BYTES", 1024 * 1024 * 1024)
+    AUDIT_SPOOL_FSYNC: bool = os.getenv("AUDIT_SPOOL_FSYNC", True)
+    AUDIT_SPOOL_REPLAY_INTERVAL: float = os.getenv("AUDIT_SPOOL_REPLAY_INTERVAL", 5.0)
+
+    # --- Получатели аудита через запятую: solr, jsonl, parquet
+    AUDIT_SINKS: str = os.getenv("AUDIT_SINKS", "solr")
+    AUDIT_FILE_DIR: str = os.getenv("AUDIT_FILE_DIR", "/var/lib/minio-ranger-gateway/audit")
+    AUDIT_FILE_MAX_BYTES: int = os.getenv("AUDIT_FILE_MAX_BYTES", 64 * 1024 * 1024)  # сжатый размер jsonl-файла
+    AUDIT_FILE_ROTATE_SECONDS: float = os.getenv("AUDIT_FILE_ROTATE_SECONDS", 3600)
+    AUDIT_FILE_MAX_FILES: int = os.getenv("AUDIT_FILE_MAX_FILES", 168)  # на каждый файловый sink
+    AUDIT_COLUMNAR_ROWS: int = os.getenv("AUDIT_COLUMNAR_ROWS", 100000)  # строк в одном parquet-файле
 
     API_HOST: str = os.getenv("API_HOST", "localhost")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")  # DEBUG | INFO | WARNING | ERROR
+    # Access-лог HTTP-запросов: off | errors | slow | sampled | all
+    ACCESS_LOG_MODE: str = os.getenv("ACCESS_LOG_MODE", "errors")
+    ACCESS_LOG_SLOW_MS: float = os.getenv("ACCESS_LOG_SLOW_MS", 100)  # порог для режима slow
+    ACCESS_LOG_SAMPLE_RATE: float = os.getenv("ACCESS_LOG_SAMPLE_RATE", 0.01)  # доля для режима sampled
+    # Подробные ответы /check (тайминги этапов, детали отказа) - только для отладки
+    CHECK_DEBUG_RESPONSE: bool = os.getenv("CHECK_DEBUG_RESPONSE", False)
+    # Admission control для /check: лимит одновременно обрабатываемых запросов (0 - без лимита)
+    CHECK_MAX_IN_FLIGHT: int = os.getenv("CHECK_MAX_IN_FLIGHT", 256)
+    CHECK_MAX_QUEUED: int = os.getenv("CHECK_MAX_QUEUED", 1024)  # сверх этого - сброс без ожидания
+    CHECK_QUEUE_TIMEOUT_MS: float = os.getenv("CHECK_QUEUE_TIMEOUT_MS", 50)  # бюджет ожидания в очереди
+    # Ответ на сброшенный запрос: closed - 503 {"result":false}, open - 200 {"result":true}
+    CHECK_SHED_MODE: str = os.getenv("CHECK_SHED_MODE", "closed")
+    # Бюджет времени на один /check (0 - без дедлайна); при исчерпании - устаревшие группы,
+    # отложенный аудит или решение по умолчанию CHECK_DEADLINE_DECISION (deny - 503, allow - 200)
+    CHECK_DEADLINE_MS: float = os.getenv("CHECK_DEADLINE_MS", 0)
+    CHECK_DEADLINE_DECISION: str = os.getenv("CHECK_DEADLINE_DECISION", "deny")
+    # Таблица S3-действий (по умолчанию app/service/s3_actions.json)
+    S3_ACTIONS_FILE: str | None = os.getenv("S3_ACTIONS_FILE")
+    # Действие не из таблицы: deny - отказ, либо тип доступа (read, write, ..., admin - прежнее поведение)
+    S3_UNMAPPED_ACTION_ACCESS: str = os.getenv("S3_UNMAPPED_ACTION_ACCESS", "deny")
+
+    # --- Admin API (/admin/*), выключен если токен не задан
+    ADMIN_TOKEN: str | None = os.getenv("ADMIN_TOKEN")
+    # Сторож event loop'а: лаг - в метриках, стек блокирующего кода - в лог при зависании дольше порога
+    LOOP_WATCHDOG_ENABLED: bool = os.getenv("LOOP_WATCHDOG_ENABLED", True)
+    LOOP_WATCHDOG_INTERVAL: float = os.getenv("LOOP_WATCHDOG_INTERVAL", 0.1)  # секунды
+    LOOP_STALL_THRESHOLD_MS: float = os.getenv("LOOP_STALL_THRESHOLD_MS", 100)
+    # Профилирование через /admin/profile
+    PROFILE_MAX_SECONDS: float = os.getenv("PROFILE_MAX_SECONDS", 60)
+    PROFILE_SAMPLE_INTERVAL_MS: float = os.getenv("PROFILE_SAMPLE_INTERVAL_MS", 5)
 
     @computed_field
     @property
@@ -34,5 +128,43 @@ class Settings(BaseSettings):
             return []
         return [ip.strip() for ip in self.IP_WHITELIST_RAW.split(",") if ip.strip()]
 
+    @computed_field
+    @property
+    def RANGER_SERVICE_ROUTES(self) -> dict[str, str]:
+        """Вычисляемое поле: парсит маршруты bucket/prefix* -> сервис Ranger"""
+        if not self.RANGER_SERVICE_ROUTES_RAW:
+            return {}
+        routes = {}
+        for route in self.RANGER_SERVICE_ROUTES_RAW.split(","):
+            pattern, sep, service = route.partition("=")
+            if sep and pattern.strip() and service.strip():
+                routes[pattern.strip()] = service.strip()
+        return routes
+
+    @computed_field
+    @property
+    def RANGER_SERVICE_NAMES(self) -> list[str]:
+        """Вычисляемое поле: все сервисы Ranger, политики которых загружаются"""
+        names = [self.RANGER_SERVICE_NAME]
+        if self.RANGER_SERVICE_NAMES_RAW:
+            names += [name.strip() for name in self.RANGER_SERVICE_NAMES_RAW.split(",") if name.strip()]
+        names += self.RANGER_SERVICE_ROUTES.values()
+        return list(dict.fromkeys(names))
+
+    @computed_field
+    @property
+    def SOLR_AUDIT_URLS(self) -> list[str]:
+        """Вычисляемое поле: узлы Solr для отправки аудита"""
+        if not self.SOLR_AUDIT_URLS_RAW:
+            return [self.SOLR_AUDIT_URL]
+        return [url.strip() for url in self.SOLR_AUDIT_URLS_RAW.split(",") if url.strip()]
+
+    @computed_field
+    @property
+    def AUDIT_SINK_NAMES(self) -> list[str]:
+        """Вычисляемое поле: включённые получатели аудита"""
+        names = [name.strip().lower() for name in self.AUDIT_SINKS.split(",") if name.strip()]
+        return list(dict.fromkeys(names))
+
 
 settings = Settings()  # type: ignore
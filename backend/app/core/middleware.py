@@ -0,0 +1,132 @@
+"""ASGI middleware приложения."""
+import logging
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.service.ip_whitelist import ip_whitelist
+from app.service.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+ACCESS_LOG_MODES = ("off", "errors", "slow", "sampled", "all")
+
+
+class AccessLogMiddleware:
+    """
+    Чистый ASGI middleware: время обработки и access-лог.
+
+    Добавляет заголовок X-Process-Time и пишет одну строку лога на запрос
+    в зависимости от режима:
+        off - не логировать
+        errors - только 5xx и исключения
+        slow - ошибки и запросы дольше slow_ms
+        sampled - ошибки и доля sample_rate остальных запросов
+        all - все запросы
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        mode: str = settings.ACCESS_LOG_MODE,
+        slow_ms: float = settings.ACCESS_LOG_SLOW_MS,
+        sample_rate: float = settings.ACCESS_LOG_SAMPLE_RATE,
+    ):
+        if mode not in ACCESS_LOG_MODES:
+            logger.error(f"Unknown ACCESS_LOG_MODE {mode!r}, using 'errors'")
+            mode = "errors"
+        self.app = app
+        self.mode = mode
+        self.slow_ns = int(slow_ms * 1_000_000)
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter_ns() - start
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-process-time", b"%.3fs" % (elapsed / 1e9)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            elapsed = time.perf_counter_ns() - start
+            if self.mode != "off":
+                logger.error(
+                    "✗ %s %s ERROR (%.1fms) from %s: %s",
+                    scope["method"], scope["path"], elapsed / 1e6, _client_host(scope), e,
+                )
+            raise
+
+        finished = time.perf_counter_ns()
+        if profiler.slow_active:
+            profiler.observe_request(start / 1e9, finished / 1e9)
+        elapsed = finished - start
+        if self._should_log(status_code, elapsed):
+            logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                "%s %s %d (%.1fms) from %s",
+                scope["method"], scope["path"], status_code, elapsed / 1e6, _client_host(scope),
+            )
+
+    def _should_log(self, status_code: int, elapsed_ns: int) -> bool:
+        mode = self.mode
+        if mode == "off":
+            return False
+        if mode == "all" or status_code >= 500:
+            return True
+        if mode == "slow":
+            return elapsed_ns >= self.slow_ns
+        if mode == "sampled":
+            return random.random() < self.sample_rate
+        return False
+
+
+class IPWhitelistMiddleware:
+    """
+    Чистый ASGI middleware: отклоняет запросы с IP не из whitelist.
+
+    Проверяются только пути с префиксом path_prefix; ответ 403 отдаётся
+    до чтения тела запроса и до роутинга.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str = settings.IP_WHITELIST_PATH_PREFIX):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = _client_host(scope)
+        if ip_whitelist.is_allowed(client_ip):
+            await self.app(scope, receive, send)
+            return
+
+        logger.info("Rejected %s %s from IP %s: not in whitelist", scope["method"], scope["path"], client_ip)
+        body = b'{"detail":"Access denied from IP %s. IP is not in whitelist."}' % client_ip.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 403,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", b"%d" % len(body))],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def _client_host(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
@@ -3,31 +3,47 @@
 Организует запуск, подключение внешних клиентов и регистрацию API маршрутов.
 """
 import logging
-import time
+import queue
 from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 
 import colorlog
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from app.api.main import api_router
-from app.api.routes import check_ranger_access
+from app.api.routes import check_ranger_access, metrics
 from app.core.config import settings
+from app.core.middleware import AccessLogMiddleware, IPWhitelistMiddleware
+from app.service.audit_pipeline import AuditPipeline
+from app.service.audit_sinks import SolrAuditSink, create_audit_sinks
+from app.service.audit_spool import AuditSpool
+from app.service.audit_summarizer import AuditSummarizer
+from app.service.ip_whitelist import ip_whitelist
+from app.service.loop_watchdog import loop_watchdog
 from app.service.policy_loader import (
     start_policy_loader,
     stop_policy_loader,
 )
+from app.service.profiler import profiler
 from app.service.ranger_client import RangerClient
-from app.service.solr_logger import SolrLoggerClient
 
 logger = logging.getLogger(__name__)
 
 
-def setup_colored_logging():
-    """Настройка цветных логов с помощью colorlog."""
+def setup_colored_logging() -> QueueListener:
+    """
+    Настройка цветных логов с помощью colorlog.
+
+    Логгеры пишут только в очередь (QueueHandler), вывод в stderr выполняет
+    отдельный поток QueueListener, поэтому запись лога не блокирует event loop.
+    Уровень задаётся LOG_LEVEL.
+
+    Returns:
+        Запущенный QueueListener (остановить на shutdown)
+    """
     # Создаем цветной форматтер
     formatter = colorlog.ColoredFormatter(
         "%(asctime)s %(log_color)s[%(levelname)s]%(reset)s %(name)s: %(message)s",
@@ -45,48 +61,20 @@ def setup_colored_logging():
     handler = logging.StreamHandler()
     handler.setFormatter(formatter)
 
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+
+    # В очередь уходит только текст сообщения, оформление - в потоке listener'а
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
     # Применяем ко всем логгерам
     logging.basicConfig(
-        level=logging.DEBUG,
-        handlers=[handler]
+        level=settings.LOG_LEVEL.upper(),
+        handlers=[queue_handler]
     )
-
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-
-        # Получаем информацию о запросе
-        client_ip = request.client.host if request.client else "unknown"
-        method = request.method
-        url = str(request.url)
-
-        # Логируем начало запроса
-        logger.info(f"→ {method} {url} from {client_ip}")
-
-        try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-
-            # Логируем успешный ответ
-            logger.info(
-                f"← {method} {url} {response.status_code} "
-                f"({process_time:.3f}s) from {client_ip}"
-            )
-
-            # Добавляем заголовок с временем выполнения
-            response.headers["X-Process-Time"] = f"{process_time:.3f}s"
-            return response
-
-        except Exception as e:
-            process_time = time.time() - start_time
-
-            # Логируем ошибку
-            logger.error(
-                f"✗ {method} {url} ERROR ({process_time:.3f}s) "
-                f"from {client_ip}: {str(e)}"
-            )
-            raise
+    return listener
 
 
 @asynccontextmanager
@@ -96,9 +84,20 @@ async def lifespan(app: FastAPI):
     Включает:
     - Загрузку политик из Ranger
     - Инициализацию клиентов (Ranger, MinIO, Solr, Redis)
+    - Запуск фоновой отправки аудита
     - Освобождение ресурсов на shutdown
     """
-    setup_colored_logging()
+    log_listener = setup_colored_logging()
+
+    if settings.LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+
+    if settings.IP_WHITELIST_ENABLED:
+        try:
+            ip_whitelist.reload()
+        except OSError as e:
+            # Без whitelist все запросы к защищенным путям отклоняются, пока его не перечитают через admin API
+            logger.error(f"Failed to load IP whitelist, denying all clients: {e}")
 
     logger.info("Loading policies on startup...")
 
@@ -106,23 +105,49 @@ async def lifespan(app: FastAPI):
 
     start_policy_loader(app.state.ranger_client)
 
-    app.state.solr_logger = SolrLoggerClient(settings.SOLR_AUDIT_URL)
+    audit_sinks = create_audit_sinks()
+    audit_spools = {}
+    if settings.AUDIT_SPOOL_DIR:
+        # Spool нужен только удалённому Solr, файловые sink'и пишут на локальный диск сами
+        audit_spools[SolrAuditSink.name] = AuditSpool(
+            settings.AUDIT_SPOOL_DIR,
+            segment_max_bytes=settings.AUDIT_SPOOL_SEGMENT_BYTES,
+            max_total_bytes=settings.AUDIT_SPOOL_MAX_BYTES,
+            fsync=settings.AUDIT_SPOOL_FSYNC,
+        )
+    audit_summarizer = None
+    if settings.AUDIT_SUMMARY_WINDOW > 0:
+        audit_summarizer = AuditSummarizer(settings.AUDIT_SUMMARY_WINDOW, settings.AUDIT_SUMMARY_MAX_KEYS)
+    app.state.audit_pipeline = AuditPipeline(
+        audit_sinks,
+        spools=audit_spools,
+        summarizer=audit_summarizer,
+    )
+    app.state.audit_pipeline.start()
 
     yield
     stop_policy_loader()
-    await app.state.solr_logger.aclose()
-    await app.state.ranger_client.aclose()
+    profiler.stop()
+    # Дописываем накопленный аудит до закрытия клиентов
+    await app.state.audit_pipeline.stop()
+    await app.state.audit_pipeline.aclose_sinks()
+    await app.state.ranger_client.close()
+    loop_watchdog.stop()
+    log_listener.stop()
 
 app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     lifespan=lifespan,
 )
 
-app.add_middleware(LoggingMiddleware)
+if settings.IP_WHITELIST_ENABLED:
+    # Добавлен раньше access-лога, поэтому выполняется внутри него: отказы тоже попадают в лог
+    app.add_middleware(IPWhitelistMiddleware)
+app.add_middleware(AccessLogMiddleware)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    print({"detail": exc.errors(), "body": exc.body})
+    logger.warning("Request validation failed for %s: %s", request.url.path, exc.errors())
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "body": exc.body},
@@ -130,3 +155,5 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 app.include_router(check_ranger_access.router, prefix=settings.API_V1_STR, tags=["gateway"])
 app.include_router(api_router, prefix=settings.API_V1_STR)
+# Prometheus ожидает /metrics в корне
+app.include_router(metrics.router)
@@ -1,6 +1,10 @@
 
+from typing import Any
+
 from pydantic import BaseModel, Field
 
+from app.service.json_codec import loads
+
 
 class Conditions(BaseModel):
     Authorization: list[str]
@@ -49,3 +53,42 @@ class InputData(BaseModel):
 
 class RequestBody(BaseModel):
     input: InputData
+
+
+class CheckRequest:
+    """
+    Облегчённое представление тела /check.
+
+    Из сырого JSON извлекаются только поля, нужные для авторизации;
+    остальные поля тела (RequestBody) не валидируются.
+    """
+
+    __slots__ = ("action", "bucket", "object", "username", "conditions")
+
+    def __init__(self, data: dict[str, Any]):
+        input_data = data.get("input") if isinstance(data, dict) else None
+        if not isinstance(input_data, dict):
+            raise ValueError("Request body must contain an 'input' object")
+        action = input_data.get("action")
+        if not isinstance(action, str) or not action:
+            raise ValueError("'input.action' is required")
+
+        conditions = input_data.get("conditions")
+        usernames = conditions.get("username") if isinstance(conditions, dict) else None
+
+        self.action: str = action
+        self.bucket: str = input_data.get("bucket") or ""
+        self.object: str = input_data.get("object") or ""
+        self.username: str | None = usernames[0] if isinstance(usernames, list) and usernames else None
+        # Условия запроса (SourceIp, CurrentTime, ...) - для условий политик
+        self.conditions: dict[str, Any] = conditions if isinstance(conditions, dict) else {}
+
+    @classmethod
+    def parse(cls, raw: bytes) -> "CheckRequest":
+        """
+        Разбор сырого тела запроса.
+
+        Raises:
+            ValueError: если тело не JSON или нет обязательных полей
+        """
+        return cls(loads(raw))
@@ -80,7 +80,33 @@ def init_ranger():
             {"itemId": 1, "name": "read", "label": "Read", "impliedGrants": []},
             {"itemId": 2, "name": "write", "label": "Write", "impliedGrants": []},
             {"itemId": 3, "name": "delete", "label": "Delete", "impliedGrants": []},
-            {"itemId": 4, "name": "list", "label": "List", "impliedGrants": []}
+            {"itemId": 4, "name": "list", "label": "List", "impliedGrants": []},
+            # admin:*/kms:* - см. app/service/s3_actions.json
+            {"itemId": 5, "name": "admin", "label": "Admin", "impliedGrants": []}
+        ],
+        # Условия элементов политик, которые проверяет шлюз (app/service/policy_conditions.py)
+        "policyConditions": [
+            {
+                "itemId": 1,
+                "name": "ip-range",
+                "evaluator": "org.apache.ranger.plugin.conditionevaluator.RangerIpMatcher",
+                "label": "IP Address Range",
+                "description": "Source IP addresses or CIDRs, e.g. 10.1.0.0/16 or 10.1.*"
+            },
+            {
+                "itemId": 2,
+                "name": "time-window",
+                "evaluator": "org.apache.ranger.plugin.conditionevaluator.RangerSimpleMatcher",
+                "label": "Time Window (UTC)",
+                "description": "HH:MM-HH:MM, optionally with days: Mon-Fri 09:00-18:00"
+            },
+            {
+                "itemId": 3,
+                "name": "secure-transport",
+                "evaluator": "org.apache.ranger.plugin.conditionevaluator.RangerSimpleMatcher",
+                "label": "Secure Transport",
+                "description": "true - only requests over TLS"
+            }
         ],
         "isEnabled": True
     }
@@ -0,0 +1,141 @@
+"""Admission control for /check: in-flight limit, bounded wait queue and load shedding."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from app.core.config import settings
+from app.service.metrics import CHECK_ADMISSION, CHECK_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SHED_MODES = ("closed", "open")
+
+_PRIORITIES = {True: "high", False: "normal"}
+_ADMITTED = {high: (name, "admitted") for high, name in _PRIORITIES.items()}
+_QUEUED = {high: (name, "queued") for high, name in _PRIORITIES.items()}
+_SHED = {high: (name, "shed") for high, name in _PRIORITIES.items()}
+_WAIT_HISTOGRAMS = {high: CHECK_QUEUE_WAIT_SECONDS.labels(name) for high, name in _PRIORITIES.items()}
+
+
+class AdmissionController:
+    """
+    Limits concurrent /check processing.
+
+    Up to `max_in_flight` requests run at once. Others wait in a FIFO queue
+    for at most `queue_timeout` seconds and are shed when the wait budget
+    runs out or more than `max_queued` are already waiting. Requests whose
+    decision is already cached are cheap, so they wait in a separate queue
+    that is always served first.
+
+    The priority check runs only when a request actually has to wait;
+    with free slots admission is a counter increment.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = settings.CHECK_MAX_IN_FLIGHT,
+        max_queued: int = settings.CHECK_MAX_QUEUED,
+        queue_timeout: float = settings.CHECK_QUEUE_TIMEOUT_MS / 1000,
+        shed_mode: str = settings.CHECK_SHED_MODE,
+    ):
+        if shed_mode not in SHED_MODES:
+            logger.error(f"Unknown CHECK_SHED_MODE {shed_mode!r}, using 'closed'")
+            shed_mode = "closed"
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.fail_open = shed_mode == "open"
+        self.in_flight = 0
+        self.queued = 0
+        # Очереди ожидания: True - запросы с решением в кэше (обслуживаются первыми)
+        self._waiters: dict[bool, deque[asyncio.Future]] = {True: deque(), False: deque()}
+        self._stats = {"admitted": 0, "queued": 0, "shed": 0, "max_in_flight_seen": 0}
+
+    async def acquire(self, is_cheap: Callable[[], bool], budget: float | None = None) -> bool:
+        """
+        Take a processing slot, waiting up to the queue budget.
+
+        Args:
+            is_cheap: Returns True if the request is cheap (decision cached);
+                called only if the request has to wait
+            budget: Remaining request budget; caps the queue wait
+
+        Returns:
+            True if admitted (release() must be called afterwards),
+            False if the request was shed
+        """
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self.queued):
+            self.in_flight += 1
+            self._stats["admitted"] += 1
+            if self.in_flight > self._stats["max_in_flight_seen"]:
+                self._stats["max_in_flight_seen"] = self.in_flight
+            CHECK_ADMISSION.inc(_ADMITTED[False])
+            return True
+
+        high = is_cheap()
+        if self.queued >= self.max_queued:
+            return self._shed(high)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[high].append(waiter)
+        self.queued += 1
+        self._stats["queued"] += 1
+        CHECK_ADMISSION.inc(_QUEUED[high])
+        started = time.perf_counter()
+        try:
+            timeout = self.queue_timeout if budget is None else min(self.queue_timeout, budget)
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done() or waiter.cancelled():
+                # Отмененный waiter остается в deque и пропускается в release()
+                self.queued -= 1
+                return self._shed(high)
+            # Слот передан одновременно с истечением бюджета - используем его
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже был передан этому запросу - вернуть его
+                self.release()
+            else:
+                self.queued -= 1
+            raise
+        # Слот передан из release(): in_flight не изменился, queued уже уменьшен
+        _WAIT_HISTOGRAMS[high].observe(time.perf_counter() - started)
+        self._stats["admitted"] += 1
+        CHECK_ADMISSION.inc(_ADMITTED[high])
+        return True
+
+    def release(self) -> None:
+        """Free a slot: hand it to the next waiter (cached decisions first) or return it."""
+        for waiters in (self._waiters[True], self._waiters[False]):
+            while waiters:
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self.queued -= 1
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _shed(self, high: bool) -> bool:
+        self._stats["shed"] += 1
+        CHECK_ADMISSION.inc(_SHED[high])
+        return False
+
+    def get_stats(self) -> dict[str, Any]:
+        """Current load and admission counters."""
+        return {
+            **self._stats,
+            "in_flight": self.in_flight,
+            "waiting": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+            "fail_open": self.fail_open,
+        }
+
+
+check_admission = AdmissionController()
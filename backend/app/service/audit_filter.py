@@ -0,0 +1,119 @@
+"""Rule-based audit filtering and sampling."""
+
+import json
+import logging
+import random
+from typing import Any
+
+from app.core.config import settings
+from app.service.constants import AuditResult
+
+logger = logging.getLogger(__name__)
+
+
+class _ValueMatcher:
+    """Matches a value against exact names and "prefix*" patterns."""
+
+    __slots__ = ("exact", "prefixes")
+
+    def __init__(self, patterns: list[str] | str | None):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        patterns = patterns or []
+        self.exact = frozenset(p for p in patterns if not p.endswith("*"))
+        self.prefixes = tuple(p[:-1] for p in patterns if p.endswith("*"))
+
+    def __call__(self, value: str) -> bool:
+        return value in self.exact or (bool(self.prefixes) and value.startswith(self.prefixes))
+
+
+class AuditRule:
+    """
+    One compiled audit rule.
+
+    Rule fields (all optional, omitted = any):
+        result: "allowed" | "denied"
+        access: list of access types ("read", "write", ...)
+        bucket: list of bucket names or "prefix*" patterns
+        user: list of user names or "prefix*" patterns
+        audit: whether matching events are audited (default true)
+        sample: fraction of matching events to audit, 0..1 (default 1)
+    """
+
+    __slots__ = ("result", "access", "bucket", "user", "audit", "sample")
+
+    def __init__(self, rule: dict[str, Any]):
+        result = rule.get("result")
+        self.result = AuditResult[result.upper()] if result else None
+        self.access = frozenset(rule["access"]) if rule.get("access") else None
+        self.bucket = _ValueMatcher(rule["bucket"]) if rule.get("bucket") else None
+        self.user = _ValueMatcher(rule["user"]) if rule.get("user") else None
+        self.audit = bool(rule.get("audit", True))
+        self.sample = float(rule.get("sample", 1.0))
+
+    def matches(self, result: AuditResult, access_type: str, bucket: str, user: str) -> bool:
+        return (
+            (self.result is None or self.result is result)
+            and (self.access is None or access_type in self.access)
+            and (self.bucket is None or self.bucket(bucket))
+            and (self.user is None or self.user(user))
+        )
+
+
+class AuditFilter:
+    """
+    Decides whether an authorization decision is audited.
+
+    Rules are evaluated in order and the first matching rule decides
+    (with sampling). If no rule matches, the policy's isAuditEnabled
+    flag decides.
+    """
+
+    def __init__(self, rules: list[dict[str, Any]]):
+        self.rules = [AuditRule(rule) for rule in rules]
+
+    def should_audit(
+        self,
+        result: AuditResult,
+        access_type: str,
+        bucket: str,
+        user: str,
+        is_audited: bool,
+    ) -> bool:
+        """
+        Args:
+            result: Decision
+            access_type: Access type (read, write, ...)
+            bucket: Bucket name
+            user: User name
+            is_audited: isAuditEnabled of the deciding policy
+
+        Returns:
+            True if the event must be audited
+        """
+        for rule in self.rules:
+            if rule.matches(result, access_type, bucket, user):
+                if not rule.audit:
+                    return False
+                return rule.sample >= 1.0 or random.random() < rule.sample
+        return is_audited
+
+
+def load_audit_rules(raw: str | None) -> list[dict[str, Any]]:
+    """Parse AUDIT_RULES JSON (invalid config disables the rules with an error)."""
+    if not raw:
+        return []
+    try:
+        rules = json.loads(raw)
+        if not isinstance(rules, list):
+            raise ValueError("AUDIT_RULES must be a JSON list")
+        # Проверяем правила сразу, чтобы ошибка конфигурации была видна на старте
+        for rule in rules:
+            AuditRule(rule)
+        return rules
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.error(f"Invalid AUDIT_RULES, falling back to policy audit flags: {e}")
+        return []
+
+
+audit_filter = AuditFilter(load_audit_rules(settings.AUDIT_RULES))
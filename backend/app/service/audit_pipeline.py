@@ -0,0 +1,308 @@
+"""Background audit pipeline: bounded in-memory queue drained to audit sinks in batches."""
+
+import asyncio
+import logging
+from typing import Any
+
+from app.core.config import settings
+from app.service.audit_sinks import AuditSink
+from app.service.audit_spool import AuditSpool
+from app.service.audit_summarizer import AuditSummarizer
+
+logger = logging.getLogger(__name__)
+
+
+class _SinkChannel:
+    """Delivery state of one sink: its optional spool, availability and statistics."""
+
+    def __init__(self, sink: AuditSink, spool: AuditSpool | None):
+        self.sink = sink
+        self.spool = spool
+        self.available = True
+        self.replay_task: asyncio.Task | None = None
+        self.stats = {
+            "spooled": 0,
+            "dropped": 0,
+            "batches_sent": 0,
+            "records_sent": 0,
+            "batches_failed": 0,
+            "records_failed": 0,
+        }
+
+
+class AuditPipeline:
+    """
+    Decouples audit delivery from the request path.
+
+    Requests only enqueue audit records (never await a sink). A background
+    flusher takes batches of up to `batch_size` records, or whatever has
+    accumulated after `flush_interval` seconds, and hands each batch to
+    all sinks concurrently.
+
+    Per sink, records are dropped (and counted) when a send fails, unless
+    the sink has a spool. Spooled sinks get failed batches written to local
+    disk instead: once a send fails or exceeds `sink_timeout`, batches go
+    straight to the spool until the replayer manages to ship the spooled
+    backlog to the sink again. Records that do not fit into the queue are
+    written to every spool (dropped if there is none).
+
+    With a summarizer, identical events are collapsed on submit and only
+    the resulting summaries are queued once their window elapses.
+    """
+
+    def __init__(
+        self,
+        sinks: list[AuditSink],
+        max_queue: int = settings.AUDIT_QUEUE_MAXSIZE,
+        batch_size: int = settings.AUDIT_BATCH_SIZE,
+        flush_interval: float = settings.AUDIT_FLUSH_INTERVAL,
+        spools: dict[str, AuditSpool] | None = None,
+        sink_timeout: float = settings.AUDIT_SINK_TIMEOUT,
+        replay_interval: float = settings.AUDIT_SPOOL_REPLAY_INTERVAL,
+        summarizer: AuditSummarizer | None = None,
+    ):
+        spools = spools or {}
+        self.channels = [_SinkChannel(sink, spools.get(sink.name)) for sink in sinks]
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.sink_timeout = sink_timeout
+        self.replay_interval = replay_interval
+        self.summarizer = summarizer
+        self._spools = [channel.spool for channel in self.channels if channel.spool is not None]
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=max_queue)
+        self._has_data = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._closing = False
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "spooled": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+        }
+
+    def submit(self, audit_record: dict[str, Any]) -> bool:
+        """
+        Enqueue an audit record without blocking.
+
+        Args:
+            audit_record: Audit record dictionary
+
+        Returns:
+            True if enqueued or spooled, False if dropped
+        """
+        if self._closing:
+            return self._overflow(audit_record)
+        if self.summarizer is not None:
+            evicted = self.summarizer.add(audit_record)
+            if len(self.summarizer) == 1:
+                # Появилась первая сводка - flusher должен пересчитать срок выгрузки
+                self._has_data.set()
+            return self._enqueue(evicted) if evicted is not None else True
+        return self._enqueue(audit_record)
+
+    def _enqueue(self, audit_record: dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(audit_record)
+        except asyncio.QueueFull:
+            return self._overflow(audit_record)
+
+        self._stats["enqueued"] += 1
+        self._has_data.set()
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def _overflow(self, audit_record: dict[str, Any]) -> bool:
+        if not self._spools:
+            self._stats["dropped"] += 1
+            return False
+        spooled = False
+        for spool in self._spools:
+            try:
+                # Буферизованная запись без fsync, чтобы не держать event loop
+                spool.append([audit_record], fsync=False)
+                spooled = True
+            except OSError as e:
+                logger.error(f"Failed to spool audit record: {e}")
+        self._stats["spooled" if spooled else "dropped"] += 1
+        return spooled
+
+    def start(self) -> None:
+        """Start the background flusher (and spool replayer) tasks."""
+        if self._task is not None and not self._task.done():
+            logger.warning("Audit pipeline already running")
+            return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        for channel in self.channels:
+            if channel.spool is not None:
+                channel.replay_task = asyncio.create_task(self._replay_loop(channel))
+        logger.info(
+            f"Started audit pipeline: sinks={[channel.sink.name for channel in self.channels]}, "
+            f"batch_size={self.batch_size}, flush_interval={self.flush_interval}s, "
+            f"max_queue={self._queue.maxsize}, spools={[spool.directory for spool in self._spools]}"
+        )
+
+    async def stop(self, timeout: float = settings.AUDIT_DRAIN_TIMEOUT) -> None:
+        """
+        Drain queued records and stop the background tasks.
+
+        Args:
+            timeout: Max seconds to wait for the queue to drain
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._has_data.set()
+        self._batch_ready.set()
+        for channel in self.channels:
+            if channel.replay_task is not None:
+                channel.replay_task.cancel()
+                channel.replay_task = None
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            remaining = [self._queue.get_nowait() for _ in range(self._queue.qsize())]
+            if self.summarizer is not None:
+                remaining += self.summarizer.pop_all()
+            logger.error(f"Audit pipeline drain timed out, {len(remaining)} records left in queue")
+            for record in remaining:
+                self._overflow(record)
+        self._task = None
+        for spool in self._spools:
+            spool.close()
+        logger.info("Stopped audit pipeline")
+
+    async def _run(self) -> None:
+        while True:
+            if self.summarizer is not None:
+                for summary in self.summarizer.pop_expired():
+                    self._enqueue(summary)
+
+            if self._queue.empty():
+                if self._closing:
+                    if self.summarizer is None or not len(self.summarizer):
+                        return
+                    for summary in self.summarizer.pop_all():
+                        self._enqueue(summary)
+                    continue
+                self._has_data.clear()
+                expiry = self.summarizer.next_expiry() if self.summarizer is not None else None
+                try:
+                    await asyncio.wait_for(self._has_data.wait(), timeout=expiry)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Ждём пока наберётся пачка, но не дольше flush_interval
+            if self._queue.qsize() < self.batch_size and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self._stats["batches"] += 1
+            self._stats["last_batch_size"] = len(batch)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            # Все sink'и получают пачку параллельно; следующая пачка ждет самый медленный sink,
+            # но не дольше sink_timeout (после сбоя spooled sink пишет сразу на диск)
+            await asyncio.gather(*(self._send(channel, batch) for channel in self.channels))
+
+    async def _deliver(self, channel: _SinkChannel, batch: list[dict[str, Any]]) -> bool:
+        """Send a batch to a sink within sink_timeout."""
+        try:
+            await asyncio.wait_for(channel.sink.write_batch(batch), timeout=self.sink_timeout)
+        except Exception as e:
+            channel.stats["batches_failed"] += 1
+            channel.stats["records_failed"] += len(batch)
+            logger.error(f"Failed to send {len(batch)} audit records to sink {channel.sink.name}: {e!r}")
+            return False
+
+        channel.stats["batches_sent"] += 1
+        channel.stats["records_sent"] += len(batch)
+        return True
+
+    async def _send(self, channel: _SinkChannel, batch: list[dict[str, Any]]) -> None:
+        if channel.spool is not None and not channel.available:
+            # Sink недоступен - не ждём таймаутов, сразу пишем на диск
+            await self._spool(channel, batch)
+            return
+
+        if await self._deliver(channel, batch):
+            return
+        if channel.spool is not None:
+            channel.available = False
+            await self._spool(channel, batch)
+        else:
+            channel.stats["dropped"] += len(batch)
+
+    async def _spool(self, channel: _SinkChannel, batch: list[dict[str, Any]]) -> None:
+        try:
+            await asyncio.to_thread(channel.spool.append, batch)
+        except OSError as e:
+            channel.stats["dropped"] += len(batch)
+            logger.error(f"Failed to spool {len(batch)} audit records for sink {channel.sink.name}: {e}")
+            return
+        channel.stats["spooled"] += len(batch)
+
+    async def _replay_loop(self, channel: _SinkChannel) -> None:
+        """Ship spooled records to the sink once it is reachable again."""
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                await self._replay(channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error replaying audit spool of sink {channel.sink.name}: {e}")
+
+    async def _replay(self, channel: _SinkChannel) -> None:
+        spool = channel.spool
+        while spool.pending_bytes > 0:
+            records, position = await asyncio.to_thread(spool.read_batch, self.batch_size)
+            if not records:
+                await asyncio.to_thread(spool.commit, position)
+                break
+            if not await self._deliver(channel, records):
+                channel.available = False
+                return
+            await asyncio.to_thread(spool.commit, position, len(records))
+            logger.info(f"Replayed {len(records)} spooled audit records to sink {channel.sink.name}")
+
+        if not channel.available:
+            logger.info(f"Audit spool drained, sending audit records to sink {channel.sink.name} directly")
+        channel.available = True
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get pipeline statistics (queue depth, batch sizes, per-sink delivery)."""
+        stats = {
+            **self._stats,
+            "queue_depth": self._queue.qsize(),
+            "queue_maxsize": self._queue.maxsize,
+            "sinks": {},
+        }
+        for channel in self.channels:
+            sink_stats = {**channel.stats, **channel.sink.get_stats(), "available": channel.available}
+            if channel.spool is not None:
+                sink_stats["spool"] = channel.spool.get_stats()
+            stats["sinks"][channel.sink.name] = sink_stats
+        if self.summarizer is not None:
+            stats["summary_pending"] = len(self.summarizer)
+            stats["summary_events_absorbed"] = self.summarizer.events_absorbed
+            stats["summaries_emitted"] = self.summarizer.summaries_emitted
+        return stats
+
+    async def aclose_sinks(self) -> None:
+        """Flush and close all sinks (after stop())."""
+        for channel in self.channels:
+            try:
+                await channel.sink.aclose()
+            except Exception as e:
+                logger.error(f"Error closing audit sink {channel.sink.name}: {e}")
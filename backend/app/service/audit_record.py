@@ -0,0 +1,147 @@
+"""Construction and serialization of Ranger audit records (shared by all audit sinks)."""
+
+import itertools
+import time
+import uuid
+
+from app.core.config import settings
+from app.service.cache import get_servisedef_id
+from app.service.json_codec import dumps
+
+# Идентификатор записи: уникальный для процесса префикс + монотонный счётчик
+# (дешевле uuid4 на каждую запись и сохраняет уникальность между репликами)
+_ID_PREFIX = uuid.uuid4().hex[:16]
+_id_counter = itertools.count(1)
+
+
+class _EventTimeFormatter:
+    """Formats evtTime (ISO-8601 UTC, milliseconds) reusing the result within one millisecond."""
+
+    __slots__ = ("_second", "_second_str", "_millis", "_value")
+
+    def __init__(self) -> None:
+        self._second = -1
+        self._second_str = ""
+        self._millis = -1
+        self._value = ""
+
+    def __call__(self, now: float | None = None) -> str:
+        millis = int((time.time() if now is None else now) * 1000)
+        if millis == self._millis:
+            return self._value
+        second = millis // 1000
+        if second != self._second:
+            self._second = second
+            self._second_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        self._millis = millis
+        self._value = f"{self._second_str}.{millis % 1000:03d}Z"
+        return self._value
+
+
+format_event_time = _EventTimeFormatter()
+
+
+def encode_audit_batch(audit_records: list[dict]) -> bytes:
+    """Serialize a batch of audit records into a Solr update body."""
+    return dumps(audit_records)
+
+
+class AuditRecordBuilder:
+    """Builds audit records in the Ranger Solr schema from a per-process template."""
+
+    def __init__(self) -> None:
+        self._template: dict = {}
+        self._template_repo_type: int | None = None
+
+    def _get_template(self) -> dict:
+        """
+        Шаблон audit-записи со статическими полями.
+
+        Пересобирается только при смене id servicedef после обновления политик.
+        """
+        servicedef_id = get_servisedef_id(settings.RANGER_SERVICEDEF_NAME) or 1
+        if servicedef_id != self._template_repo_type:
+            self._template_repo_type = servicedef_id
+            self._template = {
+                "id": "",
+                "evtTime": "",
+                "policy": None,
+                "policyVersion": None,
+                "access": "",
+                "enforcer": "ranger-acl",
+                "repo": "",
+                "repoType": servicedef_id,
+                "sess": "",
+                "reqUser": "",
+                "resource": "",
+                "cliIP": "",
+                "result": None,
+                "agentHost": settings.API_HOST,
+                "logType": "RangerAudit",
+                "resType": "path",
+                "reason": "",
+                "action": "",
+                "seq_num": 1,
+                "event_count": 1,
+                "event_dur_ms": 0,
+                "tags": (),
+                "cluster": "",
+                "zone": "",
+            }
+        return self._template
+
+    def build(
+        self,
+        *,
+        policy: int,
+        policyVersion: int,
+        access: str,
+        repo: str,
+        sess: str,
+        reqUser: str,
+        resource: str,
+        cliIP: str,
+        result: int,
+        agentHost: str,
+        action: str,
+        seq_num: int = 1,
+        event_count: int = 1,
+        event_dur_ms: int = 0,
+        logType: str = "RangerAudit",
+        resType: str = "path",
+        reason: str = "",
+        tags: list = None,
+        cluster: str = "",
+        zone: str = ""
+    ) -> dict:
+        record = self._get_template().copy()
+        record["id"] = f"{_ID_PREFIX}-{next(_id_counter)}"
+        record["evtTime"] = format_event_time()
+        record["policy"] = policy
+        record["policyVersion"] = policyVersion
+        record["access"] = access
+        record["repo"] = repo
+        record["sess"] = sess
+        record["reqUser"] = reqUser
+        record["resource"] = resource
+        record["cliIP"] = cliIP
+        record["result"] = result
+        record["agentHost"] = agentHost
+        record["action"] = action
+        # Остальные поля почти всегда совпадают с шаблоном
+        if seq_num != 1 or event_count != 1 or event_dur_ms:
+            record["seq_num"] = seq_num
+            record["event_count"] = event_count
+            record["event_dur_ms"] = event_dur_ms
+        if logType != "RangerAudit" or resType != "path" or reason:
+            record["logType"] = logType
+            record["resType"] = resType
+            record["reason"] = reason
+        if tags or cluster or zone:
+            record["tags"] = tags or ()
+            record["cluster"] = cluster
+            record["zone"] = zone
+        return record
+
+
+audit_record_builder = AuditRecordBuilder()
@@ -0,0 +1,370 @@
+"""Audit sinks: destinations the audit pipeline delivers batches to."""
+
+import abc
+import asyncio
+import gzip
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+from app.core.config import settings
+from app.service.json_codec import dumps, loads
+from app.service.solr_logger import SolrLoggerClient
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - зависит от окружения
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SUFFIX = ".part"
+
+
+class AuditSink(abc.ABC):
+    """
+    Base class of an audit destination.
+
+    write_batch() receives whole batches from the pipeline flusher, never
+    single records from the request path, and must raise on failure so the
+    pipeline can spool or count the batch.
+    """
+
+    name = "sink"
+
+    @abc.abstractmethod
+    async def write_batch(self, records: list[dict[str, Any]]) -> None:
+        """Deliver a batch; raise on failure."""
+
+    async def aclose(self) -> None:  # noqa: B027 - необязательный хук, не abstractmethod
+        """Flush buffered records and release resources."""
+        # По умолчанию ничего не делает: sink'ам без буферов и соединений закрывать нечего
+
+    def get_stats(self) -> dict[str, Any]:
+        """Sink-specific statistics."""
+        return {}
+
+
+class SolrAuditSink(AuditSink):
+    """Ranger Solr audit collection."""
+
+    name = "solr"
+
+    def __init__(self, solr_logger: SolrLoggerClient):
+        self.solr_logger = solr_logger
+
+    async def write_batch(self, records: list[dict[str, Any]]) -> None:
+        await self.solr_logger.log_events(records)
+
+    async def aclose(self) -> None:
+        await self.solr_logger.aclose()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {"nodes": self.solr_logger.get_stats()}
+
+
+class _RotatingFiles:
+    """
+    Naming, rotation and retention of audit files in one directory.
+
+    Files are written as "<prefix>-<UTC time>-<n><suffix>.part" and renamed
+    to their final name once complete, so readers only ever pick up whole
+    files. Only the newest `max_files` complete files are kept.
+    """
+
+    def __init__(self, directory: str, prefix: str, suffix: str, max_files: int):
+        self.directory = directory
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_files = max(1, max_files)
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+        # Незавершённые файлы от прошлого запуска
+        for name in os.listdir(directory):
+            if self._is_own(name) and name.endswith(ACTIVE_SUFFIX):
+                path = os.path.join(directory, name)
+                os.replace(path, path[:-len(ACTIVE_SUFFIX)])
+
+    def _is_own(self, name: str) -> bool:
+        return name.startswith(f"{self.prefix}-") and self.suffix in name
+
+    def new_path(self) -> str:
+        """Path of a new active (.part) file."""
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        while True:
+            self._seq += 1
+            final_path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{self._seq:06d}{self.suffix}")
+            # Перезапуск в ту же секунду не должен перезаписать файл прошлого запуска
+            if not os.path.exists(final_path):
+                return final_path + ACTIVE_SUFFIX
+
+    def complete(self, path: str) -> str:
+        """Publish an active file under its final name and apply retention."""
+        final_path = path[:-len(ACTIVE_SUFFIX)]
+        os.replace(path, final_path)
+        self._enforce_retention()
+        return final_path
+
+    def _enforce_retention(self) -> None:
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if self._is_own(name) and not name.endswith(ACTIVE_SUFFIX)
+        )
+        for name in names[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+
+
+class JsonlFileAuditSink(AuditSink):
+    """
+    Rotating gzip-compressed JSONL files.
+
+    Each batch is compressed and flushed as one gzip sync point, so a crash
+    loses at most the batch being written. The file is rotated once its
+    compressed size exceeds `max_bytes` or it is older than
+    `rotate_seconds`.
+    """
+
+    name = "jsonl"
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_seconds: float = 3600,
+        max_files: int = 168,
+    ):
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self._files = _RotatingFiles(directory, "audit", ".jsonl.gz", max_files)
+        self._lock = threading.Lock()
+        self._path: str | None = None
+        self._raw = None
+        self._gzip: gzip.GzipFile | None = None
+        self._opened_at = 0.0
+        self._stats = {"records_written": 0, "files_completed": 0}
+
+    async def write_batch(self, records: list[dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, records)
+
+    def _write(self, records: list[dict[str, Any]]) -> None:
+        data = b"".join(dumps(record) + b"\n" for record in records)
+        with self._lock:
+            if self._gzip is None:
+                self._open()
+            self._gzip.write(data)
+            self._gzip.flush()
+            self._stats["records_written"] += len(records)
+            if (
+                self._raw.tell() >= self.max_bytes
+                or time.monotonic() - self._opened_at >= self.rotate_seconds
+            ):
+                self._close_file()
+
+    def _open(self) -> None:
+        self._path = self._files.new_path()
+        self._raw = open(self._path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._opened_at = time.monotonic()
+
+    def _close_file(self) -> None:
+        self._gzip.close()
+        self._raw.close()
+        self._gzip = self._raw = None
+        self._files.complete(self._path)
+        self._stats["files_completed"] += 1
+
+    async def aclose(self) -> None:
+        def close() -> None:
+            with self._lock:
+                if self._gzip is not None:
+                    self._close_file()
+
+        await asyncio.to_thread(close)
+
+    def get_stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "active_file_bytes": self._raw.tell() if self._raw else 0}
+
+
+class ColumnarFileAuditSink(AuditSink):
+    """
+    Columnar batch files for offline analytics.
+
+    Records are appended to a JSONL staging file as they arrive and
+    converted into one Parquet file (zstd) per `rows_per_file` records or
+    `rotate_seconds`, whichever comes first; a timer rotates an idle sink
+    on time. On rotation the staging file is sealed and converted in the
+    background, so neither memory nor a crash ever holds more than the
+    batch being written: sealed and staged rows left from a previous run
+    are converted on the next rotation. Without pyarrow, files are
+    gzip-compressed JSON objects mapping each column to its list of values.
+    """
+
+    name = "parquet"
+
+    STAGING_FILE = "staging.rows.jsonl"
+    SEALED_PREFIX = "sealed-"
+
+    def __init__(
+        self,
+        directory: str,
+        rows_per_file: int = 100000,
+        rotate_seconds: float = 3600,
+        max_files: int = 168,
+    ):
+        self.rows_per_file = max(1, rows_per_file)
+        self.rotate_seconds = rotate_seconds
+        suffix = ".parquet" if pyarrow is not None else ".columns.json.gz"
+        if pyarrow is None:
+            logger.warning("pyarrow is not installed, columnar audit files are written as gzip JSON columns")
+        self._files = _RotatingFiles(directory, "audit", suffix, max_files)
+        self._directory = directory
+        self._staging_path = os.path.join(directory, self.STAGING_FILE)
+        self._lock = threading.Lock()
+        self._staging = None
+        self._staged_rows = 0
+        self._started_at = time.monotonic()
+        self._seq = 0
+        self._flush_task: asyncio.Task | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._stats = {"records_written": 0, "files_completed": 0, "files_failed": 0}
+        # Строки прошлого запуска: staging запечатывается и войдет в следующий файл
+        if os.path.exists(self._staging_path):
+            self._seal()
+
+    async def write_batch(self, records: list[dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._append, records)
+        self._maybe_rotate()
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        """Append rows to the staging file."""
+        data = b"".join(dumps(record) + b"\n" for record in records)
+        with self._lock:
+            if self._staging is None:
+                self._staging = open(self._staging_path, "ab")
+            if self._staged_rows == 0:
+                self._started_at = time.monotonic()
+            self._staging.write(data)
+            self._staging.flush()
+            self._staged_rows += len(records)
+
+    def _maybe_rotate(self, force: bool = False) -> None:
+        """Start rotation if due; otherwise make sure a timer rotates staged rows on time."""
+        if self._flush_task is not None and not self._flush_task.done():
+            # Идет запись файла - проверим снова по ее окончании
+            return
+        if not self._staged_rows and not (force and self._sealed_paths()):
+            return
+        age = time.monotonic() - self._started_at
+        if force or self._staged_rows >= self.rows_per_file or age >= self.rotate_seconds:
+            # Запись файла идёт в фоне и не задерживает доставку в другие sink'и
+            self._flush_task = asyncio.create_task(self._flush())
+            self._flush_task.add_done_callback(lambda _: self._maybe_rotate())
+        elif self._timer is None:
+            # Ротация по времени и без новых записей (таймер может сработать чуть раньше - тогда перевзводится)
+            self._timer = asyncio.get_running_loop().call_later(self.rotate_seconds - age, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._maybe_rotate()
+
+    def _seal(self) -> None:
+        """Close the staging file under a sealed name; the next rows start a new one."""
+        with self._lock:
+            if self._staging is not None:
+                self._staging.close()
+                self._staging = None
+            if os.path.exists(self._staging_path):
+                self._seq += 1
+                stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+                sealed = f"{self.SEALED_PREFIX}{stamp}-{self._seq:06d}.rows.jsonl"
+                os.replace(self._staging_path, os.path.join(self._directory, sealed))
+            self._staged_rows = 0
+
+    def _sealed_paths(self) -> list[str]:
+        return [
+            os.path.join(self._directory, name)
+            for name in sorted(os.listdir(self._directory))
+            if name.startswith(self.SEALED_PREFIX)
+        ]
+
+    async def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await asyncio.to_thread(self._seal)
+        for path in await asyncio.to_thread(self._sealed_paths):
+            try:
+                rows = await asyncio.to_thread(self._convert, path)
+            except Exception as e:
+                # Файл не записан - запечатанные строки остаются на диске до следующей ротации
+                self._stats["files_failed"] += 1
+                logger.error(f"Failed to write columnar audit file from {path}: {e}")
+                return
+            self._stats["records_written"] += rows
+            self._stats["files_completed"] += 1
+
+    def _convert(self, sealed_path: str) -> int:
+        """Write a sealed staging file as a columnar file and remove it; returns the row count."""
+        with open(sealed_path, "rb") as f:
+            # Оборванная при падении последняя строка пропускается
+            rows = []
+            for line in f:
+                if line.endswith(b"\n"):
+                    rows.append(loads(line))
+        if rows:
+            self._write_file(rows)
+        os.remove(sealed_path)
+        return len(rows)
+
+    def _write_file(self, rows: list[dict[str, Any]]) -> None:
+        path = self._files.new_path()
+        if pyarrow is not None:
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path, compression="zstd")
+        else:
+            fields = dict.fromkeys(field for row in rows for field in row)
+            columns = {field: [row.get(field) for row in rows] for field in fields}
+            with gzip.open(path, "wb") as f:
+                f.write(dumps({"rows": len(rows), "columns": columns}))
+        self._files.complete(path)
+
+    async def aclose(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        self._maybe_rotate(force=True)
+        if self._flush_task is not None:
+            await self._flush_task
+
+    def get_stats(self) -> dict[str, Any]:
+        return {**self._stats, "buffered_rows": self._staged_rows}
+
+
+def create_audit_sinks() -> list[AuditSink]:
+    """Create the sinks listed in AUDIT_SINKS."""
+    sinks: list[AuditSink] = []
+    for name in settings.AUDIT_SINK_NAMES:
+        if name == SolrAuditSink.name:
+            sinks.append(SolrAuditSink(SolrLoggerClient(settings.SOLR_AUDIT_URLS)))
+        elif name == JsonlFileAuditSink.name:
+            sinks.append(JsonlFileAuditSink(
+                os.path.join(settings.AUDIT_FILE_DIR, "jsonl"),
+                max_bytes=settings.AUDIT_FILE_MAX_BYTES,
+                rotate_seconds=settings.AUDIT_FILE_ROTATE_SECONDS,
+                max_files=settings.AUDIT_FILE_MAX_FILES,
+            ))
+        elif name == ColumnarFileAuditSink.name:
+            sinks.append(ColumnarFileAuditSink(
+                os.path.join(settings.AUDIT_FILE_DIR, "columnar"),
+                rows_per_file=settings.AUDIT_COLUMNAR_ROWS,
+                rotate_seconds=settings.AUDIT_FILE_ROTATE_SECONDS,
+                max_files=settings.AUDIT_FILE_MAX_FILES,
+            ))
+        else:
+            logger.error(f"Unknown audit sink {name!r} in AUDIT_SINKS, ignored")
+    return sinks
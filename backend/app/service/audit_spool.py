@@ -0,0 +1,250 @@
+"""Durable local spool (write-ahead log) for audit records that could not be sent."""
+
+import json
+import logging
+import os
+import threading
+from typing import Any
+
+from app.service.json_codec import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+OFFSET_FILE = "offset.json"
+
+# (segment number, byte offset inside segment)
+SpoolPosition = tuple[int, int]
+
+
+class AuditSpool:
+    """
+    Append-only, segment-rotated JSONL spool for audit records.
+
+    Records are appended to the active segment, which is rotated once it
+    exceeds `segment_max_bytes`. The replay position is stored in
+    offset.json and replaced atomically after records were delivered, so a
+    crash replays at most the last unconfirmed batch (Solr upserts by id,
+    so replays are idempotent). A new segment is started on every open,
+    which means a torn line from a crash is only ever at the end of an
+    old segment and is skipped. When the spool exceeds `max_total_bytes`,
+    the oldest segments are discarded.
+
+    All methods are blocking and thread-safe; call them via
+    asyncio.to_thread from the event loop where latency matters.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 16 * 1024 * 1024,
+        max_total_bytes: int = 1024 * 1024 * 1024,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._stats = {
+            "records_spooled": 0,
+            "records_replayed": 0,
+            "records_skipped": 0,
+            "segments_dropped": 0,
+            "bytes_dropped": 0,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = self._list_segments()
+        self._position = self._load_position()
+        self._active_id = (self._segments[-1] + 1) if self._segments else self._position[0]
+        self._active = self._open_segment(self._active_id)
+        self._total = self._total_bytes()
+
+    # --- files
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment_id:010d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self) -> list[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    def _open_segment(self, segment_id: int):
+        if segment_id not in self._segments:
+            self._segments.append(segment_id)
+        return open(self._segment_path(segment_id), "ab")
+
+    def _load_position(self) -> SpoolPosition:
+        path = os.path.join(self.directory, OFFSET_FILE)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            position = (int(data["segment"]), int(data["offset"]))
+        except FileNotFoundError:
+            position = (self._segments[0] if self._segments else 0, 0)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Corrupted audit spool offset file {path}, replaying from the oldest segment: {e}")
+            position = (self._segments[0] if self._segments else 0, 0)
+
+        # Позиция могла указывать на уже удалённый сегмент
+        if self._segments and position[0] < self._segments[0]:
+            position = (self._segments[0], 0)
+        return position
+
+    def _store_position(self, position: SpoolPosition) -> None:
+        path = os.path.join(self.directory, OFFSET_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": position[0], "offset": position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._position = position
+
+    # --- write side
+
+    def append(self, records: list[dict[str, Any]], fsync: bool | None = None) -> None:
+        """
+        Append records to the spool.
+
+        Args:
+            records: Audit records
+            fsync: Force data to disk (defaults to the spool setting)
+        """
+        if not records:
+            return
+        data = b"".join(dumps(record) + b"\n" for record in records)
+        with self._lock:
+            self._active.write(data)
+            self._total += len(data)
+            self._active.flush()
+            if self.fsync if fsync is None else fsync:
+                os.fsync(self._active.fileno())
+            self._stats["records_spooled"] += len(records)
+
+            if self._active.tell() >= self.segment_max_bytes:
+                self._active.close()
+                self._active_id += 1
+                self._active = self._open_segment(self._active_id)
+            self._enforce_limit()
+
+    def _enforce_limit(self) -> None:
+        while self._total > self.max_total_bytes and len(self._segments) > 1:
+            oldest = self._segments.pop(0)
+            size = self._remove_segment(oldest)
+            self._stats["segments_dropped"] += 1
+            self._stats["bytes_dropped"] += size
+            logger.error(f"Audit spool exceeded {self.max_total_bytes} bytes, dropped segment {oldest} ({size} bytes)")
+            if self._position[0] <= oldest:
+                self._store_position((self._segments[0], 0))
+
+    def _remove_segment(self, segment_id: int) -> int:
+        path = self._segment_path(segment_id)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        self._total -= size
+        return size
+
+    def _total_bytes(self) -> int:
+        total = 0
+        for segment_id in self._segments:
+            try:
+                total += os.path.getsize(self._segment_path(segment_id))
+            except FileNotFoundError:
+                continue
+        return total
+
+    # --- read side
+
+    def read_batch(self, max_records: int) -> tuple[list[dict[str, Any]], SpoolPosition]:
+        """
+        Read the next records to replay.
+
+        Args:
+            max_records: Max records to read
+
+        Returns:
+            (records, position after them) - pass the position to commit()
+            once the records were delivered
+        """
+        with self._lock:
+            self._active.flush()
+            segment_id, offset = self._position
+            records: list[dict[str, Any]] = []
+
+            for candidate in [s for s in self._segments if s >= segment_id]:
+                if candidate != segment_id:
+                    segment_id, offset = candidate, 0
+                is_active = segment_id == self._active_id
+                with open(self._segment_path(segment_id), "rb") as f:
+                    f.seek(offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            if not is_active:
+                                # Оборванная при падении запись
+                                self._stats["records_skipped"] += 1
+                                offset += len(line)
+                            break
+                        offset += len(line)
+                        try:
+                            records.append(loads(line))
+                        except ValueError:
+                            self._stats["records_skipped"] += 1
+                        if len(records) >= max_records:
+                            return records, (segment_id, offset)
+                if is_active:
+                    break
+
+            return records, (segment_id, offset)
+
+    def commit(self, position: SpoolPosition, replayed: int = 0) -> None:
+        """
+        Confirm delivery of records up to position and delete consumed segments.
+
+        Args:
+            position: Position returned by read_batch()
+            replayed: Number of records delivered (for statistics)
+        """
+        with self._lock:
+            self._store_position(position)
+            self._stats["records_replayed"] += replayed
+            while self._segments and self._segments[0] < position[0]:
+                self._remove_segment(self._segments.pop(0))
+
+    @property
+    def pending_bytes(self) -> int:
+        """Bytes not yet replayed."""
+        with self._lock:
+            return max(0, self._total - self._consumed_bytes())
+
+    def _consumed_bytes(self) -> int:
+        # Байты удалённых сегментов уже не учитываются в _total
+        return self._position[1] if self._position[0] in self._segments else 0
+
+    def close(self) -> None:
+        """Flush and close the active segment."""
+        with self._lock:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._active.close()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get spool statistics."""
+        with self._lock:
+            return {
+                **self._stats,
+                "segments": len(self._segments),
+                "total_bytes": self._total,
+                "pending_bytes": max(0, self._total - self._consumed_bytes()),
+            }
@@ -0,0 +1,122 @@
+"""Ranger-style audit summarization: collapses repeated events into one record."""
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+SummaryKey = tuple[Any, str, Any, Any, Any]
+
+
+def resource_prefix(resource: str) -> str:
+    """
+    Parent prefix of an audited resource.
+
+    "/bucket/dir/file.txt" -> "/bucket/dir/", "/bucket" -> "/bucket"
+    """
+    head, _, _ = resource.rpartition("/")
+    return f"{head}/" if head else resource
+
+
+class _Summary:
+    __slots__ = ("record", "prefix", "count", "first", "last", "mixed")
+
+    def __init__(self, record: dict[str, Any], prefix: str, now: float):
+        self.record = record
+        self.prefix = prefix
+        self.count = 1
+        self.first = now
+        self.last = now
+        self.mixed = False
+
+
+class AuditSummarizer:
+    """
+    Collapses identical audit events within a time window.
+
+    Events with the same (user, resource prefix, access, result, policy)
+    arriving within `window` seconds of the first one are merged into a
+    single record carrying event_count, event_dur_ms (first to last event)
+    and a seq_num. If the merged events touched different objects, the
+    record's resource is the common prefix. At most `max_keys` summaries
+    are held; beyond that the oldest one is emitted early.
+    """
+
+    def __init__(self, window: float, max_keys: int = 10000):
+        self.window = window
+        self.max_keys = max(1, max_keys)
+        self._pending: OrderedDict[SummaryKey, _Summary] = OrderedDict()
+        self._seq = 0
+        self.events_absorbed = 0
+        self.summaries_emitted = 0
+
+    def add(self, record: dict[str, Any], now: float | None = None) -> dict[str, Any] | None:
+        """
+        Account an audit event.
+
+        Args:
+            record: Audit record
+            now: Event time (time.monotonic())
+
+        Returns:
+            A summary evicted to respect max_keys, which must be sent now, or None
+        """
+        now = time.monotonic() if now is None else now
+        resource = record.get("resource", "")
+        prefix = resource_prefix(resource)
+        key = (record.get("reqUser"), prefix, record.get("access"), record.get("result"), record.get("policy"))
+
+        summary = self._pending.get(key)
+        if summary is not None:
+            summary.count += 1
+            summary.last = now
+            if not summary.mixed and resource != summary.record.get("resource"):
+                summary.mixed = True
+            self.events_absorbed += 1
+            return None
+
+        self._pending[key] = _Summary(record, prefix, now)
+        if len(self._pending) > self.max_keys:
+            _, oldest = self._pending.popitem(last=False)
+            return self._emit(oldest)
+        return None
+
+    def pop_expired(self, now: float | None = None) -> list[dict[str, Any]]:
+        """Emit summaries whose window has elapsed."""
+        if not self._pending:
+            return []
+        deadline = (time.monotonic() if now is None else now) - self.window
+        expired = []
+        # Порядок вставки = порядок первого события, истёкшие всегда в начале
+        while self._pending:
+            key = next(iter(self._pending))
+            if self._pending[key].first > deadline:
+                break
+            expired.append(self._emit(self._pending.pop(key)))
+        return expired
+
+    def pop_all(self) -> list[dict[str, Any]]:
+        """Emit all pending summaries (on shutdown)."""
+        summaries = [self._emit(summary) for summary in self._pending.values()]
+        self._pending.clear()
+        return summaries
+
+    def next_expiry(self, now: float | None = None) -> float | None:
+        """Seconds until the oldest pending summary must be emitted (None if nothing pending)."""
+        if not self._pending:
+            return None
+        first = next(iter(self._pending.values())).first
+        return max(0.0, first + self.window - (time.monotonic() if now is None else now))
+
+    def _emit(self, summary: _Summary) -> dict[str, Any]:
+        self._seq += 1
+        self.summaries_emitted += 1
+        record = summary.record
+        record["seq_num"] = self._seq
+        record["event_count"] = summary.count
+        record["event_dur_ms"] = int((summary.last - summary.first) * 1000)
+        if summary.mixed:
+            record["resource"] = summary.prefix
+        return record
+
+    def __len__(self) -> int:
+        return len(self._pending)
@@ -14,8 +14,12 @@ from app.service.cache import (
     get_cached_authorization,
     get_policies,
 )
-from app.service.constants import S3AccessType
+from app.service.constants import S3AccessType, S3ResourceType
+from app.service.policy_conditions import ConditionContext
 from app.service.policy_parser import PolicyChecker
+from app.service.s3_actions import s3_action_registry
+from app.service.security_zones import resolve_zone
+from app.service.service_router import resolve_service
 
 logger = logging.getLogger(__name__)
 
@@ -37,87 +41,28 @@ def extract_resource_from_path(path: str) -> tuple[str, str | None]:
     return bucket, object_path
 
 
-S3_READ_ACTIONS = [
-    's3:GetObject',
-    's3:GetObjectAcl',
-    's3:GetObjectTagging',
-    's3:GetObjectVersion',
-    's3:GetObjectVersionAcl',
-    's3:GetObjectVersionTagging',
-    's3:GetBucketAcl',
-    's3:GetBucketCORS',
-    's3:GetBucketLocation',
-    's3:GetBucketLogging',
-    's3:GetBucketNotification',
-    's3:GetBucketPolicy',
-    's3:GetBucketRequestPayment',
-    's3:GetBucketTagging',
-    's3:GetBucketVersioning',
-    's3:GetBucketWebsite',
-    's3:GetLifecycleConfiguration',
-    's3:GetReplicationConfiguration',
-]
-
-S3_LIST_ACTIONS = [
-    's3:ListBucket',
-    's3:ListBucketVersions',
-    's3:ListAllMyBuckets',
-    's3:ListMultipartUploadParts',
-    's3:ListBucketMultipartUploads',
-    's3:ListObjectsV2',
-    's3:ListBucket',
-    's3:ListBucketVersions',
-    's3:ListAllMyBuckets',
-    's3:ListMultipartUploadParts',
-]
-
-S3_WRITE_ACTIONS = [
-    's3:PutObject',
-    's3:PutObjectAcl',
-    's3:PutObjectTagging',
-    's3:PutObjectVersionAcl',
-    's3:PutObjectVersionTagging',
-    's3:PutBucketAcl',
-    's3:PutBucketCORS',
-    's3:PutBucketLogging',
-    's3:PutBucketNotification',
-    's3:PutBucketPolicy',
-    's3:PutBucketRequestPayment',
-    's3:PutBucketTagging',
-    's3:PutBucketVersioning',
-    's3:PutBucketWebsite',
-    's3:PutLifecycleConfiguration',
-    's3:PutReplicationConfiguration',
-    's3:RestoreObject',
-    's3:CreateBucket',
-]
-
-S3_DELETE_ACTIONS = [
-    's3:DeleteObject',
-    's3:DeleteObjectVersion',
-    's3:DeleteBucket',
-    's3:DeleteObjectTagging',
-    's3:DeleteObjectVersionTagging',
-    's3:AbortMultipartUpload',
-]
-
-
-def map_action_to_access_type(action: str) -> S3AccessType:
+# Тип доступа для действий, которых нет в реестре (None - отказ)
+_UNMAPPED_ACCESS = (
+    None if settings.S3_UNMAPPED_ACTION_ACCESS == "deny" else S3AccessType(settings.S3_UNMAPPED_ACTION_ACCESS)
+)
+
+
+def map_action_to_access_type(action: str, object_path: str | None = None) -> S3AccessType | None:
     """
-    Маппинг HTTP-метода в Ranger access type.
-    GET/HEAD = read, PUT/POST = write, DELETE = delete, иначе read.
-    Может быть скорректировано выше (например, GET bucket → list).
+    Маппинг S3-действия MinIO в Ranger access type по реестру s3_actions.
+    Действия не из реестра учитываются в статистике реестра и получают
+    S3_UNMAPPED_ACTION_ACCESS (None - запрос отклоняется).
+
+    Raises:
+        ValueError: действие уровня объекта пришло без object-ключа
     """
-    if action in S3_READ_ACTIONS:
-        return S3AccessType.READ
-    elif action in S3_WRITE_ACTIONS:
-        return S3AccessType.WRITE
-    elif action in S3_DELETE_ACTIONS:
-        return S3AccessType.DELETE
-    elif action in S3_LIST_ACTIONS:
-        return S3AccessType.LIST
-    else:
-        return S3AccessType.ADMIN
+    entry = s3_action_registry.lookup(action)
+    if entry is None:
+        return _UNMAPPED_ACCESS
+    if entry.resource is S3ResourceType.OBJECT and not object_path:
+        # Иначе объектное действие проверялось бы как запрос к бакету
+        raise ValueError(f"Action {action} requires an object key")
+    return entry.access
 
 
 async def check_authorization(
@@ -128,6 +73,7 @@ async def check_authorization(
     user_groups: list[str] | None = None,
     user_roles: list[str] | None = None,
     service_name: str | None = None,
+    conditions: dict | None = None,
 ) -> tuple[bool, bool, int]:
     """
     Проверяет авторизацию MinIO-запроса по загруженным политикам.
@@ -138,23 +84,26 @@ async def check_authorization(
         access_type (str): тип (read/write/delete/list)
         user_groups (list[str]|None): группы
         user_roles (list[str]|None): роли
-        service_name (str): Сервис в Ranger (по-умолчанию — config)
+        service_name (str): Сервис в Ranger (по-умолчанию — по маршрутам бакетов)
+        conditions (dict|None): условия запроса MinIO (SourceIp, CurrentTime, ...) для условий политик
     Return:
         (is_allowed: bool, is_audited: bool, policy_id: int)
     """
-    service = service_name or settings.RANGER_SERVICE_NAME
+    service = service_name or resolve_service(bucket)
     user_groups = user_groups or []
+    context = ConditionContext(conditions)
 
     # 1. Быстрый путь: берем кэш-результат
-    cached_result = get_cached_authorization(service, user, bucket, object_path, access_type)
+    cached_result = get_cached_authorization(service, user, bucket, object_path, access_type, context)
     if cached_result is not None:
-        logger.debug(f"Cache hit for {user} {bucket}/{object_path} {access_type}")
+        logger.debug("Cache hit for %s %s/%s %s", user, bucket, object_path, access_type)
         return cached_result
 
-    # 2. Политики из кэша политик
-    policies = get_policies(service)
+    # 2. Политики из кэша политик - только зоны ресурса (если зоны загружены)
+    zone = resolve_zone(service, bucket, object_path)
+    policies = get_policies(service, zone)
     if not policies:
-        logger.warning(f"No policies found for service {service}, denying access")
+        logger.warning("No policies found for service %s zone %r, denying access", service, zone)
         return False, False, 0
 
     # 3. Проверяем через PolicyChecker
@@ -166,8 +115,9 @@ async def check_authorization(
         bucket=bucket,
         object_path=object_path,
         access_type=access_type,
+        context=context,
     )
-    # 4. Кэшируем результат
+    # 4. Кэшируем результат (с учетом значений условий, от которых зависело решение)
     cache_authorization(
         service,
         user,
@@ -177,10 +127,63 @@ async def check_authorization(
         is_allowed,
         is_audited,
         policy_id,
+        context,
     )
     if is_allowed:
-        logger.info(f"✔️ Access granted: user={user} bucket={bucket} object={object_path} type={access_type} via policy={policy_id}")
+        logger.debug(
+            "✔️ Access granted: user=%s bucket=%s object=%s type=%s via policy=%s",
+            user, bucket, object_path, access_type, policy_id,
+        )
     else:
-        logger.info(f"⛔ Access denied: user={user} bucket={bucket} object={object_path} type={access_type}")
+        logger.debug("⛔ Access denied: user=%s bucket=%s object=%s type=%s", user, bucket, object_path, access_type)
     return is_allowed, is_audited, policy_id
 
+
+
+def explain_authorization(
+    user: str,
+    bucket: str,
+    object_path: str | None,
+    access_type: str,
+    user_groups: list[str] | None = None,
+    user_roles: list[str] | None = None,
+    service_name: str | None = None,
+    conditions: dict | None = None,
+) -> dict:
+    """
+    Повторяет проверку авторизации с трассировкой решения (режим explain).
+
+    Кэш авторизации не читается и не заполняется - политики всегда
+    проверяются заново, чтобы трассировка отражала текущие политики.
+    Args: те же, что у check_authorization
+    Return:
+        dict с решением и трассировкой по каждой просмотренной политике
+    """
+    service = service_name or resolve_service(bucket)
+    user_groups = user_groups or []
+    user_roles = user_roles or []
+    zone = resolve_zone(service, bucket, object_path)
+    policies = get_policies(service, zone)
+    trace: list[dict] = []
+
+    is_allowed, is_audited, policy_id = PolicyChecker.check_access(
+        policies=policies or [],
+        user=user,
+        user_groups=user_groups,
+        user_roles=user_roles,
+        bucket=bucket,
+        object_path=object_path,
+        access_type=access_type,
+        trace=trace,
+        context=ConditionContext(conditions),
+    )
+    return {
+        "result": is_allowed,
+        "audited": is_audited,
+        "policy_id": policy_id if is_allowed else None,
+        "service": service,
+        "zone": zone,
+        "policies_evaluated": len(trace),
+        "policies_loaded": len(policies or []),
+        "trace": trace,
+    }
@@ -7,23 +7,39 @@ from typing import Any
 from cachetools import TTLCache
 
 from app.core.config import settings
+from app.service.metrics import CACHE_REQUESTS
+from app.service.policy_conditions import ConditionContext
 
 # Cache for policies by service name
 # Key: service_name
 # Value: list of policy dicts
 _policy_cache: dict[str, list[dict[str, Any]]] = {}
 
+# Поколение политик сервиса: входит в ключ кэша решений, поэтому решения,
+# принятые по прежним политикам, не используются после их замены
+_policy_generations: dict[str, int] = {}
+
+# Политики сервиса, разбитые по security zone (zoneName, "" - вне зон)
+_policy_partitions: dict[str, dict[str, list[dict[str, Any]]]] = {}
+
 _servicedef_cache: dict[str, int] = {}
 
 # TTL cache for authorization results
 # Key: (service, user, bucket, object, access_type)
-# Value: (is_allowed, is_audited)
-_authorization_cache: TTLCache[str, tuple[bool, bool]] = TTLCache(
+# Value: (condition inputs the decision depends on, {their values: (is_allowed, is_audited, policy_id)})
+_authorization_cache: TTLCache[str, tuple[tuple[str, ...], dict[tuple, tuple[bool, bool, int]]]] = TTLCache(
     maxsize=10000,
     ttl=settings.RANGER_CACHE_TTL,
 )
 
 
+# Сколько разных значений условий хранить на один ключ (например, SourceIp клиентов)
+MAX_CONDITION_VARIANTS = 256
+
+_AUTHORIZATION_HIT = ("authorization", "hit")
+_AUTHORIZATION_MISS = ("authorization", "miss")
+
+
 def _make_cache_key(
     service: str,
     user: str,
@@ -31,9 +47,10 @@ def _make_cache_key(
     object_path: str | None,
     access_type: str,
 ) -> str:
-    """Create a cache key from authorization parameters."""
+    """Create a cache key from authorization parameters and the policy generation of the service."""
     key_data = {
         "service": service,
+        "generation": _policy_generations.get(service, 0),
         "user": user,
         "bucket": bucket,
         "object": object_path,
@@ -49,15 +66,50 @@ def get_cached_authorization(
     bucket: str,
     object_path: str | None,
     access_type: str,
-) -> tuple[bool, bool] | None:
+    context: ConditionContext | None = None,
+) -> tuple[bool, bool, int] | None:
     """
     Get cached authorization result.
 
+    If the cached decision depended on policy conditions, it is returned
+    only for the same values of those condition inputs.
+
     Returns:
-        Tuple of (is_allowed, is_audited) or None if not cached
+        Tuple of (is_allowed, is_audited, policy_id) or None if not cached
     """
-    cache_key = _make_cache_key(service, user, bucket, object_path, access_type)
-    return _authorization_cache.get(cache_key)
+    result = _lookup(_make_cache_key(service, user, bucket, object_path, access_type), context)
+    CACHE_REQUESTS.inc(_AUTHORIZATION_MISS if result is None else _AUTHORIZATION_HIT)
+    return result
+
+
+def _lookup(cache_key: str, context: ConditionContext | None) -> tuple[bool, bool, int] | None:
+    """Decision cached under a key for the condition input values of the request."""
+    entry = _authorization_cache.get(cache_key)
+    if entry is None:
+        return None
+    inputs, decisions = entry
+    if not inputs:
+        return decisions.get(())
+    if context is None:
+        return None
+    return decisions.get(context.cache_values(inputs))
+
+
+def is_authorization_cached(
+    service: str,
+    user: str,
+    bucket: str,
+    object_path: str | None,
+    access_type: str,
+    context: ConditionContext | None = None,
+) -> bool:
+    """
+    Check whether get_cached_authorization would return a decision (without counting a cache lookup).
+
+    A decision that depends on conditions counts as cached only for the
+    same values of those condition inputs.
+    """
+    return _lookup(_make_cache_key(service, user, bucket, object_path, access_type), context) is not None
 
 
 def cache_authorization(
@@ -69,10 +121,28 @@ def cache_authorization(
     is_allowed: bool,
     is_audited: bool,
     policy_id: int,
+    context: ConditionContext | None = None,
 ) -> None:
-    """Cache authorization result."""
+    """
+    Cache authorization result.
+
+    The decision is keyed by the values of the condition inputs consulted
+    while evaluating it (context.used). Inputs are accumulated per key:
+    another request may reach other conditions, and a decision is only
+    reused when every input seen for this key has the same value.
+    """
     cache_key = _make_cache_key(service, user, bucket, object_path, access_type)
-    _authorization_cache[cache_key] = (is_allowed, is_audited, policy_id)
+    entry = _authorization_cache.get(cache_key)
+    used = context.used if context is not None else ()
+    if entry is None or not set(entry[0]).issuperset(used):
+        inputs = tuple(sorted(set(entry[0] if entry else ()) | set(used)))
+        entry = _authorization_cache[cache_key] = (inputs, {})
+    inputs, decisions = entry
+    if inputs and context is None:
+        return
+    if len(decisions) >= MAX_CONDITION_VARIANTS:
+        decisions.clear()
+    decisions[context.cache_values(inputs) if inputs else ()] = (is_allowed, is_audited, policy_id)
 
 
 def clear_cache() -> None:
@@ -80,14 +150,27 @@ def clear_cache() -> None:
     _authorization_cache.clear()
 
 
-def get_policies(service_name: str) -> list[dict[str, Any]]:
-    """Get cached policies for a service."""
-    return _policy_cache.get(service_name, [])
+def get_policies(service_name: str, zone: str | None = None) -> list[dict[str, Any]]:
+    """Get cached policies for a service (only those of a security zone if zone is given)."""
+    if zone is None:
+        return _policy_cache.get(service_name, [])
+    return _policy_partitions.get(service_name, {}).get(zone, [])
 
 
 def set_policies(service_name: str, policies: list[dict[str, Any]]) -> None:
-    """Cache policies for a service."""
+    """
+    Cache policies for a service, partitioned by security zone.
+
+    Starts a new policy generation of the service: authorization results
+    cached for the previous policies are no longer returned (they expire
+    from the TTL cache on their own).
+    """
+    partitions: dict[str, list[dict[str, Any]]] = {}
+    for policy in policies:
+        partitions.setdefault(policy.get("zoneName") or "", []).append(policy)
+    _policy_partitions[service_name] = partitions
     _policy_cache[service_name] = policies
+    _policy_generations[service_name] = _policy_generations.get(service_name, 0) + 1
 
 
 def get_servisedef_id(servicedef_name: str) -> int | None:
@@ -103,12 +186,14 @@ def set_servisedef_id(servicedef_name: str, servicedef_id: int) -> None:
 def clear_policy_cache() -> None:
     """Clear all cached policies."""
     _policy_cache.clear()
+    _policy_partitions.clear()
 
 
 def get_cache_stats() -> dict[str, Any]:
     """Get cache statistics."""
     return {
         "policies_services": len(_policy_cache),
+        "policy_generations": dict(_policy_generations),
         "authorization_cache_size": len(_authorization_cache),
         "authorization_cache_maxsize": _authorization_cache.maxsize,
         "authorization_cache_ttl": _authorization_cache.ttl,
@@ -15,6 +15,7 @@ class S3AccessType(Enum):
 
 
 class S3ResourceType(Enum):
+    SERVICE = 0
     BUCKET = 1
     OBJECT = 2
 
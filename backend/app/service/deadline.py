@@ -0,0 +1,37 @@
+"""Per-request latency budget for /check."""
+
+import time
+
+
+class DeadlineExceeded(Exception):
+    """The request budget ran out and the stage has no degraded fallback."""
+
+
+class Deadline:
+    """
+    Latency budget of one request, counted from its start (perf_counter).
+
+    Stages ask for the remaining time to bound their waits and switch to a
+    degraded fallback (stale data, deferred audit, default decision) once
+    the budget is spent.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, budget: float, started: float | None = None):
+        self.expires_at = (time.perf_counter() if started is None else started) + budget
+
+    def remaining(self) -> float:
+        """Seconds left (0 if the budget is spent)."""
+        return max(0.0, self.expires_at - time.perf_counter())
+
+    @property
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.expires_at
+
+
+# Метки CHECK_FALLBACKS: (этап, что использовано вместо нормального пути)
+FALLBACK_STALE_GROUPS = ("user_groups", "stale")
+FALLBACK_DEFAULT_DECISION = ("user_groups", "default_decision")
+FALLBACK_DEFERRED_AUDIT = ("audit", "deferred")
+
@@ -1,11 +1,138 @@
+"""
+IP whitelist compiled into sorted integer ranges.
+
+Entries (single addresses or CIDRs) are parsed once into merged
+[start, end] ranges per address family; a lookup is a binary search over
+the range starts, so thousands of CIDRs cost the same as a handful.
+"""
 import ipaddress
 import logging
+from bisect import bisect_right
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class CompiledWhitelist:
+    """Immutable whitelist: per address family, sorted non-overlapping ranges."""
+
+    __slots__ = ("starts", "ends", "size", "invalid")
+
+    def __init__(self, entries: list[str]):
+        ranges: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+        self.invalid: list[str] = []
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                self.invalid.append(entry)
+                continue
+            ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+        self.starts: dict[int, list[int]] = {}
+        self.ends: dict[int, list[int]] = {}
+        for version, family_ranges in ranges.items():
+            merged: list[list[int]] = []
+            for start, end in sorted(family_ranges):
+                # Пересекающиеся и соседние диапазоны склеиваются
+                if merged and start <= merged[-1][1] + 1:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            self.starts[version] = [start for start, _ in merged]
+            self.ends[version] = [end for _, end in merged]
+        self.size = len(entries) - len(self.invalid)
+
+    def contains(self, version: int, ip: int) -> bool:
+        starts = self.starts[version]
+        i = bisect_right(starts, ip) - 1
+        return i >= 0 and ip <= self.ends[version][i]
+
+
+@lru_cache(maxsize=65536)
+def parse_ip(client_ip: str) -> tuple[int, int] | None:
+    """(версия, адрес как int) или None для некорректного адреса; IPv4-mapped IPv6 - как IPv4."""
+    try:
+        ip = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return None
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.version, int(ip)
+
+
+def _read_entries() -> list[str]:
+    """Записи whitelist: IP_WHITELIST_RAW плюс файл IP_WHITELIST_FILE (по записи в строке, # - комментарий)."""
+    entries = list(settings.IP_WHITELIST)
+    if settings.IP_WHITELIST_FILE:
+        for line in Path(settings.IP_WHITELIST_FILE).read_text().splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                entries.append(line)
+    return entries
+
+
+class IPWhitelist:
+    """
+    Holds the compiled whitelist and swaps it atomically on reload.
+
+    The list is loaded at startup (and by the admin reload), never on the
+    request path; until it is loaded every address is denied.
+    """
+
+    def __init__(self) -> None:
+        self._compiled = CompiledWhitelist([])
+        self._loaded = False
+
+    def reload(self, entries: list[str] | None = None) -> dict[str, Any]:
+        """
+        Compile the whitelist again (from settings and IP_WHITELIST_FILE by default).
+
+        Args:
+            entries: Explicit list of addresses/CIDRs (optional)
+
+        Returns:
+            Stats of the new whitelist
+
+        Raises:
+            OSError: IP_WHITELIST_FILE cannot be read (the previous list stays active)
+        """
+        compiled = CompiledWhitelist(_read_entries() if entries is None else entries)
+        if compiled.invalid:
+            logger.warning(f"Skipped {len(compiled.invalid)} invalid IP whitelist entries: {compiled.invalid[:10]}")
+        self._compiled = compiled
+        self._loaded = True
+        logger.info(f"Loaded IP whitelist: {compiled.size} entries")
+        return self.get_stats()
+
+    def is_allowed(self, client_ip: str) -> bool:
+        if not self._loaded:
+            return False
+        parsed = parse_ip(client_ip)
+        if parsed is None:
+            logger.warning("Invalid IP address %s", client_ip)
+            return False
+        return self._compiled.contains(*parsed)
+
+    def get_stats(self) -> dict[str, Any]:
+        compiled = self._compiled
+        return {
+            "loaded": self._loaded,
+            "entries": compiled.size,
+            "invalid_entries": len(compiled.invalid),
+            "ipv4_ranges": len(compiled.starts[4]),
+            "ipv6_ranges": len(compiled.starts[6]),
+            "parsed_ip_cache": parse_ip.cache_info()._asdict(),
+        }
+
+
+ip_whitelist = IPWhitelist()
+
+
 def is_ip_allowed(client_ip: str) -> bool:
     """
     Проверяет, разрешен ли IP-адрес.
@@ -14,29 +141,6 @@ def is_ip_allowed(client_ip: str) -> bool:
         client_ip: IP-адрес клиента
 
     Returns:
-        bool: True если IP разрешен, иначе False
+        bool: True если IP разрешен, иначе False (пустой или не загруженный whitelist не разрешает ничего)
     """
-    if not settings.IP_WHITELIST:
-        return False
-
-    try:
-        ip = ipaddress.ip_address(client_ip)
-
-        # Проверяем каждый паттерн из whitelist
-        for allowed_pattern in settings.IP_WHITELIST:
-            # Если это CIDR-нотация
-            if "/" in allowed_pattern:
-                network = ipaddress.ip_network(allowed_pattern, strict=False)
-                if ip in network:
-                    return True
-            # Если это конкретный IP
-            else:
-                allowed_ip = ipaddress.ip_address(allowed_pattern)
-                if ip == allowed_ip:
-                    return True
-
-        return False
-
-    except ValueError as e:
-        logger.warning(f"Invalid IP address {client_ip}: {e}")
-        return False
+    return ip_whitelist.is_allowed(client_ip)
@@ -0,0 +1,112 @@
+"""Incremental parser for large JSON arrays received in chunks."""
+
+import codecs
+import json
+from typing import Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class JSONArrayStream:
+    """
+    Parses a top-level JSON array element by element as bytes arrive.
+
+    Only complete elements are decoded; the unparsed tail of the buffer is
+    kept until the next chunk, so memory stays proportional to the largest
+    element rather than to the whole payload.
+
+    Usage:
+        stream = JSONArrayStream()
+        async for chunk in response.aiter_bytes():
+            for item in stream.feed(chunk):
+                ...
+        stream.close()
+    """
+
+    def __init__(self) -> None:
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # start -> first (после '[') -> separator -> value -> ... -> done
+        self._state = "start"
+
+    def _skip_whitespace(self) -> int:
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        """
+        Feed the next chunk of the payload.
+
+        Args:
+            chunk: Raw bytes of the response body
+
+        Returns:
+            Elements completed by this chunk (may be empty)
+
+        Raises:
+            ValueError: If the payload is not a JSON array
+        """
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk)
+        self._pos = 0
+        items: list[Any] = []
+
+        while self._state != "done":
+            pos = self._skip_whitespace()
+            if pos >= len(self._buffer):
+                break
+            char = self._buffer[pos]
+
+            if self._state == "start":
+                if char != "[":
+                    raise ValueError(f"Expected JSON array, got {char!r}")
+                self._pos += 1
+                self._state = "first"
+                continue
+
+            if self._state in ("first", "separator"):
+                if char == "]":
+                    self._pos += 1
+                    self._state = "done"
+                    break
+                if self._state == "separator":
+                    if char != ",":
+                        raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+                    self._pos += 1
+                    self._state = "value"
+                    continue
+
+            try:
+                item, end = _decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент ещё не пришёл целиком - ждём следующий chunk
+                break
+            if end >= len(self._buffer) or (
+                isinstance(item, int | float) and not self._buffer[end:].lstrip(_NUMBER_CHARS)
+            ):
+                # Число/литерал на границе chunk'а может быть обрезано ("-1." + "5e3")
+                break
+            items.append(item)
+            self._pos = end
+            self._state = "separator"
+
+        return items
+
+    def close(self) -> None:
+        """
+        Finish parsing.
+
+        Raises:
+            ValueError: If the payload ended before the array was closed
+        """
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(b"", final=True)
+        self._pos = 0
+        if self._state != "done":
+            raise ValueError("Unexpected end of JSON array")
+        if self._buffer.strip():
+            raise ValueError("Extra data after JSON array")
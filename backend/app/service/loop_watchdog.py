@@ -0,0 +1,122 @@
+"""Event loop lag watchdog: measures loop lag and captures stacks of blocking code."""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any
+
+from app.core.config import settings
+from app.service.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+from app.service.profiler import collapse_stack
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    """
+    Measures event loop lag and catches the code that blocks the loop.
+
+    A heartbeat task sleeps `interval` seconds and records how late it woke
+    up (the loop lag) into a histogram. A separate thread checks the
+    heartbeat; when it is older than `stall_threshold`, the loop is blocked
+    right now, so the thread captures the loop thread's current stack -
+    the blocking code itself - once per stall.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.LOOP_WATCHDOG_INTERVAL,
+        stall_threshold: float = settings.LOOP_STALL_THRESHOLD_MS / 1000,
+        keep_stalls: int = 20,
+    ):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stalls: deque[dict[str, Any]] = deque(maxlen=keep_stalls)
+        self._heartbeat = time.perf_counter()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._stats = {"last_lag_ms": 0.0, "max_lag_ms": 0.0, "stalls": 0}
+
+    def start(self) -> None:
+        """Start the heartbeat task and the watchdog thread (call from the event loop)."""
+        if self._task is not None and not self._task.done():
+            logger.warning("Loop watchdog already running")
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Started loop watchdog: interval={self.interval}s, "
+            f"stall_threshold={self.stall_threshold * 1000:.0f}ms"
+        )
+
+    def stop(self) -> None:
+        """Stop the heartbeat task and the watchdog thread."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - started - self.interval)
+            self._heartbeat = now
+            LOOP_LAG_SECONDS.observe(lag)
+            self._stats["last_lag_ms"] = round(lag * 1000, 2)
+            if lag * 1000 > self._stats["max_lag_ms"]:
+                self._stats["max_lag_ms"] = round(lag * 1000, 2)
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        check_interval = min(self.interval, self.stall_threshold) / 2
+        while not self._stop.wait(check_interval):
+            heartbeat = self._heartbeat
+            # Пульс должен обновляться каждые interval секунд
+            blocked_for = time.perf_counter() - heartbeat - self.interval
+            if blocked_for < self.stall_threshold or heartbeat == reported_heartbeat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            # Один снимок на зависание: следующий - только после нового пульса
+            reported_heartbeat = heartbeat
+            self._record_stall(blocked_for, frame)
+
+    def _record_stall(self, blocked_for: float, frame) -> None:
+        stack = "".join(traceback.format_stack(frame))
+        self._stats["stalls"] += 1
+        LOOP_STALLS.inc()
+        self.stalls.append({
+            "at": time.time(),
+            "blocked_ms": round(blocked_for * 1000, 1),
+            "collapsed": collapse_stack(frame),
+            "stack": stack,
+        })
+        logger.warning(f"Event loop blocked for more than {blocked_for * 1000:.0f}ms, stack:\n{stack}")
+
+    def get_stats(self) -> dict[str, Any]:
+        """Lag statistics and the most recent stalls with their stacks."""
+        return {
+            **self._stats,
+            "interval": self.interval,
+            "stall_threshold_ms": self.stall_threshold * 1000,
+            "recent_stalls": list(self.stalls),
+        }
+
+
+loop_watchdog = LoopWatchdog()
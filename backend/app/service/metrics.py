@@ -0,0 +1,191 @@
+"""
+Lightweight in-process metrics in the Prometheus text format.
+
+Recording is a dict/list update (histograms: one bisect over the bucket
+bounds), so observations on the request path cost a fraction of a
+microsecond. Label children should be resolved once and kept in module
+constants on hot paths.
+"""
+
+import abc
+from bisect import bisect_left
+from typing import Any
+
+# Границы бакетов по умолчанию (секунды): от 50 мкс до 10 с
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = tuple[str, ...]
+
+_registry: list["_MetricFamily"] = []
+
+
+class Histogram:
+    """Histogram with fixed bucket bounds (non-cumulative counts, cumulated on render)."""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class _MetricFamily(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def _label_str(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values, strict=True)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        """Sample lines of the family in the text exposition format."""
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class HistogramFamily(_MetricFamily):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        bounds: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = bounds
+        self._children: dict[LabelValues, Histogram] = {}
+
+    def labels(self, *values: str) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Histogram(self.bounds)
+        return child
+
+    def samples(self) -> list[str]:
+        lines = []
+        for values, child in list(self._children.items()):
+            labels = self._label_str(values)
+            cumulative = 0
+            # counts длиннее bounds на корзину +Inf - она выводится отдельно
+            for bound, count in zip(self.bounds, child.counts, strict=False):
+                cumulative += count
+                bucket_labels = self._label_str(values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            cumulative += child.counts[-1]
+            bucket_labels = self._label_str(values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CounterFamily(_MetricFamily):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, values: LabelValues = (), amount: float = 1) -> None:
+        self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{self._label_str(values)} {value}" for values, value in list(self._values.items())]
+
+
+class GaugeFamily(CounterFamily):
+    """Gauge; usually filled from existing statistics right before rendering."""
+
+    type = "gauge"
+
+    def set(self, values: LabelValues, value: float) -> None:
+        self._values[values] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for family in _registry:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Метрики шлюза
+
+CHECK_STAGE_SECONDS = HistogramFamily(
+    "gateway_check_stage_seconds", "Duration of /check processing stages", ("stage",)
+)
+CHECK_DECISIONS = CounterFamily(
+    "gateway_check_decisions_total", "Authorization decisions by result and access type", ("result", "access")
+)
+CACHE_REQUESTS = CounterFamily(
+    "gateway_cache_requests_total", "Cache lookups by cache and outcome", ("cache", "outcome")
+)
+CACHE_ENTRIES = GaugeFamily("gateway_cache_entries", "Entries currently held per cache", ("cache",))
+POLICY_COUNT = GaugeFamily("gateway_policies", "Policies loaded per Ranger service", ("service",))
+POLICY_AGE_SECONDS = GaugeFamily(
+    "gateway_policy_age_seconds", "Seconds since the last successful policy refresh", ("service",)
+)
+RANGER_REQUEST_SECONDS = HistogramFamily(
+    "gateway_ranger_request_seconds", "Ranger API request latency (until response headers)", ("endpoint",)
+)
+RANGER_REQUEST_ERRORS = CounterFamily(
+    "gateway_ranger_request_errors_total", "Failed Ranger API requests", ("endpoint",)
+)
+SOLR_REQUEST_SECONDS = HistogramFamily(
+    "gateway_solr_request_seconds", "Solr audit batch request latency", ("node",)
+)
+SOLR_REQUEST_ERRORS = CounterFamily("gateway_solr_request_errors_total", "Failed Solr audit requests", ("node",))
+CHECK_ADMISSION = CounterFamily(
+    "gateway_check_admission_total", "/check admission outcomes by priority", ("priority", "outcome")
+)
+CHECK_QUEUE_WAIT_SECONDS = HistogramFamily(
+    "gateway_check_queue_wait_seconds", "Time /check requests waited for an admission slot", ("priority",)
+)
+CHECK_FALLBACKS = CounterFamily(
+    "gateway_check_fallbacks_total", "Degraded fallbacks taken when the /check deadline ran out", ("stage", "fallback")
+)
+S3_UNMAPPED_ACTIONS = CounterFamily(
+    "gateway_s3_unmapped_actions_total", "Requests with S3 actions missing from the action registry", ("action",)
+)
+CHECK_IN_FLIGHT = GaugeFamily("gateway_check_in_flight", "/check requests in flight and queued", ("state",))
+AUDIT_PIPELINE = GaugeFamily("gateway_audit_pipeline", "Audit pipeline statistics", ("stat",))
+AUDIT_SINK = GaugeFamily("gateway_audit_sink", "Audit sink delivery statistics", ("sink", "stat"))
+LOOP_LAG_SECONDS = HistogramFamily(
+    "gateway_event_loop_lag_seconds", "How late the event loop heartbeat woke up"
+).labels()
+LOOP_STALLS = CounterFamily("gateway_event_loop_stalls_total", "Event loop stalls above LOOP_STALL_THRESHOLD_MS")
@@ -0,0 +1,154 @@
+"""Compiles policies streamed from Ranger into the form kept in the policy cache."""
+
+import logging
+from collections.abc import AsyncIterable, Iterable
+from typing import Any
+
+from app.service.policy_conditions import compile_conditions
+from app.service.policy_schedule import parse_validity_schedules
+
+logger = logging.getLogger(__name__)
+
+# Поля политики, которые используются при проверке доступа и аудите.
+# Остальное (description, guid, createTime, ...) не держим в памяти.
+POLICY_FIELDS = (
+    "id",
+    "name",
+    "version",
+    "service",
+    "isEnabled",
+    "isAuditEnabled",
+    "resources",
+    "policyItems",
+    "zoneName",
+)
+
+# Номера битов типов доступа. Только дополняются, поэтому маски, собранные
+# до перезагрузки servicedef, остаются корректными.
+_access_bits: dict[str, int] = {}
+
+# Замыкание impliedGrants из servicedef: тип доступа -> маска всех типов, которые он дает
+_implied_masks: dict[str, int] = {}
+
+
+def access_bit(access_type: str) -> int:
+    """Bit of an access type (0 if the type never appeared in the servicedef or policies)."""
+    return _access_bits.get(access_type, 0)
+
+
+def _allocate_bit(access_type: str) -> int:
+    bit = _access_bits.get(access_type)
+    if bit is None:
+        bit = _access_bits[access_type] = 1 << len(_access_bits)
+    return bit
+
+
+def set_access_types(access_types: list[dict[str, Any]]) -> dict[str, list[str]]:
+    """
+    Compute the transitive impliedGrants closure of the servicedef access types.
+
+    Args:
+        access_types: accessTypes of the Ranger servicedef
+
+    Returns:
+        Access type -> all types it grants (itself included)
+    """
+    implied = {
+        item["name"]: [name for name in item.get("impliedGrants") or [] if isinstance(name, str)]
+        for item in access_types
+        if isinstance(item, dict) and isinstance(item.get("name"), str)
+    }
+    masks: dict[str, int] = {}
+    for access_type in implied:
+        # Обход в глубину: циклы в impliedGrants не страшны
+        mask = 0
+        stack = [access_type]
+        while stack:
+            name = stack.pop()
+            bit = _allocate_bit(name)
+            if mask & bit:
+                continue
+            mask |= bit
+            stack.extend(implied.get(name, ()))
+        masks[access_type] = mask
+
+    _implied_masks.clear()
+    _implied_masks.update(masks)
+    return {name: access_mask_names(mask) for name, mask in masks.items()}
+
+
+def access_mask(access_types: Iterable[str]) -> int:
+    """Mask of the access types together with everything they imply."""
+    mask = 0
+    for access_type in access_types:
+        mask |= _implied_masks.get(access_type) or _allocate_bit(access_type)
+    return mask
+
+
+def access_mask_names(mask: int) -> list[str]:
+    """Access type names of a mask."""
+    return [name for name, bit in _access_bits.items() if mask & bit]
+
+
+def item_access_mask(policy_item: dict[str, Any]) -> int:
+    """Effective access mask of a policy item: allowed accesses and their implied grants."""
+    return access_mask(
+        access["type"] for access in policy_item.get("accesses", [])
+        if access.get("isAllowed", False) and isinstance(access.get("type"), str)
+    )
+
+
+def compile_policy(policy: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    Compile a single Ranger policy.
+
+    Args:
+        policy: Policy dictionary as returned by Ranger
+
+    Each policy item gets the derived key "_access_mask": the bitmask of
+    its allowed access types with implied grants, so the evaluator checks
+    an access with a single bit test; items with conditions get
+    "_conditions" - the conditions compiled into predicate objects.
+    Policies with validitySchedules get "_validity" - the schedule
+    intervals as epoch seconds (see policy_schedule).
+
+    Returns:
+        Trimmed policy dictionary or None if the policy is disabled
+    """
+    if not policy.get("isEnabled", True):
+        return None
+    compiled = {field: policy[field] for field in POLICY_FIELDS if field in policy}
+    for policy_item in compiled.get("policyItems", []):
+        policy_item["_access_mask"] = item_access_mask(policy_item)
+        if policy_item.get("conditions"):
+            policy_item["_conditions"] = compile_conditions(policy_item["conditions"])
+    if policy.get("validitySchedules"):
+        compiled["_validity"] = parse_validity_schedules(policy["validitySchedules"], policy.get("id"))
+    return compiled
+
+
+async def compile_policies(policies: AsyncIterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Compile policies as they arrive from Ranger.
+
+    Policies are consumed one by one from the generator, so the raw page
+    can be released while the next one is being fetched.
+
+    Args:
+        policies: Async iterable of policy dictionaries
+
+    Returns:
+        List of compiled policies
+    """
+    compiled: list[dict[str, Any]] = []
+    skipped = 0
+    async for policy in policies:
+        result = compile_policy(policy)
+        if result is None:
+            skipped += 1
+            continue
+        compiled.append(result)
+
+    if skipped:
+        logger.debug(f"Skipped {skipped} disabled policies")
+    return compiled
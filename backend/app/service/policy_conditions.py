@@ -0,0 +1,230 @@
+"""
+Ranger policy item conditions compiled into predicate objects.
+
+Conditions are parsed once when policies are loaded (CIDR ranges, time
+windows), so evaluating them on a request is a bisect or an integer
+comparison. Inputs come from the `conditions` MinIO sends with /check.
+
+Supported condition types (all conditions of an item must match, any of
+the values of one condition):
+    ip-range          - SourceIp in addresses/CIDRs ("10.1.*" wildcards allowed)
+    time-window       - CurrentTime (UTC) in "HH:MM-HH:MM" windows, optionally
+                        prefixed with days: "Mon-Fri 09:00-18:00"
+    secure-transport  - SecureTransport equals the value ("true"/"false")
+Unknown types never match, so an item with them grants nothing.
+"""
+
+import abc
+import logging
+from datetime import datetime
+from typing import Any
+
+from app.service.ip_whitelist import CompiledWhitelist, parse_ip
+
+logger = logging.getLogger(__name__)
+
+SOURCE_IP = "SourceIp"
+CURRENT_TIME = "CurrentTime"
+SECURE_TRANSPORT = "SecureTransport"
+
+_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+class ConditionContext:
+    """
+    Condition inputs of one request, parsed lazily and at most once.
+
+    Records which inputs were consulted, so a decision can be cached under
+    the values of only those inputs.
+    """
+
+    __slots__ = ("conditions", "used", "_source_ip", "_minute")
+
+    def __init__(self, conditions: dict[str, Any] | None):
+        self.conditions = conditions or {}
+        self.used: set[str] = set()
+        self._source_ip: tuple[int, int] | None | bool = False
+        self._minute: tuple[int, int] | None | bool = False
+
+    def value(self, key: str) -> str | None:
+        """First value of a MinIO condition key."""
+        self.used.add(key)
+        values = self.conditions.get(key)
+        return values[0] if isinstance(values, list) and values and isinstance(values[0], str) else None
+
+    def source_ip(self) -> tuple[int, int] | None:
+        if self._source_ip is False:
+            value = self.value(SOURCE_IP)
+            self._source_ip = parse_ip(value) if value else None
+        return self._source_ip
+
+    def minute(self) -> tuple[int, int] | None:
+        """(weekday, minute of day) of CurrentTime in UTC."""
+        if self._minute is False:
+            self._minute = _parse_minute(self.value(CURRENT_TIME))
+        return self._minute
+
+    def cache_values(self, keys: tuple[str, ...]) -> tuple[str | None, ...]:
+        """Values of the inputs for a cache key; time is cut to minutes (window resolution)."""
+        values = []
+        for key in keys:
+            values.append(self.value(key) if key != CURRENT_TIME else _minute_token(self.value(key)))
+        return tuple(values)
+
+
+def _parse_minute(value: str | None) -> tuple[int, int] | None:
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.utcoffset():
+        moment = moment - moment.utcoffset()
+    return moment.weekday(), moment.hour * 60 + moment.minute
+
+
+def _minute_token(value: str | None) -> str | None:
+    parsed = _parse_minute(value)
+    return None if parsed is None else f"{parsed[0]}:{parsed[1]}"
+
+
+class Condition(abc.ABC):
+    """Compiled condition of a policy item."""
+
+    __slots__ = ("type", "values")
+
+    def __init__(self, condition_type: str, values: list[str]):
+        self.type = condition_type
+        self.values = values
+
+    @abc.abstractmethod
+    def matches(self, context: ConditionContext) -> bool:
+        """Whether the request inputs satisfy the condition."""
+
+
+class IpRangeCondition(Condition):
+    __slots__ = ("ranges",)
+
+    def __init__(self, condition_type: str, values: list[str]):
+        super().__init__(condition_type, values)
+        self.ranges = CompiledWhitelist([_wildcard_to_cidr(value) for value in values])
+        if self.ranges.invalid:
+            logger.warning(f"Invalid addresses in {condition_type} condition: {self.ranges.invalid}")
+
+    def matches(self, context: ConditionContext) -> bool:
+        source_ip = context.source_ip()
+        return source_ip is not None and self.ranges.contains(*source_ip)
+
+
+def _wildcard_to_cidr(value: str) -> str:
+    """Ranger-style "10.1.*" -> "10.1.0.0/16"."""
+    if not value.endswith("*") or ":" in value:
+        return value
+    octets = [octet for octet in value.split(".") if octet != "*"]
+    return ".".join(octets + ["0"] * (4 - len(octets))) + f"/{8 * len(octets)}"
+
+
+class TimeWindowCondition(Condition):
+    __slots__ = ("windows",)
+
+    def __init__(self, condition_type: str, values: list[str]):
+        super().__init__(condition_type, values)
+        # (битовая маска дней недели, начало, конец) в минутах от полуночи
+        self.windows = [_parse_window(value) for value in values]
+
+    def matches(self, context: ConditionContext) -> bool:
+        minute = context.minute()
+        if minute is None:
+            return False
+        weekday, minute_of_day = minute
+        for days, start, end in self.windows:
+            if start <= end:
+                if days & (1 << weekday) and start <= minute_of_day < end:
+                    return True
+            # Окно через полночь: вторая часть относится к следующему дню
+            elif (days & (1 << weekday) and minute_of_day >= start) or (
+                days & (1 << (weekday - 1) % 7) and minute_of_day < end
+            ):
+                return True
+        return False
+
+
+def _parse_window(value: str) -> tuple[int, int, int]:
+    """
+    "Mon-Fri 09:00-18:00" / "Sat,Sun 10:00-14:00" / "22:00-06:00".
+
+    Raises:
+        ValueError: malformed window
+    """
+    parts = value.split()
+    days = 0b1111111
+    if len(parts) == 2:
+        days = 0
+        for day_range in parts[0].lower().split(","):
+            first, _, last = day_range.partition("-")
+            start_day, end_day = _DAYS.index(first[:3]), _DAYS.index((last or first)[:3])
+            for day in range(start_day, (end_day if end_day >= start_day else end_day + 7) + 1):
+                days |= 1 << (day % 7)
+    elif len(parts) != 1:
+        raise ValueError(f"Malformed time window {value!r}")
+    start, end = (_parse_clock(clock) for clock in parts[-1].split("-"))
+    return days, start, end
+
+
+def _parse_clock(clock: str) -> int:
+    hours, minutes = clock.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class SecureTransportCondition(Condition):
+    __slots__ = ("required",)
+
+    def __init__(self, condition_type: str, values: list[str]):
+        super().__init__(condition_type, values)
+        self.required = {value.lower() for value in values}
+
+    def matches(self, context: ConditionContext) -> bool:
+        value = context.value(SECURE_TRANSPORT)
+        return value is not None and value.lower() in self.required
+
+
+class UnsupportedCondition(Condition):
+    """Condition the gateway cannot evaluate: never matches (fail closed)."""
+
+    __slots__ = ()
+
+    def matches(self, context: ConditionContext) -> bool:
+        return False
+
+
+CONDITION_TYPES: dict[str, type[Condition]] = {
+    "ip-range": IpRangeCondition,
+    "time-window": TimeWindowCondition,
+    "secure-transport": SecureTransportCondition,
+}
+
+
+def compile_conditions(conditions: list[dict[str, Any]] | None) -> tuple[Condition, ...]:
+    """
+    Compile the conditions of a policy item.
+
+    Args:
+        conditions: Ranger item conditions ([{"type": ..., "values": [...]}])
+
+    Returns:
+        Compiled conditions (empty tuple if the item has none)
+    """
+    compiled = []
+    for condition in conditions or []:
+        condition_type = condition.get("type", "")
+        values = [value for value in condition.get("values") or [] if isinstance(value, str)]
+        condition_class = CONDITION_TYPES.get(condition_type)
+        try:
+            if condition_class is None:
+                raise ValueError("unsupported condition type")
+            compiled.append(condition_class(condition_type, values))
+        except ValueError as e:
+            logger.warning(f"Condition {condition_type} {values} never matches: {e}")
+            compiled.append(UnsupportedCondition(condition_type, values))
+    return tuple(compiled)
@@ -2,103 +2,266 @@
 
 import asyncio
 import logging
+import random
+import time
 from typing import Any
 
 from app.core.config import settings
-from app.service.cache import set_policies, set_servisedef_id
+from app.service.cache import set_servisedef_id
+from app.service.policy_compiler import compile_policies, set_access_types
+from app.service.policy_schedule import policy_schedule
 from app.service.ranger_client import RangerClient
+from app.service.security_zones import get_zone_stats, set_zones
 
 logger = logging.getLogger(__name__)
 
-# Background task
-_policy_loader_task: asyncio.Task | None = None
+# Background tasks: one independent loader per Ranger service
+_policy_loader_tasks: dict[str, asyncio.Task] = {}
 _loader_running = False
 
+# Push-triggered reload requests per service
+_refresh_events: dict[str, asyncio.Event] = {}
 
-async def load_policies(ranger_client: RangerClient, service_name: str | None = None) -> list[dict[str, Any]]:
+# Refresh statistics per service
+_refresh_stats: dict[str, dict[str, Any]] = {}
+
+
+async def load_policies(
+    ranger_client: RangerClient,
+    service_name: str | None = None,
+    fetch_stats: dict[str, int] | None = None,
+) -> list[dict[str, Any]]:
     """
     Load policies from Ranger for a service.
 
     Args:
         ranger_client: RangerClient
         service_name: Service name (defaults to config)
+        fetch_stats: Optional dict filled with payload_bytes/pages of the fetch
 
     Returns:
-        List of policy dictionaries
+        List of all compiled policies (including those outside their validity schedules)
+
+    Raises:
+        Exception: If policies (or, with RANGER_SECURITY_ZONES_ENABLED, security zones)
+            could not be loaded (previous policies stay cached)
     """
     service = service_name or settings.RANGER_SERVICE_NAME
     servicedef = settings.RANGER_SERVICEDEF_NAME
 
+    # servicedef - до политик: по его accessTypes/impliedGrants собираются маски доступа политик
     try:
-        policies = await ranger_client.get_policies(service)
-        logger.info(f"Loaded {len(policies)} policies for service {service}")
-        set_policies(service, policies)
+        servicedef_data = await ranger_client.get_servicedef(servicedef)
+        if servicedef_data is not None:
+            servicedef_id = servicedef_data.get("id")
+            logger.info(f"Loaded {servicedef_id} servicedef for servicedef {servicedef}")
+            set_servisedef_id(servicedef, servicedef_id)
+            implied = set_access_types(servicedef_data.get("accessTypes") or [])
+            logger.debug(f"Access types of {servicedef} with implied grants: {implied}")
     except Exception as e:
-        logger.error(f"Error loading policies for service {service}: {e}")
-        return []
+        logger.error(f"Error loading servicedef for servicedef {servicedef}: {e}")
+
+    # Зоны - тоже до политик: без них не понять, какие политики относятся к запросу, поэтому
+    # обновление не применяется (прежние политики и зоны остаются, до первой загрузки - отказ)
+    zones = None
+    if settings.RANGER_SECURITY_ZONES_ENABLED:
+        zones = await ranger_client.get_security_zones()
+        if zones is None:
+            logger.error(f"Security zones for service {service} not loaded, keeping previous policies")
+            raise RuntimeError(f"Security zones for service {service} could not be loaded")
 
     try:
-        servicedef_id = await ranger_client.get_servicedef_id_by_name(servicedef)
-        logger.info(f"Loaded {servicedef_id} servicedef for servicedef {servicedef}")
-        set_servisedef_id(servicedef, servicedef_id)
+        policies = await compile_policies(ranger_client.iter_policies(service, fetch_stats=fetch_stats))
+        if zones is not None:
+            # Индекс зон меняется вместе с политиками, чтобы зоны и zoneName политик соответствовали друг другу
+            zone_index = set_zones(service, zones)
+            logger.info(f"Loaded {len(zone_index.zone_names)} security zones for service {service}")
+        # В индекс попадают только действующие сейчас политики, остальные ждут своей границы
+        active = policy_schedule.publish(service, policies)
+        logger.info(f"Loaded {len(policies)} policies for service {service}, {len(active)} active")
     except Exception as e:
-        logger.error(f"Error loading servicedef_id for servicedef {servicedef}: {e}")
-        return []
+        logger.error(f"Error loading policies for service {service}: {e}")
+        raise
 
     return policies
 
 
-async def policy_loader_loop(ranger_client: RangerClient, interval: int = 300) -> None:
+def _next_delay(interval: float, failures: int) -> float:
+    """
+    Delay before the next scheduled refresh.
+
+    Exponential backoff after failures (capped by RANGER_REFRESH_MAX_BACKOFF)
+    plus +-RANGER_REFRESH_JITTER spread, so replicas started together
+    do not hit Ranger in lockstep.
+    """
+    delay = interval
+    if failures:
+        delay = min(interval * 2 ** failures, settings.RANGER_REFRESH_MAX_BACKOFF)
+    jitter = settings.RANGER_REFRESH_JITTER
+    return delay * random.uniform(1 - jitter, 1 + jitter)
+
+
+def _service_stats(service: str) -> dict[str, Any]:
+    """Get (or create) the refresh statistics entry of a service."""
+    return _refresh_stats.setdefault(service, {
+        "refresh_count": 0,
+        "failure_count": 0,
+        "consecutive_failures": 0,
+        "trigger_count": 0,
+    })
+
+
+async def _refresh(ranger_client: RangerClient, service: str, reason: str) -> bool:
+    """Run one refresh of a service and record its duration, payload size and outcome."""
+    stats = _service_stats(service)
+    fetch_stats: dict[str, int] = {}
+    started = time.perf_counter()
+    try:
+        policies = await load_policies(ranger_client, service, fetch_stats)
+        outcome = "ok"
+    except Exception as e:
+        policies = None
+        outcome = f"error: {e}"
+
+    stats["refresh_count"] += 1
+    stats["last_reason"] = reason
+    stats["last_outcome"] = outcome
+    stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    stats["last_payload_bytes"] = fetch_stats.get("payload_bytes", 0)
+    stats["last_refresh_at"] = time.time()
+    if policies is None:
+        stats["failure_count"] += 1
+        stats["consecutive_failures"] += 1
+        return False
+
+    stats["consecutive_failures"] = 0
+    stats["last_success_at"] = stats["last_refresh_at"]
+    stats["policy_count"] = len(policies)
+    logger.info(
+        f"Refreshed service {service} ({reason}) in {stats['last_duration_ms']}ms, "
+        f"{stats['last_payload_bytes']} bytes"
+    )
+    return True
+
+
+async def policy_loader_loop(
+    ranger_client: RangerClient,
+    interval: int = 300,
+    service_name: str | None = None,
+) -> None:
     """
-    Background task that periodically loads policies from Ranger.
+    Background task that refreshes policies of one service from Ranger.
+
+    Refreshes run on a jittered interval with backoff on failure, or
+    earlier when triggered via request_refresh(). Triggers arriving within
+    RANGER_REFRESH_DEBOUNCE seconds are coalesced into one reload and two
+    reloads never start closer than RANGER_REFRESH_MIN_INTERVAL seconds.
 
     Args:
         ranger_client: RangerClient
         interval: Refresh interval in seconds (default: 5 minutes)
+        service_name: Service name (defaults to config)
     """
     global _loader_running
     _loader_running = True
+    service = service_name or settings.RANGER_SERVICE_NAME
+    event = _refresh_events.setdefault(service, asyncio.Event())
 
     # Load immediately on start
-    await load_policies(ranger_client)
+    last_started = time.monotonic()
+    failures = 0 if await _refresh(ranger_client, service, "startup") else 1
 
-    # Then load periodically
     while _loader_running:
         try:
-            await asyncio.sleep(interval)
-            await load_policies(ranger_client)
+            reason = "scheduled"
+            try:
+                await asyncio.wait_for(event.wait(), timeout=_next_delay(interval, failures))
+                reason = "triggered"
+                # Собираем пачку триггеров в одну перезагрузку
+                await asyncio.sleep(settings.RANGER_REFRESH_DEBOUNCE)
+            except asyncio.TimeoutError:
+                pass
+
+            since_last = time.monotonic() - last_started
+            if since_last < settings.RANGER_REFRESH_MIN_INTERVAL:
+                await asyncio.sleep(settings.RANGER_REFRESH_MIN_INTERVAL - since_last)
+
+            event.clear()
+            last_started = time.monotonic()
+            failures = 0 if await _refresh(ranger_client, service, reason) else failures + 1
         except asyncio.CancelledError:
-            logger.info("Policy loader task cancelled")
+            logger.info(f"Policy loader task for service {service} cancelled")
             break
         except Exception as e:
-            logger.error(f"Error in policy loader loop: {e}")
+            logger.error(f"Error in policy loader loop for service {service}: {e}")
             # Continue even on error
-            await asyncio.sleep(interval)
+            failures += 1
 
 
-def start_policy_loader(ranger_client: RangerClient, interval: int | None = None) -> None:
+def request_refresh(service_name: str | None = None) -> list[str]:
     """
-    Start the background policy loader task.
+    Trigger an immediate (debounced) reload of policies.
+
+    Args:
+        service_name: Service to reload (all loaded services if None)
+
+    Returns:
+        Services for which a reload was scheduled
+    """
+    services = [service_name] if service_name else list(_refresh_events)
+    scheduled = []
+    for service in services:
+        event = _refresh_events.get(service)
+        if event is None:
+            continue
+        event.set()
+        _service_stats(service)["trigger_count"] += 1
+        scheduled.append(service)
+    return scheduled
+
+
+def get_loader_stats() -> dict[str, dict[str, Any]]:
+    """Get policy refresh, validity schedule and security zone statistics per service."""
+    return {
+        service: {**stats, "schedule": policy_schedule.get_stats(service), "security_zones": get_zone_stats(service)}
+        for service, stats in _refresh_stats.items()
+    }
+
+
+def start_policy_loader(
+    ranger_client: RangerClient,
+    interval: int | None = None,
+    service_names: list[str] | None = None,
+) -> None:
+    """
+    Start background policy loader tasks, one per service.
 
     Args:
         ranger_client: RangerClient
         interval: Refresh interval in seconds (defaults to RANGER_CACHE_TTL)
+        service_names: Services to load (defaults to RANGER_SERVICE_NAMES)
     """
-    global _policy_loader_task
-    if _policy_loader_task is not None and not _policy_loader_task.done():
-        logger.warning("Policy loader already running")
-        return
-
     refresh_interval = interval or settings.RANGER_CACHE_TTL
-    _policy_loader_task = asyncio.create_task(policy_loader_loop(ranger_client, refresh_interval))
-    logger.info(f"Started policy loader with interval {refresh_interval}s")
+    for service in service_names or settings.RANGER_SERVICE_NAMES:
+        task = _policy_loader_tasks.get(service)
+        if task is not None and not task.done():
+            logger.warning(f"Policy loader for service {service} already running")
+            continue
+
+        _refresh_events[service] = asyncio.Event()
+        _policy_loader_tasks[service] = asyncio.create_task(
+            policy_loader_loop(ranger_client, refresh_interval, service)
+        )
+        logger.info(f"Started policy loader for service {service} with interval {refresh_interval}s")
 
 
 def stop_policy_loader() -> None:
-    """Stop the background policy loader task."""
-    global _policy_loader_task, _loader_running
+    """Stop all background policy loader tasks."""
+    global _loader_running
     _loader_running = False
-    if _policy_loader_task is not None:
-        _policy_loader_task.cancel()
-        logger.info("Stopped policy loader")
-
+    for task in _policy_loader_tasks.values():
+        task.cancel()
+    _policy_loader_tasks.clear()
+    _refresh_events.clear()
+    policy_schedule.stop()
+    logger.info("Stopped policy loader")
@@ -3,6 +3,9 @@
 import logging
 from typing import Any
 
+from app.service.policy_compiler import access_bit, access_mask_names, item_access_mask
+from app.service.policy_conditions import ConditionContext, compile_conditions
+
 logger = logging.getLogger(__name__)
 
 
@@ -140,11 +143,15 @@ class PolicyChecker:
         bucket: str,
         object_path: str | None,
         access_type: str,
+        trace: list[dict[str, Any]] | None = None,
+        context: ConditionContext | None = None,
     ) -> tuple[bool, bool, int]:
-        print("HERE", bucket, object_path, access_type, user, user_groups)
         """
         Check if user has access based on policies.
 
+        По умолчанию проверка ничего не логирует и не собирает: трассировка
+        строится только если передан список trace (режим explain).
+
         Args:
             policies: List of policy dictionaries from Ranger
             user: Username
@@ -153,22 +160,33 @@ class PolicyChecker:
             bucket: Bucket name
             object_path: Object path (optional)
             access_type: Access type (read, write, delete, list)
+            trace: If given, one structured entry per evaluated policy is appended
+            context: Condition inputs of the request (items with conditions never match without it);
+                records the inputs the decision depended on
 
         Returns:
-            Tuple of (is_allowed, is_audited)
+            Tuple of (is_allowed, is_audited, policy_id)
         """
-        logger.debug(
-            f"Starting policy check: user={user}, groups={user_groups}, bucket={bucket}, object={object_path}, access={access_type}")
-
+        # Запрошенный тип доступа - один бит; у элементов политик маски с учетом impliedGrants
+        requested_bit = access_bit(access_type)
         policy_id = None
         # Check each policy
         for i, policy in enumerate(policies):
-            policy_name = policy.get("name", f"UnnamedPolicy-{i}")
             policy_id = policy.get("id", 0)
-            logger.debug(f"Checking policy [{i}]: {policy_name}")
+            step = None
+            if trace is not None:
+                step = {
+                    "index": i,
+                    "policy_id": policy_id,
+                    "policy_name": policy.get("name") or f"UnnamedPolicy-{i}",
+                    "resources": {},
+                    "items": [],
+                }
+                trace.append(step)
 
             if not policy.get("isEnabled", True):
-                logger.debug(f"Policy {policy_name} is disabled, skipping.")
+                if step is not None:
+                    step["outcome"] = "disabled"
                 continue
 
             # Check if policy resources match
@@ -178,44 +196,37 @@ class PolicyChecker:
 
             # Check bucket match FIRST (always required)
             if policy_bucket is not None:
-                if not PolicyMatcher.match_bucket(bucket, policy_bucket):
-                    logger.debug(f"Bucket '{bucket}' does not match policy {policy_name}.")
-                    continue
-                logger.debug(f"Bucket '{bucket}' matches policy {policy_name}.")
-            else:
-                # If policy has no bucket, check if object path contains bucket
-                if policy_object is not None:
-                    # Extract bucket from object path in policy
-                    # Assuming object path format: "bucket/object" or just "object"
-                    logger.debug(f"Policy {policy_name} has no bucket resource, checking object path...")
-                else:
-                    logger.debug(f"Policy {policy_name} has no bucket or object resource, skipping.")
+                bucket_match = PolicyMatcher.match_bucket(bucket, policy_bucket)
+                if step is not None:
+                    step["resources"]["bucket"] = {"values": policy_bucket.get("values", []), "match": bucket_match}
+                if not bucket_match:
+                    if step is not None:
+                        step["outcome"] = "bucket_mismatch"
                     continue
+            elif policy_object is None:
+                # Policy has neither bucket nor object resource
+                if step is not None:
+                    step["outcome"] = "no_resources"
+                continue
 
             # If object_path is provided, check object match for object-specific policies
-            if object_path is not None:
-                if policy_object is not None:
-                    # Policy has object resource, check if it matches
-                    if not PolicyMatcher.match_object(object_path, policy_object, bucket):
-                        logger.debug(f"Object '{object_path}' does not match policy {policy_name}.")
-                        continue
-                    logger.debug(f"Object '{object_path}' matches policy {policy_name}.")
-                else:
-                    # Policy is bucket-only, allow all objects in bucket
-                    logger.debug(f"Policy {policy_name} is bucket-level, allowing access to all objects in bucket.")
-            else:
-                # Object path not provided (bucket-level operation like list)
-                if policy_object is not None:
+            # (bucket-only policy allows all objects in bucket)
+            if policy_object is not None:
+                if object_path is None:
                     # Policy is object-specific but operation is bucket-level
-                    logger.debug(f"Policy {policy_name} is object-specific but operation is bucket-level, skipping.")
+                    if step is not None:
+                        step["outcome"] = "object_policy_for_bucket_request"
+                    continue
+                object_match = PolicyMatcher.match_object(object_path, policy_object, bucket)
+                if step is not None:
+                    step["resources"]["object"] = {"values": policy_object.get("values", []), "match": object_match}
+                if not object_match:
+                    if step is not None:
+                        step["outcome"] = "object_mismatch"
                     continue
 
             # Check if user or group matches
-            policy_items = policy.get("policyItems", [])
-            logger.debug(f"Policy {policy_name} has {len(policy_items)} policy items.")
-
-            matched = False
-            for j, policy_item in enumerate(policy_items):
+            for j, policy_item in enumerate(policy.get("policyItems", [])):
                 policy_users = policy_item.get("users", [])
                 policy_groups = policy_item.get("groups", [])
 
@@ -225,11 +236,16 @@ class PolicyChecker:
                     if policy_groups and user_groups
                     else False
                 )
-
-                logger.debug(
-                    f"Policy item [{j}]: users={policy_users}, groups={policy_groups}, "
-                    f"user_match={user_match}, group_match={group_match}"
-                )
+                item_step = None
+                if step is not None:
+                    item_step = {
+                        "index": j,
+                        "users": policy_users,
+                        "groups": policy_groups,
+                        "user_match": user_match,
+                        "group_match": group_match,
+                    }
+                    step["items"].append(item_step)
 
                 if not (user_match or group_match):
                     continue
@@ -240,34 +256,51 @@ class PolicyChecker:
                     policy_item.get("delegateAdmin", False)
                     or cls.is_admin(user_roles)
                 )
-                if is_admin:
-                    return True, is_audited, policy_id
-
-                # Check access type
-                accesses = policy_item.get("accesses", [])
-                logger.debug(f"Checking accesses: {accesses}")
-
-                for k, access in enumerate(accesses):
-                    access_type_match = access.get("type") == access_type
-                    is_allowed = access.get("isAllowed", False)
-                    logger.debug(
-                        f"Access [{k}]: type={access.get('type')}, allowed={is_allowed}, "
-                        f"type_match={access_type_match}"
+                if not is_admin:
+                    # Check access type
+                    mask = policy_item.get("_access_mask")
+                    if mask is None:
+                        # Политика не прошла через policy_compiler
+                        mask = item_access_mask(policy_item)
+                    if item_step is not None:
+                        item_step["accesses"] = [
+                            {
+                                "type": access.get("type"),
+                                "allowed": access.get("isAllowed", False),
+                                "type_match": access.get("type") == access_type,
+                            }
+                            for access in policy_item.get("accesses", [])
+                        ]
+                        # Разрешенные типы вместе с impliedGrants
+                        item_step["effective_accesses"] = access_mask_names(mask)
+                    if not mask & requested_bit:
+                        continue
+
+                # Условия элемента - последними, только для совпавших ресурса, субъекта и доступа
+                conditions = policy_item.get("_conditions")
+                if conditions is None and policy_item.get("conditions"):
+                    conditions = compile_conditions(policy_item["conditions"])
+                if conditions:
+                    conditions_match = context is not None and all(
+                        condition.matches(context) for condition in conditions
                     )
+                    if item_step is not None:
+                        item_step["conditions"] = [
+                            {
+                                "type": condition.type,
+                                "values": condition.values,
+                                "match": context is not None and condition.matches(context),
+                            }
+                            for condition in conditions
+                        ]
+                    if not conditions_match:
+                        continue
 
-                    if access_type_match and is_allowed:
-                        logger.info(
-                            f"✅ ACCESS GRANTED by policy '{policy_name}': "
-                            f"user={user}, bucket={bucket}, object={object_path}, access={access_type}, audited={is_audited}"
-                        )
-                        return True, is_audited, policy_id
+                if step is not None:
+                    step["outcome"] = "granted_admin" if is_admin else "granted"
+                return True, is_audited, policy_id
 
-            if not matched:
-                logger.debug(f"No matching access found in policy {policy_name}.")
+            if step is not None:
+                step["outcome"] = "no_matching_item"
 
-        logger.warning(
-            f"❌ ACCESS DENIED: No matching policy found for "
-            f"user={user}, bucket={bucket}, object={object_path}, access={access_type}"
-        )
         return False, False, policy_id
-
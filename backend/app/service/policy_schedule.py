@@ -0,0 +1,204 @@
+"""
+Validity schedules of Ranger policies resolved into a timeline.
+
+A policy with `validitySchedules` is active only inside its schedule
+intervals. Instead of checking dates on every request, the loader builds
+a timeline of all schedule boundaries of a service, publishes only the
+policies active right now and arms a timer for the next boundary; when it
+fires, the next generation of active policies is swapped in. Every new
+generation (at a boundary or on a refresh) invalidates cached decisions
+through the policy generation in the decision cache key. Requests never
+look at schedules at all.
+
+Schedule times use the Ranger format "yyyy/MM/dd HH:mm:ss" in the
+schedule's timeZone (UTC if not set); a missing startTime/endTime leaves
+the interval open. Recurrences are not supported: such schedules never
+activate (fail closed), as do schedules with malformed times.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app.service.cache import set_policies
+
+logger = logging.getLogger(__name__)
+
+RANGER_TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+# Таймер на далекую границу взводится не дальше этого срока (сек) и
+# перевзводится: event loop считает время по monotonic, а границы - по часам
+MAX_TIMER_DELAY = 3600
+
+
+def parse_validity_schedules(schedules: list[dict[str, Any]], policy_id: Any = None) -> tuple[tuple[float, float], ...]:
+    """
+    Parse validitySchedules of a policy into [start, end) intervals.
+
+    Args:
+        schedules: validitySchedules as returned by Ranger
+        policy_id: Policy id (for log messages)
+
+    Returns:
+        Intervals as epoch seconds (-inf/inf for open ends); schedules
+        that cannot be evaluated are left out
+    """
+    intervals = []
+    for schedule in schedules:
+        if not isinstance(schedule, dict):
+            continue
+        if schedule.get("recurrences"):
+            logger.warning(f"Policy {policy_id}: recurring validity schedules are not supported, schedule never active")
+            continue
+        try:
+            zone = ZoneInfo(schedule.get("timeZone") or "UTC")
+            start = _parse_time(schedule.get("startTime"), zone, -math.inf)
+            end = _parse_time(schedule.get("endTime"), zone, math.inf)
+        except (ValueError, TypeError, ZoneInfoNotFoundError) as e:
+            logger.warning(f"Policy {policy_id}: invalid validity schedule {schedule}, schedule never active: {e}")
+            continue
+        if start < end:
+            intervals.append((start, end))
+    return tuple(intervals)
+
+
+def _parse_time(value: str | None, zone: ZoneInfo, default: float) -> float:
+    if not value:
+        return default
+    return datetime.strptime(value, RANGER_TIME_FORMAT).replace(tzinfo=zone).timestamp()
+
+
+def is_policy_active(policy: dict[str, Any], now: float) -> bool:
+    """Policies without schedules are always active."""
+    intervals = policy.get("_validity")
+    if intervals is None:
+        return True
+    return any(start <= now < end for start, end in intervals)
+
+
+class PolicyTimeline:
+    """Compiled policies of a service with the sorted boundaries of their schedules."""
+
+    __slots__ = ("policies", "boundaries", "scheduled")
+
+    def __init__(self, policies: list[dict[str, Any]]):
+        self.policies = policies
+        boundaries = set()
+        self.scheduled = 0
+        for policy in policies:
+            intervals = policy.get("_validity")
+            if intervals is None:
+                continue
+            self.scheduled += 1
+            for interval in intervals:
+                boundaries.update(moment for moment in interval if math.isfinite(moment))
+        self.boundaries = sorted(boundaries)
+
+    def active_at(self, now: float) -> list[dict[str, Any]]:
+        """Policies active at a moment (the same list if no policy has schedules)."""
+        if not self.scheduled:
+            return self.policies
+        return [policy for policy in self.policies if is_policy_active(policy, now)]
+
+    def next_boundary(self, now: float) -> float | None:
+        """First boundary strictly after a moment (None if there is none)."""
+        i = bisect_right(self.boundaries, now)
+        return self.boundaries[i] if i < len(self.boundaries) else None
+
+
+class PolicySchedule:
+    """Publishes the active generation of policies per service and switches it at schedule boundaries."""
+
+    def __init__(self) -> None:
+        self._timelines: dict[str, PolicyTimeline] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._stats: dict[str, dict[str, Any]] = {}
+
+    def publish(self, service: str, policies: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Replace the policies of a service and publish those active now.
+
+        Args:
+            service: Ranger service name
+            policies: All compiled policies of the service
+
+        Returns:
+            Policies active now
+        """
+        self._timelines[service] = PolicyTimeline(policies)
+        stats = self._stats.setdefault(service, {"generation": 0, "boundary_swaps": 0})
+        stats["active"] = None
+        return self._activate(service, at_boundary=False)
+
+    def _activate(self, service: str, at_boundary: bool) -> list[dict[str, Any]]:
+        timeline = self._timelines[service]
+        stats = self._stats[service]
+        now = time.time()
+        active = timeline.active_at(now)
+        changed = stats["active"] is None or not _same_policies(stats["active"], active)
+        if changed:
+            # Новое поколение политик сервиса: решения, закэшированные по прежнему набору
+            # (в том числе по истекшим или укороченным политикам), больше не используются
+            set_policies(service, active)
+            stats["active"] = active
+            stats["generation"] += 1
+            stats["activated_at"] = now
+            if at_boundary:
+                stats["boundary_swaps"] += 1
+                logger.info(
+                    f"Policy schedule boundary for service {service}: "
+                    f"{len(active)} of {len(timeline.policies)} policies active"
+                )
+        stats["next_boundary_at"] = self._arm(service, timeline.next_boundary(now), now)
+        return active
+
+    def _arm(self, service: str, boundary: float | None, now: float) -> float | None:
+        timer = self._timers.pop(service, None)
+        if timer is not None:
+            timer.cancel()
+        if boundary is None:
+            return None
+        delay = min(boundary - now, MAX_TIMER_DELAY)
+        self._timers[service] = asyncio.get_running_loop().call_later(delay, self._on_timer, service)
+        return boundary
+
+    def _on_timer(self, service: str) -> None:
+        self._timers.pop(service, None)
+        try:
+            self._activate(service, at_boundary=True)
+        except Exception as e:
+            logger.error(f"Error switching policy generation for service {service}: {e}")
+
+    def stop(self) -> None:
+        """Cancel all boundary timers (published policies stay as they are)."""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def get_stats(self, service: str) -> dict[str, Any]:
+        """Schedule statistics of a service (empty dict if nothing was published)."""
+        timeline = self._timelines.get(service)
+        if timeline is None:
+            return {}
+        stats = self._stats[service]
+        return {
+            "policies_total": len(timeline.policies),
+            "policies_scheduled": timeline.scheduled,
+            "policies_active": len(stats["active"]),
+            "generation": stats["generation"],
+            "boundary_swaps": stats["boundary_swaps"],
+            "activated_at": stats["activated_at"],
+            "next_boundary_at": stats["next_boundary_at"],
+        }
+
+
+def _same_policies(old: list[dict[str, Any]], new: list[dict[str, Any]]) -> bool:
+    return len(old) == len(new) and all(a is b for a, b in zip(old, new, strict=True))
+
+
+policy_schedule = PolicySchedule()
@@ -0,0 +1,231 @@
+"""On-demand profiling of the running worker (admin API)."""
+
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sampling", "deterministic")
+PROFILE_FORMATS = ("collapsed", "pstats", "text")
+
+
+class ProfilerBusyError(RuntimeError):
+    """Another profiling session is already running."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> str:
+    """Stack of a frame in collapsed format (root first, frames separated by ';')."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """Collapsed stacks ("stack count" per line), input for flamegraph tools."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread (the event loop) from a background thread.
+
+    The sampled thread is never interrupted; the sampler reads its current
+    frame every `interval` seconds, so the cost is bounded by the sampling
+    rate, not by the amount of work being profiled.
+    """
+
+    def __init__(self, thread_id: int, interval: float, keep_samples: int = 0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        # Сэмплы (perf_counter и стек) для профиля медленных запросов: списки только
+        # дописываются, время возрастает - читатель ищет окно запроса бисекцией без копии
+        self.keep_samples = keep_samples
+        self.sample_times: list[float] | None = [] if keep_samples else None
+        self.sample_stacks: list[str] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = collapse_stack(frame)
+            if self.sample_times is None:
+                self.stacks[stack] += 1
+            elif len(self.sample_times) < self.keep_samples:
+                # Стек - первым: для любого видимого читателю времени стек уже записан
+                self.sample_stacks.append(stack)
+                self.sample_times.append(time.perf_counter())
+
+
+class Profiler:
+    """
+    Time-boxed profiling sessions of the worker's event loop.
+
+    Only one session (capture or slow-request window) runs at a time.
+    Outside a session nothing is hooked; the only cost on the request path
+    is the `slow_active` check in the access-log middleware.
+    """
+
+    def __init__(self) -> None:
+        self.slow_active = False
+        self._busy = False
+        self._slow_sampler: StackSampler | None = None
+        self._slow_threshold = 0.0
+        self._slow_stacks: Counter = Counter()
+        self._slow_requests = 0
+        self._slow_until = 0.0
+        self._slow_task: asyncio.Task | None = None
+
+    async def capture(self, seconds: float, mode: str = "sampling", fmt: str = "collapsed") -> bytes:
+        """
+        Profile the event loop for `seconds`.
+
+        Args:
+            seconds: Capture duration (capped by PROFILE_MAX_SECONDS)
+            mode: "sampling" (stack sampler) or "deterministic" (cProfile)
+            fmt: "collapsed" (sampling only), "pstats" (binary, deterministic only) or "text"
+
+        Returns:
+            Profile in the requested format
+
+        Raises:
+            ProfilerBusyError: another session is running
+            ValueError: unsupported mode/format combination
+        """
+        if mode not in PROFILE_MODES or fmt not in PROFILE_FORMATS:
+            raise ValueError(f"mode must be one of {PROFILE_MODES}, format one of {PROFILE_FORMATS}")
+        if (mode, fmt) in (("sampling", "pstats"), ("deterministic", "collapsed")):
+            raise ValueError(f"format {fmt!r} is not available in {mode} mode")
+        self._acquire()
+        seconds = min(seconds, settings.PROFILE_MAX_SECONDS)
+        logger.warning(f"Profiling event loop for {seconds}s ({mode})")
+        try:
+            if mode == "sampling":
+                sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+                sampler.start()
+                try:
+                    await asyncio.sleep(seconds)
+                finally:
+                    sampler.stop()
+                if fmt == "collapsed":
+                    return render_collapsed(sampler.stacks).encode()
+                total = sum(sampler.stacks.values()) or 1
+                lines = [f"{count:>8} {count * 100 / total:5.1f}%  {stack}" for stack, count in sampler.stacks.most_common(200)]
+                return ("\n".join(lines) + "\n").encode()
+
+            # cProfile трассирует только текущий поток - это и есть поток event loop'а
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            if fmt == "pstats":
+                profile.create_stats()
+                return marshal.dumps(profile.stats)
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(100)
+            return out.getvalue().encode()
+        finally:
+            self._busy = False
+
+    def start_slow(self, threshold_ms: float, seconds: float) -> None:
+        """
+        Start a slow-request profiling window.
+
+        The event loop is sampled for `seconds`; samples taken while a request
+        slower than `threshold_ms` was in flight are aggregated.
+
+        Raises:
+            ProfilerBusyError: another session is running
+        """
+        self._acquire()
+        seconds = min(seconds, settings.PROFILE_MAX_SECONDS)
+        self._slow_threshold = threshold_ms / 1000
+        self._slow_stacks = Counter()
+        self._slow_requests = 0
+        self._slow_until = time.time() + seconds
+        self._slow_sampler = StackSampler(
+            threading.get_ident(),
+            settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+            keep_samples=max(1000, int(seconds * 1000 / settings.PROFILE_SAMPLE_INTERVAL_MS)),
+        )
+        self._slow_sampler.start()
+        self.slow_active = True
+        self._slow_task = asyncio.create_task(self._stop_slow_after(seconds))
+        logger.warning(f"Profiling requests slower than {threshold_ms}ms for {seconds}s")
+
+    async def _stop_slow_after(self, seconds: float) -> None:
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.slow_active = False
+            self._slow_sampler.stop()
+            self._busy = False
+            logger.warning(f"Slow-request profiling finished: {self._slow_requests} slow requests")
+
+    def observe_request(self, started: float, finished: float) -> None:
+        """Account a finished request (perf_counter seconds) during a slow-request window."""
+        if finished - started < self._slow_threshold:
+            return
+        self._slow_requests += 1
+        sampler = self._slow_sampler
+        times = sampler.sample_times
+        # Поток сэмплера продолжает дописывать списки - ищем только среди уже записанных
+        count = len(times)
+        first = bisect_left(times, started, 0, count)
+        last = bisect_right(times, finished, first, count)
+        self._slow_stacks.update(sampler.sample_stacks[first:last])
+
+    def slow_report(self) -> tuple[dict, str]:
+        """Status of the slow-request window and its collapsed stacks."""
+        status = {
+            "active": self.slow_active,
+            "threshold_ms": self._slow_threshold * 1000,
+            "slow_requests": self._slow_requests,
+            "samples": sum(self._slow_stacks.values()),
+            "remaining_seconds": max(0.0, round(self._slow_until - time.time(), 1)) if self.slow_active else 0.0,
+        }
+        return status, render_collapsed(self._slow_stacks)
+
+    def stop(self) -> None:
+        """Cancel a running slow-request window (on shutdown)."""
+        if self._slow_task is not None and not self._slow_task.done():
+            self._slow_task.cancel()
+
+    def _acquire(self) -> None:
+        if self._busy:
+            raise ProfilerBusyError("A profiling session is already running")
+        self._busy = True
+
+
+profiler = Profiler()
@@ -1,15 +1,84 @@
 """Apache Ranger client for fetching policies."""
 
+import asyncio
 import logging
+import time
+from collections import deque
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
 
 from app.core.config import settings
+from app.service.json_stream import JSONArrayStream
+from app.service.metrics import RANGER_REQUEST_ERRORS, RANGER_REQUEST_SECONDS
 
 logger = logging.getLogger(__name__)
 
 
+def _endpoint_label(path: str) -> str:
+    """Low-cardinality metric label of a Ranger API path."""
+    if "/policy" in path:
+        return "policies"
+    if "/xusers/users" in path:
+        return "users"
+    if "/servicedef" in path:
+        return "servicedef"
+    if "/zones" in path:
+        return "zones"
+    return "other"
+
+
+class _InstrumentedStream(httpx.AsyncByteStream):
+    """Response body stream that counts transport errors while the body is read."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, endpoint: str):
+        self._stream = stream
+        self._endpoint = endpoint
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except httpx.TransportError:
+            RANGER_REQUEST_ERRORS.inc((self._endpoint,))
+            raise
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
+class _InstrumentedTransport(httpx.AsyncBaseTransport):
+    """
+    Records latency (until response headers) and errors of Ranger requests.
+
+    Errors are 5xx responses and transport failures (connect errors,
+    timeouts, broken connections), including those raised while the
+    response body is streamed.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        endpoint = _endpoint_label(request.url.path)
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except httpx.TransportError:
+            RANGER_REQUEST_ERRORS.inc((endpoint,))
+            raise
+        finally:
+            RANGER_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+        if response.status_code >= 500:
+            RANGER_REQUEST_ERRORS.inc((endpoint,))
+        response.stream = _InstrumentedStream(response.stream, endpoint)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
 class RangerClient:
     """Client for Apache Ranger REST API - fetches policies."""
 
@@ -27,37 +96,80 @@ class RangerClient:
             base_url=self.base_url,
             auth=self.auth,
             timeout=10.0,
+            transport=_InstrumentedTransport(httpx.AsyncHTTPTransport()),
         )
 
-    async def get_servicedef_id_by_name(self, servicedef_name: str) -> int | None:
+    async def get_servicedef(self, servicedef_name: str) -> dict[str, Any] | None:
         """
-        Get service ID by service definition name from Ranger.
+        Get a service definition by name from Ranger.
 
         Args:
             servicedef_name: Name of the service definition (e.g., 'minio-service-def')
 
         Returns:
-            Service ID or None if not found
+            Service definition (id, accessTypes, ...) or None if not found
         """
         url = f"{self.base_url}/service/public/v2/api/servicedef/name/{servicedef_name}"
 
         try:
             response = await self._client.get(url)
             response.raise_for_status()
+            return response.json()
 
-            data = response.json()
-            service_id = data.get("id")
-
-            if service_id is not None:
-                logger.debug(f"Found service ID {service_id} for service name '{servicedef_name}'")
-                return service_id
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logger.warning(f"Service definition '{servicedef_name}' not found at {url}")
             else:
-                logger.warning(f"Service ID not found in response for '{servicedef_name}': {data}")
+                logger.error(f"HTTP error {e.response.status_code} from {url}: {e}")
+            return None
+        except httpx.RequestError as e:
+            logger.error(f"Request error from {url}: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error getting service definition '{servicedef_name}': {e}")
+            return None
+
+    async def get_servicedef_id_by_name(self, servicedef_name: str) -> int | None:
+        """
+        Get service ID by service definition name from Ranger.
+
+        Args:
+            servicedef_name: Name of the service definition (e.g., 'minio-service-def')
+
+        Returns:
+            Service ID or None if not found
+        """
+        data = await self.get_servicedef(servicedef_name)
+        if data is None:
+            return None
+        service_id = data.get("id")
+        if service_id is None:
+            logger.warning(f"Service ID not found in response for '{servicedef_name}': {data}")
+            return None
+        logger.debug(f"Found service ID {service_id} for service name '{servicedef_name}'")
+        return service_id
+
+    async def get_security_zones(self) -> list[dict[str, Any]] | None:
+        """
+        Get all security zone definitions from Ranger.
+
+        Returns:
+            Zones (name, services -> resources, ...) or None if they could not be loaded
+        """
+        url = f"{self.base_url}/service/public/v2/api/zones"
+
+        try:
+            response = await self._client.get(url)
+            response.raise_for_status()
+            zones = response.json()
+            if not isinstance(zones, list):
+                logger.error(f"Unexpected security zones payload from {url}: {type(zones).__name__}")
                 return None
+            return zones
 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
-                logger.warning(f"Service definition '{servicedef_name}' not found at {url}")
+                logger.warning(f"Security zones are not available at {url}")
             else:
                 logger.error(f"HTTP error {e.response.status_code} from {url}: {e}")
             return None
@@ -65,7 +177,7 @@ class RangerClient:
             logger.error(f"Request error from {url}: {e}")
             return None
         except Exception as e:
-            logger.error(f"Unexpected error getting service ID for '{servicedef_name}': {e}")
+            logger.error(f"Unexpected error getting security zones: {e}")
             return None
 
     async def get_policies(self, service_name: str) -> list[dict[str, Any]]:
@@ -76,48 +188,109 @@ class RangerClient:
             service_name: Name of the Ranger service
 
         Returns:
-            List of policy dictionaries
+            List of policy dictionaries (empty on error)
         """
-        # Try different possible endpoints
-        endpoints = [
-            # f"{self.base_url}/plugins/policies?serviceName={service_name}",
-            f"{self.base_url}/service/public/v2/api/service/{service_name}/policy",
-        ]
-        logger.warning(endpoints)
+        try:
+            return [policy async for policy in self.iter_policies(service_name)]
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Failed to get policies for service {service_name}: {e}")
+            return []
 
-        for url in endpoints:
-            try:
-                response = await self._client.get(url)
-                logger.warning(response.json())
-                response.raise_for_status()
+    async def iter_policies(
+        self,
+        service_name: str,
+        page_size: int | None = None,
+        concurrency: int | None = None,
+        fetch_stats: dict[str, int] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Stream all policies for a service from Ranger page by page.
 
-                result = response.json()
-                # Handle different response formats
-                if isinstance(result, list):
-                    return result
-                elif isinstance(result, dict):
-                    # Some APIs return {"policies": [...]} or {"vXPolicies": [...]}
-                    if "policies" in result:
-                        return result["policies"]
-                    elif "vXPolicies" in result:
-                        return result["vXPolicies"]
-                    elif "data" in result:
-                        return result["data"]
-                    else:
-                        # Return the dict itself if it looks like a policy
-                        return [result] if "policyItems" in result else []
-                else:
-                    logger.warning(f"Unexpected response format from {url}: {type(result)}")
-                    continue
-            except httpx.HTTPError as e:
-                logger.debug(f"Failed to get policies from {url}: {e}")
-                continue
-            except Exception as e:
-                logger.debug(f"Unexpected error from {url}: {e}")
-                continue
-
-        logger.error(f"Failed to get policies for service {service_name} from all endpoints")
-        return []
+        Pages (startIndex/pageSize) are requested over the pooled client with
+        at most `concurrency` requests in flight and are yielded in order.
+        Each page body is parsed incrementally, so peak memory is bounded by
+        page_size * concurrency policies instead of the whole payload.
+
+        Args:
+            service_name: Name of the Ranger service
+            page_size: Policies per page (defaults to RANGER_POLICY_PAGE_SIZE)
+            concurrency: Max pages in flight (defaults to RANGER_POLICY_FETCH_CONCURRENCY)
+            fetch_stats: Optional dict updated with payload_bytes and pages fetched
+
+        Yields:
+            Policy dictionaries
+
+        Raises:
+            httpx.HTTPError: If a page could not be fetched
+            ValueError: If a page is not a valid JSON policy list
+        """
+        url = f"{self.base_url}/service/public/v2/api/service/{service_name}/policy"
+        page_size = max(1, page_size or settings.RANGER_POLICY_PAGE_SIZE)
+        concurrency = max(1, concurrency or settings.RANGER_POLICY_FETCH_CONCURRENCY)
+
+        pending: deque[asyncio.Task[list[dict[str, Any]]]] = deque()
+        next_start = 0
+        exhausted = False
+        seen_ids: set[Any] = set()
+        if fetch_stats is None:
+            fetch_stats = {}
+        fetch_stats.setdefault("payload_bytes", 0)
+        fetch_stats.setdefault("pages", 0)
+
+        # Первая страница запрашивается одна: маленьким сервисам хватает одного запроса
+        in_flight = 1
+
+        def schedule() -> None:
+            nonlocal next_start
+            while not exhausted and len(pending) < in_flight:
+                pending.append(asyncio.create_task(
+                    self._fetch_policy_page(url, next_start, page_size, fetch_stats)
+                ))
+                next_start += page_size
+
+        try:
+            schedule()
+            while pending:
+                page = await pending.popleft()
+                if len(page) < page_size:
+                    exhausted = True
+                if page and page[0].get("id") in seen_ids:
+                    # Сервер игнорирует пагинацию и вернул ту же выборку
+                    logger.warning(f"Ranger ignored paging for service {service_name}, stopping at {len(seen_ids)} policies")
+                    break
+                for policy in page:
+                    seen_ids.add(policy.get("id"))
+                    yield policy
+                if exhausted:
+                    break
+                in_flight = concurrency
+                schedule()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        logger.info(f"Fetched {len(seen_ids)} policies for service {service_name} in pages of {page_size}")
+
+    async def _fetch_policy_page(
+        self,
+        url: str,
+        start_index: int,
+        page_size: int,
+        fetch_stats: dict[str, int],
+    ) -> list[dict[str, Any]]:
+        """Fetch one page of policies, parsing the body as it streams in."""
+        params = {"startIndex": start_index, "pageSize": page_size}
+        async with self._client.stream("GET", url, params=params) as response:
+            response.raise_for_status()
+            stream = JSONArrayStream()
+            page: list[dict[str, Any]] = []
+            async for chunk in response.aiter_bytes():
+                fetch_stats["payload_bytes"] += len(chunk)
+                page.extend(stream.feed(chunk))
+            stream.close()
+        fetch_stats["pages"] += 1
+        logger.debug(f"Fetched {len(page)} policies from {url} (startIndex={start_index})")
+        return page
 
     async def get_user(self, username: str) -> dict[str, Any] | None:
         """
@@ -127,7 +300,12 @@ class RangerClient:
             username: Username
 
         Returns:
-            User dictionary with groups or None if not found
+            User dictionary with groups or None if the user does not exist
+
+        Raises:
+            httpx.HTTPError: Ranger could not be asked (5xx, transport error) -
+                unlike a missing user, this says nothing about the user's groups
+            ValueError: The response is not valid JSON
         """
         # Try different possible endpoints
         endpoints = [
@@ -135,6 +313,7 @@ class RangerClient:
         ]
         logger.info(endpoints)
 
+        last_error: Exception | None = None
         for url in endpoints:
             try:
                 response = await self._client.get(url)
@@ -143,18 +322,16 @@ class RangerClient:
             except httpx.HTTPStatusError as e:
                 if e.response.status_code == 404:
                     logger.warning(f"User {username} not found at {url}")
-                    continue
                 else:
                     logger.warning(f"HTTP error from {url}: {e}")
-                    continue
-            except httpx.HTTPError as e:
+                    last_error = e
+            except (httpx.HTTPError, ValueError) as e:
                 logger.warning(f"Failed to get user from {url}: {e}")
-                continue
-            except Exception as e:
-                logger.warning(f"Unexpected error from {url}: {e}")
-                continue
+                last_error = e
 
-        logger.warning(f"Failed to get user {username} from all endpoints")
+        if last_error is not None:
+            raise last_error
+        logger.warning(f"User {username} not found at any endpoint")
         return None
 
     async def close(self):
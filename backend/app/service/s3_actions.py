@@ -0,0 +1,105 @@
+"""Registry of S3/MinIO actions: access type and resource level per action."""
+
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, NamedTuple
+
+from app.core.config import settings
+from app.service.constants import S3AccessType, S3ResourceType
+from app.service.metrics import S3_UNMAPPED_ACTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACTIONS_FILE = Path(__file__).with_name("s3_actions.json")
+
+
+class S3Action(NamedTuple):
+    access: S3AccessType
+    resource: S3ResourceType
+
+
+class S3ActionRegistry:
+    """
+    Maps MinIO actions to Ranger access types.
+
+    The table is loaded from a JSON file grouped as
+    {access type: {resource level: [actions]}}; entries ending with "*"
+    ("admin:*") are prefixes. Exact actions live in a read-only dict, so a
+    lookup is a single dict access. Actions missing from the table are
+    counted and reported once each, so gaps show up from real traffic.
+    """
+
+    # Ограничение на число различных неизвестных действий в статистике
+    MAX_UNMAPPED = 1000
+
+    def __init__(self, table: dict[str, dict[str, list[str]]], source: str = "<table>"):
+        actions: dict[str, S3Action] = {}
+        prefixes: list[tuple[str, S3Action]] = []
+        conflicts = []
+        for access_name, levels in table.items():
+            access = S3AccessType(access_name)
+            for level_name, names in levels.items():
+                entry = S3Action(access, S3ResourceType[level_name.upper()])
+                for name in names:
+                    if name.endswith("*"):
+                        prefixes.append((name[:-1], entry))
+                        continue
+                    if name in actions and actions[name] != entry:
+                        conflicts.append(name)
+                    actions[name] = entry
+        if conflicts:
+            logger.error(f"S3 actions mapped more than once in {source}: {conflicts}")
+
+        self.source = source
+        self.actions = MappingProxyType(actions)
+        # Длинные префиксы проверяем первыми
+        self.prefixes = tuple(sorted(prefixes, key=lambda item: len(item[0]), reverse=True))
+        self.unmapped: Counter = Counter()
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "S3ActionRegistry":
+        """Load the registry from a JSON file (see class docstring for the format)."""
+        with open(path, encoding="utf-8") as f:
+            registry = cls(json.load(f), source=str(path))
+        logger.info(f"Loaded {len(registry.actions)} S3 actions and {len(registry.prefixes)} prefixes from {path}")
+        return registry
+
+    def lookup(self, action: str) -> S3Action | None:
+        """
+        Get the access type and resource level of an action.
+
+        Returns:
+            S3Action or None if the action is not in the registry
+        """
+        entry = self.actions.get(action)
+        if entry is not None:
+            return entry
+        for prefix, entry in self.prefixes:
+            if action.startswith(prefix):
+                return entry
+        self._report_unmapped(action)
+        return None
+
+    def _report_unmapped(self, action: str) -> None:
+        if action not in self.unmapped:
+            if len(self.unmapped) >= self.MAX_UNMAPPED:
+                S3_UNMAPPED_ACTIONS.inc(("other",))
+                return
+            logger.warning("Unmapped S3 action %r seen in traffic (add it to %s)", action, self.source)
+        self.unmapped[action] += 1
+        S3_UNMAPPED_ACTIONS.inc((action,))
+
+    def get_stats(self) -> dict[str, Any]:
+        """Size of the registry and unmapped actions seen in traffic."""
+        return {
+            "source": self.source,
+            "actions": len(self.actions),
+            "prefixes": [prefix + "*" for prefix, _ in self.prefixes],
+            "unmapped": dict(self.unmapped.most_common()),
+        }
+
+
+s3_action_registry = S3ActionRegistry.from_file(settings.S3_ACTIONS_FILE or DEFAULT_ACTIONS_FILE)
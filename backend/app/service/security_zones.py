@@ -0,0 +1,119 @@
+"""
+Ranger security zones: which zone a bucket/object belongs to.
+
+Zone definitions are compiled per service at policy refresh. A request is
+evaluated only against the policies of its zone (policies without
+zoneName for resources outside all zones), so large installations that
+delegate buckets to teams check a fraction of the policies per request.
+"""
+
+import logging
+from typing import Any
+
+from app.service.policy_parser import PolicyMatcher
+
+logger = logging.getLogger(__name__)
+
+# Зона ресурсов вне всех зон (и политик без zoneName)
+UNZONED = ""
+
+
+class ZoneIndex:
+    """
+    Bucket/object resources of the security zones of one service.
+
+    Buckets are resolved once to the list of (object patterns, zone)
+    candidates and memoized, so a request for a zone that covers whole
+    buckets is a single dict lookup; only zones limited to object paths
+    check the path.
+    """
+
+    # Ограничение на мемоизацию, чтобы случайные имена бакетов не раздували память
+    MAX_RESOLVED = 100_000
+
+    def __init__(self, zones: list[dict[str, Any]], service: str):
+        self.zone_names: list[str] = []
+        # bucket -> [(шаблоны object или None для всего бакета, зона)]
+        self._exact: dict[str, list[tuple[list[str] | None, str]]] = {}
+        self._patterns: list[tuple[str, list[str] | None, str]] = []
+        for zone in zones:
+            name = zone.get("name")
+            service_resources = (zone.get("services") or {}).get(service)
+            if not name or not service_resources:
+                continue
+            self.zone_names.append(name)
+            for resource in service_resources.get("resources") or []:
+                objects = resource.get("object") or None
+                for bucket in resource.get("bucket") or []:
+                    if "*" in bucket:
+                        self._patterns.append((bucket, objects, name))
+                    else:
+                        self._exact.setdefault(bucket, []).append((objects, name))
+        self._resolved: dict[str, list[tuple[list[str] | None, str]]] = {}
+
+    def _candidates(self, bucket: str) -> list[tuple[list[str] | None, str]]:
+        candidates = self._resolved.get(bucket)
+        if candidates is None:
+            candidates = list(self._exact.get(bucket, ()))
+            candidates.extend(
+                (objects, name) for pattern, objects, name in self._patterns
+                if PolicyMatcher.match_resource(bucket, [pattern], False, False)
+            )
+            if len(self._resolved) >= self.MAX_RESOLVED:
+                self._resolved.clear()
+            self._resolved[bucket] = candidates
+        return candidates
+
+    def resolve(self, bucket: str, object_path: str | None) -> str:
+        """
+        Get the zone of a resource.
+
+        Args:
+            bucket: Bucket name
+            object_path: Object key (None for bucket-level requests)
+
+        Returns:
+            Zone name or UNZONED
+        """
+        for objects, name in self._candidates(bucket):
+            if objects is None:
+                return name
+            if object_path is not None and PolicyMatcher.match_resource(object_path, objects, False, True):
+                return name
+        return UNZONED
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "zones": self.zone_names,
+            "buckets": len(self._exact),
+            "bucket_patterns": len(self._patterns),
+            "resolved_buckets": len(self._resolved),
+        }
+
+
+# Индексы зон по сервисам; сервиса нет - зоны не загружены, проверяются все политики
+_zone_indexes: dict[str, ZoneIndex] = {}
+
+
+def set_zones(service: str, zones: list[dict[str, Any]]) -> ZoneIndex:
+    """Compile the zone definitions for a service."""
+    index = _zone_indexes[service] = ZoneIndex(zones, service)
+    return index
+
+
+def resolve_zone(service: str, bucket: str, object_path: str | None) -> str | None:
+    """
+    Get the security zone of a resource.
+
+    Returns:
+        Zone name, UNZONED, or None if zones of the service are not loaded
+        (all policies of the service apply)
+    """
+    index = _zone_indexes.get(service)
+    return None if index is None else index.resolve(bucket, object_path)
+
+
+def get_zone_stats(service: str) -> dict[str, Any]:
+    """Zone statistics of a service (empty dict if zones are not loaded)."""
+    index = _zone_indexes.get(service)
+    return {} if index is None else index.get_stats()
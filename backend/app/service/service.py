@@ -6,7 +6,10 @@ from typing import Any
 from fastapi import APIRouter, HTTPException, Request, status
 
 from app.core.config import settings
-from app.models.request import RequestBody
+from app.models.request import CheckRequest
+from app.service.audit_filter import audit_filter
+from app.service.audit_pipeline import AuditPipeline
+from app.service.audit_record import audit_record_builder
 from app.service.authorizer import (
     map_action_to_access_type,
 )
@@ -15,7 +18,6 @@ from app.service.constants import (
     AuditResult,
     S3AccessType,
 )
-from app.service.solr_logger import SolrLoggerClient
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +30,16 @@ def get_first_or_none(items: list, default: Any = None) -> Any | None:
 
 
 def extract_request_metadata(
-        body: RequestBody,
-) -> tuple[str, str, str, S3AccessType]:
-    """Извлечение и валидация метаданных запроса."""
-    username = get_first_or_none(body.input.conditions.username)
+        body: CheckRequest,
+) -> tuple[str, str, str, S3AccessType | None]:
+    """
+    Извлечение и валидация метаданных запроса (access type None - действие не из реестра S3).
+
+    Raises:
+        HTTPException: 400 если не указан username
+        ValueError: действие уровня объекта без object-ключа
+    """
+    username = body.username
     if not username:
         logger.error("Username not provided in request")
         raise HTTPException(
@@ -39,11 +47,9 @@ def extract_request_metadata(
             detail="Username is required"
         )
 
-    bucket = body.input.bucket or ""
-    object_path = body.input.object or ""
-    access_type = map_action_to_access_type(body.input.action)
+    access_type = map_action_to_access_type(body.action, body.object)
 
-    return username, bucket, object_path, access_type
+    return username, body.bucket, body.object, access_type
 
 
 def get_client_ip(request: Request) -> str:
@@ -57,7 +63,7 @@ def get_client_ip(request: Request) -> str:
 
 @asynccontextmanager
 async def log_audit_context(
-        solr_logger: SolrLoggerClient,
+        audit_pipeline: AuditPipeline,
         username: str,
         bucket: str,
         object_path: str,
@@ -71,7 +77,7 @@ async def log_audit_context(
     try:
         resource_path = f"/{bucket}/{object_path}" if object_path else f"/{bucket}"
 
-        audit_record = solr_logger.build_audit_record(
+        audit_record = audit_record_builder.build(
             policy=policy_id or "no-policy",
             policyVersion=DEFAULT_POLICY_VERSION,
             access=access_type,
@@ -92,14 +98,11 @@ async def log_audit_context(
         logger.error(f"Failed to prepare audit record: {e}")
         raise
     finally:
-        try:
-            await solr_logger.log_event(audit_record)
-            logger.debug(
-                f"Audit event logged: user={username}, "
-                f"policy={policy_id}, result={result.name}"
-            )
-        except Exception as e:
-            logger.error(f"Failed to log audit event: {e}")
+        # Отправка в Solr идёт в фоне пачками, здесь только постановка в очередь
+        if audit_pipeline.submit(audit_record):
+            logger.debug("Audit event queued: user=%s, policy=%s, result=%s", username, policy_id, result.name)
+        else:
+            logger.warning("Audit queue is full, event dropped: user=%s, policy=%s", username, policy_id)
 
 
 async def handle_access_denied(
@@ -109,37 +112,36 @@ async def handle_access_denied(
         access_type: str,
         policy_id: str | None,
         request: Request,
-        solr_logger: SolrLoggerClient
+        audit_pipeline: AuditPipeline,
+        is_audited: bool = True,
+        zone: str | None = None,
 ) -> None:
-    """Обработка отказа в доступе."""
-    logger.warning(
-        f"Access DENIED: user={username}, bucket={bucket}, "
-        f"object={object_path}, access={access_type}, policy={policy_id}"
-    )
+    """
+    Обработка отказа в доступе (ответ 403 формирует вызывающий).
 
-    async with log_audit_context(
-            solr_logger=solr_logger,
-            username=username,
-            bucket=bucket,
-            object_path=object_path,
-            access_type=access_type,
-            request=request,
-            result=AuditResult.DENIED,
-            policy_id=policy_id,
-    ):
-        pass
-
-    raise HTTPException(
-        status_code=status.HTTP_403_FORBIDDEN,
-        detail={
-            "error": "Access denied",
-            "user": username,
-            "resource": f"{bucket}/{object_path}" if object_path else bucket,
-            "action": access_type,
-            "policy_id": policy_id
-        }
+    Аудит пишется, если этого требуют правила AUDIT_RULES
+    или (если ни одно правило не подошло) флаг isAuditEnabled политики;
+    zone - security zone ресурса для поля zone записи аудита.
+    """
+    logger.info(
+        "Access DENIED: user=%s, bucket=%s, object=%s, access=%s, policy=%s",
+        username, bucket, object_path, access_type, policy_id,
     )
 
+    if audit_filter.should_audit(AuditResult.DENIED, access_type, bucket, username, is_audited):
+        async with log_audit_context(
+                audit_pipeline=audit_pipeline,
+                username=username,
+                bucket=bucket,
+                object_path=object_path,
+                access_type=access_type,
+                request=request,
+                result=AuditResult.DENIED,
+                policy_id=policy_id,
+                zone=zone or "",
+        ):
+            pass
+
 
 async def handle_access_granted(
         username: str,
@@ -148,22 +150,32 @@ async def handle_access_granted(
         access_type: str,
         policy_id: str | None,
         request: Request,
-        solr_logger: SolrLoggerClient
+        audit_pipeline: AuditPipeline,
+        is_audited: bool = True,
+        zone: str | None = None,
 ) -> None:
-    """Обработка разрешенного доступа."""
-    logger.info(
-        f"Access GRANTED: user={username}, bucket={bucket}, "
-        f"object={object_path}, access={access_type}, policy={policy_id}"
+    """
+    Обработка разрешенного доступа.
+
+    Аудит пишется, если этого требуют правила AUDIT_RULES
+    или (если ни одно правило не подошло) флаг isAuditEnabled политики;
+    zone - security zone ресурса для поля zone записи аудита.
+    """
+    logger.debug(
+        "Access GRANTED: user=%s, bucket=%s, object=%s, access=%s, policy=%s",
+        username, bucket, object_path, access_type, policy_id,
     )
 
-    async with log_audit_context(
-            solr_logger=solr_logger,
-            username=username,
-            bucket=bucket,
-            object_path=object_path,
-            access_type=access_type,
-            request=request,
-            result=AuditResult.ALLOWED,
-            policy_id=policy_id
-    ):
-        pass
+    if audit_filter.should_audit(AuditResult.ALLOWED, access_type, bucket, username, is_audited):
+        async with log_audit_context(
+                audit_pipeline=audit_pipeline,
+                username=username,
+                bucket=bucket,
+                object_path=object_path,
+                access_type=access_type,
+                request=request,
+                result=AuditResult.ALLOWED,
+                policy_id=policy_id,
+                zone=zone or "",
+        ):
+            pass
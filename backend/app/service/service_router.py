@@ -0,0 +1,76 @@
+"""Routing of buckets to Ranger services."""
+
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRouter:
+    """
+    Resolves the Ranger service responsible for a bucket.
+
+    Routes are either exact bucket names ("analytics") or bucket prefixes
+    ending with "*" ("logs-*"); the longest prefix wins. Prefix tables are
+    grouped by prefix length, so resolution is a handful of dict lookups
+    and the result is memoized per bucket.
+    """
+
+    # Ограничение на мемоизацию, чтобы случайные имена бакетов не раздували память
+    MAX_RESOLVED = 100_000
+
+    def __init__(self, routes: dict[str, str], default_service: str):
+        self.default_service = default_service
+        self._exact: dict[str, str] = {}
+        self._prefixes: dict[int, dict[str, str]] = {}
+        for pattern, service in routes.items():
+            if pattern.endswith("*"):
+                prefix = pattern[:-1]
+                self._prefixes.setdefault(len(prefix), {})[prefix] = service
+            else:
+                self._exact[pattern] = service
+        # Длинные префиксы проверяем первыми
+        self._prefix_lengths = sorted(self._prefixes, reverse=True)
+        self._resolved: dict[str, str] = {}
+
+    def resolve(self, bucket: str) -> str:
+        """
+        Get the Ranger service name for a bucket.
+
+        Args:
+            bucket: Bucket name
+
+        Returns:
+            Service name (default service if no route matches)
+        """
+        service = self._resolved.get(bucket)
+        if service is not None:
+            return service
+
+        service = self._exact.get(bucket)
+        if service is None:
+            for length in self._prefix_lengths:
+                service = self._prefixes[length].get(bucket[:length]) if len(bucket) >= length else None
+                if service is not None:
+                    break
+            else:
+                service = self.default_service
+
+        if len(self._resolved) >= self.MAX_RESOLVED:
+            self._resolved.clear()
+        self._resolved[bucket] = service
+        return service
+
+
+_router = ServiceRouter(settings.RANGER_SERVICE_ROUTES, settings.RANGER_SERVICE_NAME)
+
+
+def resolve_service(bucket: str) -> str:
+    """Get the Ranger service name for a bucket using configured routes."""
+    return _router.resolve(bucket)
+
+
+def get_service_router() -> ServiceRouter:
+    """Get the configured service router."""
+    return _router
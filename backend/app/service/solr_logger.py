@@ -1,76 +1,184 @@
-import uuid
-from datetime import datetime
+import asyncio
+import gzip
+import logging
+import time
 
 import httpx
 
 from app.core.config import settings
-from app.service.cache import get_servisedef_id
+from app.service.audit_record import encode_audit_batch
+from app.service.metrics import SOLR_REQUEST_ERRORS, SOLR_REQUEST_SECONDS
 
+logger = logging.getLogger(__name__)
+
+
+def node_timeout() -> float:
+    """Таймаут запроса к узлу: SOLR_TIMEOUT, но не больше трети AUDIT_SINK_TIMEOUT."""
+    return min(settings.SOLR_TIMEOUT, settings.AUDIT_SINK_TIMEOUT / 3)
+
+
+class SolrUnavailableError(httpx.TransportError):
+    """Ни один узел Solr не удалось опросить."""
+
+
+class SolrNode:
+    """One Solr endpoint with its health state and request metrics."""
+
+    __slots__ = (
+        "base_url", "outstanding", "down_until", "requests", "errors",
+        "latency_ms_total", "latency_ms_max", "last_error", "latency",
+    )
 
-class SolrLoggerClient:
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip("/")
-        self._client = httpx.AsyncClient()
+        self.outstanding = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+        self.last_error = ""
+        self.latency = SOLR_REQUEST_SECONDS.labels(self.base_url)
+
+    def get_stats(self, now: float) -> dict:
+        succeeded = self.requests - self.errors
+        return {
+            "healthy": self.down_until <= now,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.latency_ms_total / succeeded, 2) if succeeded else None,
+            "max_latency_ms": round(self.latency_ms_max, 2),
+            "last_error": self.last_error,
+        }
+
+
+class SolrLoggerClient:
+    """
+    Отправка audit-записей в Solr (один или несколько узлов).
+
+    Запрос уходит на здоровый узел с наименьшим числом запросов в полёте
+    (при равенстве - по кругу). Узел, вернувший 5xx, недоступный по сети или
+    не ответивший за таймаут (в том числе отмененный таймаутом пайплайна),
+    исключается на SOLR_NODE_COOLDOWN секунд, а пачка повторяется на другом
+    узле (Solr делает upsert по id, повтор безопасен). Когда все узлы
+    исключены, пробуется тот, что упал раньше всех.
+    """
+
+    def __init__(self, base_url: str | list[str]):
+        urls = [base_url] if isinstance(base_url, str) else base_url
+        self.nodes = [SolrNode(url) for url in urls]
+        self.base_url = self.nodes[0].base_url
+        self._rr = 0
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.SOLR_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SOLR_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SOLR_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(node_timeout(), connect=settings.SOLR_CONNECT_TIMEOUT),
+        )
+
+    def _pick_node(self, exclude: set[int]) -> int | None:
+        """Index of the node for the next request (None if all were tried)."""
+        now = time.monotonic()
+        count = len(self.nodes)
+        best = None
+        for i in range(count):
+            index = (self._rr + i) % count
+            node = self.nodes[index]
+            if index in exclude or node.down_until > now:
+                continue
+            if best is None or node.outstanding < self.nodes[best].outstanding:
+                best = index
+        if best is None:
+            candidates = [i for i in range(count) if i not in exclude]
+            if not candidates:
+                return None
+            best = min(candidates, key=lambda i: self.nodes[i].down_until)
+        self._rr = (best + 1) % count
+        return best
 
     async def log_event(self, audit_record: dict) -> None:
-        url = f"{self.base_url}/update?commit=true"
+        await self.log_events([audit_record])
+
+    async def log_events(self, audit_records: list[dict]) -> None:
+        """
+        Отправка пачки audit-записей в Solr одним запросом.
+
+        Вместо жёсткого commit на каждый запрос используется commitWithin:
+        Solr сам сделает commit не позже чем через SOLR_COMMIT_WITHIN_MS.
+        Тела больше SOLR_GZIP_MIN_BYTES сжимаются gzip, если включён SOLR_GZIP.
+
+        Raises:
+            httpx.HTTPError: если ни один узел Solr не принял пачку
+                (SolrUnavailableError, если ни один узел не был опрошен)
+        """
+        params = {"commitWithin": settings.SOLR_COMMIT_WITHIN_MS}
         headers = {"Content-Type": "application/json"}
-        await self._client.post(url, json=[audit_record], headers=headers)
+        body = encode_audit_batch(audit_records)
+        if settings.SOLR_GZIP and len(body) >= settings.SOLR_GZIP_MIN_BYTES:
+            body = gzip.compress(body, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+
+        tried: set[int] = set()
+        last_error: httpx.HTTPError | None = None
+        while True:
+            index = self._pick_node(tried)
+            if index is None:
+                if last_error is None:
+                    raise SolrUnavailableError("All Solr nodes are unavailable")
+                raise last_error
+            tried.add(index)
+            try:
+                await self._post(self.nodes[index], body, params, headers)
+                return
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code < 500:
+                    # Ошибка в самой пачке - на другом узле будет то же самое
+                    raise
+                last_error = e
+            except httpx.TransportError as e:
+                last_error = e
+
+    async def _post(self, node: SolrNode, body: bytes, params: dict, headers: dict) -> None:
+        node.requests += 1
+        node.outstanding += 1
+        started = time.perf_counter()
+        try:
+            response = await self._client.post(f"{node.base_url}/update", params=params, content=body, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self._record_error(node, e, mark_down=not isinstance(e, httpx.HTTPStatusError) or e.response.status_code >= 500)
+            raise
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            # Отправку отменил таймаут пайплайна, пока узел не ответил - считаем узел зависшим
+            self._record_error(node, e, mark_down=True)
+            raise
+        finally:
+            node.outstanding -= 1
+
+        elapsed = time.perf_counter() - started
+        node.latency.observe(elapsed)
+        elapsed_ms = elapsed * 1000
+        node.latency_ms_total += elapsed_ms
+        node.latency_ms_max = max(node.latency_ms_max, elapsed_ms)
+        node.down_until = 0.0
+
+    def _record_error(self, node: SolrNode, error: BaseException, mark_down: bool) -> None:
+        node.errors += 1
+        SOLR_REQUEST_ERRORS.inc((node.base_url,))
+        node.last_error = repr(error)
+        if mark_down:
+            # Пассивная проверка здоровья: узел исключается до следующей попытки
+            node.down_until = time.monotonic() + settings.SOLR_NODE_COOLDOWN
+            if len(self.nodes) > 1:
+                logger.warning(f"Solr node {node.base_url} marked down for {settings.SOLR_NODE_COOLDOWN}s: {error!r}")
+
+    def get_stats(self) -> dict[str, dict]:
+        """Per-node health, latency and error statistics."""
+        now = time.monotonic()
+        return {node.base_url: node.get_stats(now) for node in self.nodes}
 
     async def aclose(self):
         await self._client.aclose()
-
-    def build_audit_record(
-        self,
-        *,
-        policy: int,
-        policyVersion: int,
-        access: str,
-        repo: str,
-        sess: str,
-        reqUser: str,
-        resource: str,
-        cliIP: str,
-        result: int,
-        agentHost: str,
-        action: str,
-        seq_num: int = 1,
-        event_count: int = 1,
-        event_dur_ms: int = 0,
-        logType: str = "RangerAudit",
-        resType: str = "path",
-        reason: str = "",
-        tags: list = None,
-        cluster: str = "",
-        zone: str = ""
-    ) -> dict:
-        if tags is None:
-            tags = []
-        servicedef_id = get_servisedef_id(settings.RANGER_SERVICEDEF_NAME)
-        evtTime = datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
-        return {
-            "id": str(uuid.uuid4()),
-            "evtTime": evtTime,
-            "policy": policy,
-            "policyVersion": policyVersion,
-            "access": access,
-            "enforcer": "ranger-acl",
-            "repo": repo,
-            "repoType": servicedef_id or 1,
-            "sess": sess,
-            "reqUser": reqUser,
-            "resource": resource,
-            "cliIP": cliIP,
-            "result": result,
-            "agentHost": agentHost,
-            "logType": logType,
-            "resType": resType,
-            "reason": reason,
-            "action": action,
-            "seq_num": seq_num,
-            "event_count": event_count,
-            "event_dur_ms": event_dur_ms,
-            "tags": tags,
-            "cluster": cluster,
-            "zone": zone,
-        }
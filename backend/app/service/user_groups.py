@@ -1,10 +1,19 @@
 """Get user groups from Ranger UserSync."""
 
+import asyncio
 import logging
 from typing import Any
 
-from cachetools import TTLCache
+import httpx
+from cachetools import LRUCache, TTLCache
 
+from app.service.deadline import (
+    FALLBACK_DEFAULT_DECISION,
+    FALLBACK_STALE_GROUPS,
+    Deadline,
+    DeadlineExceeded,
+)
+from app.service.metrics import CACHE_REQUESTS, CHECK_FALLBACKS
 from app.service.ranger_client import RangerClient
 
 logger = logging.getLogger(__name__)
@@ -17,32 +26,98 @@ _user_groups_cache: TTLCache[str, list[str]] = TTLCache(
     ttl=300,  # 5 minutes
 )
 
+# Последние известные группы/роли (без TTL) - fallback, если Ranger не успевает ответить в бюджет запроса
+_user_groups_stale: LRUCache[str, tuple[list[str], list[str]]] = LRUCache(maxsize=10000)
+
+# Загрузки из Ranger в процессе: параллельные промахи по одному пользователю ждут один запрос
+_pending: dict[str, asyncio.Task] = {}
+
+_USER_GROUPS_HIT = ("user_groups", "hit")
+_USER_GROUPS_MISS = ("user_groups", "miss")
+
+
+class UserGroupsUnavailable(Exception):
+    """Ranger could not be asked for the user's groups and none are known from before."""
+
 
 async def get_user_groups_roles_from_ranger(
-    ranger_client: RangerClient, username: str
+    ranger_client: RangerClient, username: str, deadline: Deadline | None = None
 ) -> tuple[list[str], list[str]]:
     """
     Get user groups and roles from Ranger UserSync.
 
+    With a deadline the Ranger lookup is awaited only for the remaining
+    budget; after that the last known groups are returned while the lookup
+    keeps running in the background and refreshes the cache.
+
     Args:
         ranger_client: RangerClient
         username: Username
+        deadline: Request budget (optional)
 
     Returns:
         Tuple of (groups, roles)
+
+    Raises:
+        DeadlineExceeded: budget spent and no previously known groups for the user
+        UserGroupsUnavailable: Ranger failed and no previously known groups for the user
     """
     # Check cache first
     cached = _user_groups_cache.get(username)
     if cached is not None:
-        logger.debug(f"Cache hit for user groups/roles: {username}")
+        CACHE_REQUESTS.inc(_USER_GROUPS_HIT)
+        logger.debug("Cache hit for user groups/roles: %s", username)
         return cached
+    CACHE_REQUESTS.inc(_USER_GROUPS_MISS)
+
+    task = _pending.get(username)
+    if task is None:
+        task = _pending[username] = asyncio.create_task(_load_user_groups_roles(ranger_client, username))
+        task.add_done_callback(lambda done: _forget_pending(username, done))
+    if deadline is None:
+        return await asyncio.shield(task)
+
+    try:
+        # shield: по истечении бюджета загрузка не отменяется и обновит кэш для следующих запросов
+        return await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+    except asyncio.TimeoutError:
+        stale = _user_groups_stale.get(username)
+        if stale is None:
+            CHECK_FALLBACKS.inc(FALLBACK_DEFAULT_DECISION)
+            raise DeadlineExceeded(f"Groups of {username} not loaded within the request budget")
+        CHECK_FALLBACKS.inc(FALLBACK_STALE_GROUPS)
+        logger.debug("Using stale groups/roles for %s", username)
+        return stale
+
+
+def _forget_pending(username: str, task: asyncio.Task) -> None:
+    _pending.pop(username, None)
+    if not task.cancelled() and task.exception() is not None:
+        # Ошибку получает тот, кто ждал задачу; если все ушли по дедлайну - только лог
+        logger.debug("Background group lookup for %s failed: %s", username, task.exception())
+
+
+async def _load_user_groups_roles(ranger_client: RangerClient, username: str) -> tuple[list[str], list[str]]:
+    """
+    Load groups and roles of a user from Ranger and cache them.
 
+    If Ranger fails, the last known groups are returned and neither cache
+    is touched, so an outage does not make users look group-less.
+    """
     # Get user info from Ranger
-    result = await ranger_client.get_user(username)
+    try:
+        result = await ranger_client.get_user(username)
+    except (httpx.HTTPError, ValueError) as e:
+        stale = _user_groups_stale.get(username)
+        if stale is None:
+            raise UserGroupsUnavailable(f"Failed to load groups of {username} from Ranger: {e}")
+        CHECK_FALLBACKS.inc(FALLBACK_STALE_GROUPS)
+        logger.warning(f"Failed to load groups of {username} from Ranger, using last known: {e}")
+        return stale
     if result is None:
         # User not found, cache empty lists
         logger.warning(f"User {username} not found in Ranger")
-        _user_groups_cache[username] = ([], [])
+        _user_groups_cache[username] = _user_groups_stale[username] = ([], [])
         return [], []
 
     groups = []
@@ -60,7 +135,7 @@ async def get_user_groups_roles_from_ranger(
             roles = [r for r in user_roles if isinstance(r, str)]
 
     # Кэшируем
-    _user_groups_cache[username] = (groups, roles)
+    _user_groups_cache[username] = _user_groups_stale[username] = (groups, roles)
 
     logger.info(
         f"Loaded {len(groups)} groups and {len(roles)} roles for user {username}"
@@ -71,6 +146,7 @@ async def get_user_groups_roles_from_ranger(
 def clear_user_groups_cache() -> None:
     """Clear user groups cache."""
     _user_groups_cache.clear()
+    _user_groups_stale.clear()
 
 
 def get_user_groups_cache_stats() -> dict[str, Any]:
@@ -79,5 +155,7 @@ def get_user_groups_cache_stats() -> dict[str, Any]:
         "size": len(_user_groups_cache),
         "maxsize": _user_groups_cache.maxsize,
         "ttl": _user_groups_cache.ttl,
+        "stale_size": len(_user_groups_stale),
+        "pending_lookups": len(_pending),
     }
 
@@ -0,0 +1,178 @@
+"""Tests of /check admission control: slot handoff, queue timeouts, cancellation and priority."""
+
+import asyncio
+
+from app.service.admission import AdmissionController
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = {"max_in_flight": 1, "max_queued": 10, "queue_timeout": 1.0, "shed_mode": "closed"}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def _cheap() -> bool:
+    return True
+
+
+def _expensive() -> bool:
+    return False
+
+
+def test_free_slot_is_taken_without_priority_check() -> None:
+    async def scenario() -> None:
+        controller = _controller(max_in_flight=2)
+
+        def is_cheap() -> bool:
+            raise AssertionError("priority is only checked when the request has to wait")
+
+        assert await controller.acquire(is_cheap)
+        assert await controller.acquire(is_cheap)
+        assert controller.in_flight == 2
+        controller.release()
+        controller.release()
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_release_hands_slot_to_waiter() -> None:
+    async def scenario() -> None:
+        controller = _controller()
+        assert await controller.acquire(_expensive)
+        waiter = asyncio.create_task(controller.acquire(_expensive))
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+
+        controller.release()
+        assert await waiter
+        # Слот передан, а не освобожден и занят заново
+        assert controller.in_flight == 1
+        assert controller.queued == 0
+        controller.release()
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_cached_requests_are_served_first() -> None:
+    async def scenario() -> None:
+        controller = _controller()
+        assert await controller.acquire(_expensive)
+        order: list[str] = []
+
+        async def request(name: str, is_cheap) -> None:
+            assert await controller.acquire(is_cheap)
+            order.append(name)
+            controller.release()
+
+        tasks = [asyncio.create_task(request("normal", _expensive))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("cached", _cheap)))
+        await asyncio.sleep(0)
+
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order == ["cached", "normal"]
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_queue_timeout_sheds_request() -> None:
+    async def scenario() -> None:
+        controller = _controller(queue_timeout=0.01)
+        assert await controller.acquire(_expensive)
+        assert not await controller.acquire(_expensive)
+        assert controller.queued == 0
+        assert controller.get_stats()["shed"] == 1
+
+        # Истекший waiter пропускается, слот возвращается
+        controller.release()
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_budget_caps_queue_wait() -> None:
+    async def scenario() -> None:
+        controller = _controller(queue_timeout=10.0)
+        assert await controller.acquire(_expensive)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert not await controller.acquire(_expensive, budget=0.01)
+        assert loop.time() - started < 1.0
+
+    _run(scenario())
+
+
+def test_full_queue_sheds_immediately() -> None:
+    async def scenario() -> None:
+        controller = _controller(max_queued=1)
+        assert await controller.acquire(_expensive)
+        waiter = asyncio.create_task(controller.acquire(_expensive))
+        await asyncio.sleep(0)
+        assert not await controller.acquire(_cheap)
+
+        controller.release()
+        assert await waiter
+        controller.release()
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_queue_slot() -> None:
+    async def scenario() -> None:
+        controller = _controller()
+        assert await controller.acquire(_expensive)
+        waiter = asyncio.create_task(controller.acquire(_expensive))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.queued == 0
+
+        controller.release()
+        assert controller.in_flight == 0
+
+    _run(scenario())
+
+
+def test_cancel_after_handoff_returns_the_slot() -> None:
+    async def scenario() -> None:
+        controller = _controller()
+        assert await controller.acquire(_expensive)
+        waiter = asyncio.create_task(controller.acquire(_expensive))
+        await asyncio.sleep(0)
+
+        # Слот передан, но запрос отменен раньше, чем успел его забрать
+        controller.release()
+        waiter.cancel()
+        (result,) = await asyncio.gather(waiter, return_exceptions=True)
+        if result is True:
+            # wait_for в Python < 3.12 может проглотить отмену уже завершенного waiter'а:
+            # тогда слот принадлежит запросу и освобождается им как обычно
+            controller.release()
+        assert controller.in_flight == 0
+        assert controller.queued == 0
+
+    _run(scenario())
+
+
+def test_unlimited_in_flight() -> None:
+    async def scenario() -> None:
+        controller = _controller(max_in_flight=0)
+        for _ in range(100):
+            assert await controller.acquire(_expensive)
+        assert controller.get_stats()["shed"] == 0
+
+    _run(scenario())
+
+
+def test_unknown_shed_mode_falls_back_to_closed() -> None:
+    assert not _controller(shed_mode="sideways").fail_open
+    assert _controller(shed_mode="open").fail_open
@@ -0,0 +1,99 @@
+"""Tests of the columnar audit sink: staging on disk, rotation and recovery after a crash."""
+
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+from app.service import audit_sinks
+from app.service.audit_sinks import AuditSink, ColumnarFileAuditSink
+
+
+@pytest.fixture(autouse=True)
+def _without_pyarrow(monkeypatch):
+    # Файлы в формате gzip JSON читаются без pyarrow
+    monkeypatch.setattr(audit_sinks, "pyarrow", None)
+
+
+def _completed(directory) -> list[str]:
+    return sorted(name for name in os.listdir(directory) if name.startswith("audit-") and not name.endswith(".part"))
+
+
+def _rows(directory) -> list[int]:
+    ids = []
+    for name in _completed(directory):
+        with gzip.open(os.path.join(directory, name)) as f:
+            ids.extend(json.loads(f.read())["columns"]["id"])
+    return sorted(ids)
+
+
+def _records(*ids: int) -> list[dict]:
+    return [{"id": i, "result": 1} for i in ids]
+
+
+def test_audit_sink_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        AuditSink()
+
+
+def test_idle_sink_rotates_on_time(tmp_path) -> None:
+    async def scenario() -> None:
+        sink = ColumnarFileAuditSink(str(tmp_path), rows_per_file=100, rotate_seconds=0.05)
+        await sink.write_batch(_records(1, 2))
+        assert _completed(tmp_path) == []
+        # Новых записей нет - файл закрывает таймер
+        await asyncio.sleep(0.3)
+        assert _rows(tmp_path) == [1, 2]
+        assert sink.get_stats()["buffered_rows"] == 0
+        await sink.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_early_timer_is_rearmed(tmp_path) -> None:
+    async def scenario() -> None:
+        sink = ColumnarFileAuditSink(str(tmp_path), rows_per_file=100, rotate_seconds=0.1)
+        await sink.write_batch(_records(1))
+        # Таймер сработал раньше срока (разрешение часов event loop'а)
+        sink._timer.cancel()
+        sink._on_timer()
+        assert sink._timer is not None
+        await asyncio.sleep(0.4)
+        assert _rows(tmp_path) == [1]
+        await sink.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_rotation_by_row_count(tmp_path) -> None:
+    async def scenario() -> None:
+        sink = ColumnarFileAuditSink(str(tmp_path), rows_per_file=3, rotate_seconds=3600)
+        await sink.write_batch(_records(1, 2, 3, 4))
+        await sink._flush_task
+        assert len(_completed(tmp_path)) == 1
+        await sink.write_batch(_records(5))
+        await sink.aclose()
+        assert _rows(tmp_path) == [1, 2, 3, 4, 5]
+        assert sink.get_stats()["records_written"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_staged_rows_survive_a_crash(tmp_path) -> None:
+    async def scenario() -> None:
+        crashed = ColumnarFileAuditSink(str(tmp_path), rows_per_file=100, rotate_seconds=3600)
+        await crashed.write_batch(_records(1, 2))
+        # Процесс упал посреди записи строки: без aclose, последняя строка оборвана
+        with open(crashed._staging_path, "ab") as f:
+            f.write(b'{"id": 3, "res')
+        crashed._staging.close()
+
+        sink = ColumnarFileAuditSink(str(tmp_path), rows_per_file=100, rotate_seconds=3600)
+        await sink.write_batch(_records(4))
+        await sink.aclose()
+        assert _rows(tmp_path) == [1, 2, 4]
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".rows.jsonl")]
+
+    asyncio.run(scenario())
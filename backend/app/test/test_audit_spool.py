@@ -0,0 +1,97 @@
+"""Tests of the audit spool: replay after a restart and recovery from a crash mid-write."""
+
+from app.service.audit_spool import OFFSET_FILE, AuditSpool
+
+
+def _records(*ids: int) -> list[dict]:
+    return [{"id": f"audit-{i}", "result": 1} for i in ids]
+
+
+def _ids(records: list[dict]) -> list[str]:
+    return [record["id"] for record in records]
+
+
+def _crash(spool: AuditSpool, torn: bytes = b"") -> None:
+    # Процесс упал: close() не вызывался, последняя запись могла оборваться
+    if torn:
+        spool._active.write(torn)
+        spool._active.flush()
+    spool._active.close()
+
+
+def test_replay_after_crash_skips_torn_record(tmp_path) -> None:
+    spool = AuditSpool(str(tmp_path), fsync=False)
+    spool.append(_records(1, 2, 3))
+    _crash(spool, torn=b'{"id": "audit-4", "res')
+
+    restarted = AuditSpool(str(tmp_path), fsync=False)
+    restarted.append(_records(5))
+    records, position = restarted.read_batch(100)
+    assert _ids(records) == ["audit-1", "audit-2", "audit-3", "audit-5"]
+    assert restarted.get_stats()["records_skipped"] == 1
+
+    restarted.commit(position, replayed=len(records))
+    assert restarted.read_batch(100)[0] == []
+    assert restarted.get_stats()["pending_bytes"] == 0
+    # Сегмент упавшего процесса вычитан и удален
+    assert restarted.get_stats()["segments"] == 1
+    restarted.close()
+
+
+def test_committed_records_are_not_replayed_after_restart(tmp_path) -> None:
+    spool = AuditSpool(str(tmp_path), fsync=False)
+    spool.append(_records(1, 2, 3, 4))
+    records, position = spool.read_batch(2)
+    assert _ids(records) == ["audit-1", "audit-2"]
+    spool.commit(position, replayed=2)
+    # Вторая пачка прочитана, но доставка не подтверждена
+    assert _ids(spool.read_batch(2)[0]) == ["audit-3", "audit-4"]
+    _crash(spool)
+
+    restarted = AuditSpool(str(tmp_path), fsync=False)
+    assert _ids(restarted.read_batch(100)[0]) == ["audit-3", "audit-4"]
+    restarted.close()
+
+
+def test_corrupted_offset_replays_from_oldest_segment(tmp_path) -> None:
+    spool = AuditSpool(str(tmp_path), fsync=False)
+    spool.append(_records(1, 2))
+    records, position = spool.read_batch(100)
+    spool.commit(position, replayed=len(records))
+    _crash(spool)
+    (tmp_path / OFFSET_FILE).write_text('{"segment": ')
+
+    # Повторная доставка безопасна: Solr перезаписывает документ по id
+    restarted = AuditSpool(str(tmp_path), fsync=False)
+    assert _ids(restarted.read_batch(100)[0]) == ["audit-1", "audit-2"]
+    restarted.close()
+
+
+def test_replay_spans_rotated_segments(tmp_path) -> None:
+    spool = AuditSpool(str(tmp_path), segment_max_bytes=32, fsync=False)
+    for i in range(1, 6):
+        spool.append(_records(i))
+    assert spool.get_stats()["segments"] > 2
+    _crash(spool)
+
+    restarted = AuditSpool(str(tmp_path), segment_max_bytes=32, fsync=False)
+    records, position = restarted.read_batch(100)
+    assert _ids(records) == [f"audit-{i}" for i in range(1, 6)]
+    restarted.commit(position, replayed=len(records))
+    assert restarted.get_stats()["segments"] == 1
+    restarted.close()
+
+
+def test_oldest_segments_are_dropped_over_the_limit(tmp_path) -> None:
+    spool = AuditSpool(str(tmp_path), segment_max_bytes=32, max_total_bytes=200, fsync=False)
+    for i in range(1, 11):
+        spool.append(_records(i))
+    stats = spool.get_stats()
+    assert stats["segments_dropped"] > 0
+    assert stats["total_bytes"] <= 200
+
+    records = spool.read_batch(100)[0]
+    # Отброшены самые старые записи, последние сохранены
+    assert "audit-1" not in _ids(records)
+    assert _ids(records)[-1] == "audit-10"
+    spool.close()
@@ -0,0 +1,105 @@
+"""Tests of the compiled IP whitelist and of the ASGI middleware that enforces it."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.core.middleware import IPWhitelistMiddleware
+from app.service.ip_whitelist import CompiledWhitelist, IPWhitelist, parse_ip
+
+
+def _allowed(compiled: CompiledWhitelist, address: str) -> bool:
+    return compiled.contains(*parse_ip(address))
+
+
+def test_overlapping_and_adjacent_ranges_are_merged() -> None:
+    compiled = CompiledWhitelist(["10.0.0.0/24", "10.0.0.128/25", "10.0.1.0/24", "10.0.3.7", "2001:db8::/64"])
+    assert compiled.starts[4] == [int(parse_ip("10.0.0.0")[1]), int(parse_ip("10.0.3.7")[1])]
+    assert compiled.ends[4][0] == parse_ip("10.0.1.255")[1]
+    assert len(compiled.starts[6]) == 1
+    assert compiled.size == 5
+
+
+@pytest.mark.parametrize(
+    ("address", "expected"),
+    [
+        ("10.0.0.0", True),
+        ("10.0.1.255", True),
+        ("10.0.2.0", False),
+        ("10.0.3.7", True),
+        ("10.0.3.8", False),
+        ("9.255.255.255", False),
+        ("::ffff:10.0.0.5", True),
+        ("2001:db8::1", True),
+        ("2001:db8:0:1::1", False),
+    ],
+)
+def test_contains(address: str, expected: bool) -> None:
+    compiled = CompiledWhitelist(["10.0.0.0/24", "10.0.1.0/24", "10.0.3.7", "2001:db8::/64"])
+    assert _allowed(compiled, address) is expected
+
+
+def test_invalid_entries_are_skipped() -> None:
+    compiled = CompiledWhitelist(["10.0.0.1", "not-an-ip", "300.1.1.1"])
+    assert compiled.invalid == ["not-an-ip", "300.1.1.1"]
+    assert compiled.size == 1
+
+
+def test_not_loaded_whitelist_denies_without_reading_the_file(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "IP_WHITELIST_FILE", str(tmp_path / "missing.txt"))
+    whitelist = IPWhitelist()
+    assert not whitelist.is_allowed("10.0.0.1")
+    with pytest.raises(OSError):
+        whitelist.reload()
+    assert not whitelist.is_allowed("10.0.0.1")
+
+
+def test_reload_from_file(monkeypatch, tmp_path) -> None:
+    path = tmp_path / "whitelist.txt"
+    path.write_text("# офис\n10.0.0.0/24\n\n192.168.1.1  # VPN\n")
+    monkeypatch.setattr(settings, "IP_WHITELIST_FILE", str(path))
+    whitelist = IPWhitelist()
+    assert whitelist.reload()["entries"] == 2
+    assert whitelist.is_allowed("192.168.1.1")
+    assert not whitelist.is_allowed("192.168.1.2")
+    assert not whitelist.is_allowed("garbage")
+
+
+def _call(middleware: IPWhitelistMiddleware, path: str, client_ip: str) -> int:
+    sent: list[dict] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "client": (client_ip, 40000), "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+
+def test_middleware(monkeypatch) -> None:
+    whitelist = IPWhitelist()
+    monkeypatch.setattr("app.core.middleware.ip_whitelist", whitelist)
+    reached: list[str] = []
+
+    async def app(scope, receive, send) -> None:
+        await receive()
+        reached.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = IPWhitelistMiddleware(app, path_prefix="/api/v1/check")
+
+    # Список не загружен - защищенные пути закрыты, остальные доступны
+    assert _call(middleware, "/api/v1/check", "10.0.0.1") == 403
+    assert _call(middleware, "/api/v1/utils/health-check/", "10.0.0.1") == 200
+
+    whitelist.reload(["10.0.0.0/8"])
+    assert _call(middleware, "/api/v1/check", "10.0.0.1") == 200
+    assert _call(middleware, "/api/v1/check", "11.0.0.1") == 403
+    assert _call(middleware, "/api/v1/check", "unknown") == 403
+    # Отклоненные запросы не доходят до приложения
+    assert reached == ["/api/v1/utils/health-check/", "/api/v1/check"]
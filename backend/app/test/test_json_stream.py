@@ -0,0 +1,93 @@
+"""Tests of the incremental JSON array parser used for Ranger policy pages."""
+
+import json
+
+import pytest
+
+from app.service.json_stream import JSONArrayStream
+
+POLICIES = [
+    {"id": 1, "name": "p1", "resources": {"bucket": {"values": ["analytics"]}}},
+    {"id": 2, "name": 'quote " and \\ backslash', "description": "[not, an, array] {}"},
+    {"id": 3, "name": "unicode é中\U0001f600", "escaped": "\\u005d \\n"},
+    12345,
+    -1.5e3,
+    True,
+    None,
+    "string, with ] bracket",
+    [],
+    {},
+]
+
+
+def _parse(chunks: list[bytes]) -> list:
+    stream = JSONArrayStream()
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    stream.close()
+    return items
+
+
+def _split(payload: bytes, size: int) -> list[bytes]:
+    return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 10_000])
+def test_elements_survive_any_chunk_boundary(chunk_size: int) -> None:
+    payload = json.dumps(POLICIES, ensure_ascii=False).encode()
+    assert _parse(_split(payload, chunk_size)) == POLICIES
+
+
+def test_every_split_point_of_multibyte_and_escaped_text() -> None:
+    payload = json.dumps(POLICIES[1:3], ensure_ascii=False).encode()
+    for split in range(1, len(payload)):
+        assert _parse([payload[:split], payload[split:]]) == POLICIES[1:3], split
+
+
+def test_number_at_chunk_boundary_is_not_truncated() -> None:
+    assert _parse([b"[12", b"34, 5", b"6]"]) == [1234, 56]
+
+
+def test_elements_are_returned_as_soon_as_complete() -> None:
+    stream = JSONArrayStream()
+    assert stream.feed(b'[{"id": 1}, {"id"') == [{"id": 1}]
+    assert stream.feed(b': 2}') == []
+    assert stream.feed(b"]") == [{"id": 2}]
+    stream.close()
+
+
+def test_whitespace_and_empty_array() -> None:
+    assert _parse([b"  \n[ ", b" ]\n"]) == []
+    assert _parse([b'[\n  {"a": 1} ,\n  {"b": 2}\n]']) == [{"a": 1}, {"b": 2}]
+
+
+def test_truncated_payload_is_rejected_on_close() -> None:
+    stream = JSONArrayStream()
+    assert stream.feed(b'[{"id": 1}, {"id": 2') == [{"id": 1}]
+    with pytest.raises(ValueError, match="Unexpected end"):
+        stream.close()
+
+
+def test_truncated_after_complete_element() -> None:
+    stream = JSONArrayStream()
+    stream.feed(b'[{"id": 1},')
+    with pytest.raises(ValueError):
+        stream.close()
+
+
+def test_non_array_payload_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Expected JSON array"):
+        JSONArrayStream().feed(b'{"id": 1}')
+
+
+def test_missing_separator_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Expected ','"):
+        _parse([b'[{"id": 1} {"id": 2}]'])
+
+
+def test_extra_data_after_array_is_rejected() -> None:
+    stream = JSONArrayStream()
+    stream.feed(b"[1] [2]")
+    with pytest.raises(ValueError, match="Extra data"):
+        stream.close()
@@ -0,0 +1,119 @@
+"""Tests of the impliedGrants closure and of the access bitmasks of compiled policy items."""
+
+import pytest
+
+from app.service import policy_compiler
+from app.service.policy_compiler import (
+    access_bit,
+    access_mask,
+    access_mask_names,
+    compile_policy,
+    item_access_mask,
+    set_access_types,
+)
+
+ACCESS_TYPES = [
+    {"name": "read", "impliedGrants": []},
+    {"name": "list", "impliedGrants": []},
+    {"name": "write", "impliedGrants": ["list"]},
+    {"name": "admin", "impliedGrants": ["write", "read"]},
+    # Цикл: cycle-a -> cycle-b -> cycle-a
+    {"name": "cycle-a", "impliedGrants": ["cycle-b"]},
+    {"name": "cycle-b", "impliedGrants": ["cycle-a", "read"]},
+]
+
+
+@pytest.fixture(autouse=True)
+def _restore_implied_masks():
+    # Замыкание - состояние модуля, не оставляем его другим тестам
+    saved = dict(policy_compiler._implied_masks)
+    yield
+    policy_compiler._implied_masks.clear()
+    policy_compiler._implied_masks.update(saved)
+
+
+def _mask(*names: str) -> int:
+    mask = 0
+    for name in names:
+        mask |= access_bit(name)
+    return mask
+
+
+def test_transitive_chain() -> None:
+    closure = set_access_types(ACCESS_TYPES)
+    assert sorted(closure["admin"]) == ["admin", "list", "read", "write"]
+    assert sorted(closure["write"]) == ["list", "write"]
+    assert closure["read"] == ["read"]
+
+
+def test_cycle_terminates_with_full_closure() -> None:
+    closure = set_access_types(ACCESS_TYPES)
+    assert sorted(closure["cycle-a"]) == ["cycle-a", "cycle-b", "read"]
+    assert sorted(closure["cycle-b"]) == ["cycle-a", "cycle-b", "read"]
+
+
+def test_self_reference_and_unknown_grants() -> None:
+    closure = set_access_types([
+        {"name": "self", "impliedGrants": ["self"]},
+        {"name": "outer", "impliedGrants": ["undeclared", 42]},
+        {"name": "empty", "impliedGrants": None},
+        {"impliedGrants": ["read"]},
+        "not an access type",
+    ])
+    assert closure["self"] == ["self"]
+    assert sorted(closure["outer"]) == ["outer", "undeclared"]
+    assert closure["empty"] == ["empty"]
+    assert len(closure) == 3
+
+
+def test_bits_are_distinct_and_stable() -> None:
+    set_access_types(ACCESS_TYPES)
+    bits = [access_bit(item["name"]) for item in ACCESS_TYPES]
+    assert all(bit and bit & (bit - 1) == 0 for bit in bits)
+    assert len(set(bits)) == len(bits)
+    # Повторная загрузка servicedef не перенумеровывает биты
+    set_access_types(list(reversed(ACCESS_TYPES)))
+    assert [access_bit(item["name"]) for item in ACCESS_TYPES] == bits
+    assert access_bit("never-declared-access-type") == 0
+
+
+def test_access_mask_includes_implied_grants() -> None:
+    set_access_types(ACCESS_TYPES)
+    assert access_mask(["admin"]) == _mask("admin", "write", "read", "list")
+    assert access_mask(["write", "read"]) == _mask("write", "list", "read")
+    assert access_mask(["cycle-b"]) == _mask("cycle-a", "cycle-b", "read")
+    assert access_mask([]) == 0
+    assert sorted(access_mask_names(access_mask(["write"]))) == ["list", "write"]
+
+
+def test_access_type_outside_servicedef_gets_its_own_bit() -> None:
+    set_access_types(ACCESS_TYPES)
+    mask = access_mask(["policy-only-access"])
+    assert mask == access_bit("policy-only-access") != 0
+    assert not mask & access_mask(["admin"])
+
+
+def test_item_access_mask_counts_allowed_accesses_only() -> None:
+    set_access_types(ACCESS_TYPES)
+    policy_item = {
+        "accesses": [
+            {"type": "write", "isAllowed": True},
+            {"type": "admin", "isAllowed": False},
+            {"type": "read"},
+            {"type": None, "isAllowed": True},
+        ],
+    }
+    assert item_access_mask(policy_item) == _mask("write", "list")
+    assert item_access_mask({}) == 0
+
+
+def test_compiled_policy_items_carry_the_mask() -> None:
+    set_access_types(ACCESS_TYPES)
+    compiled = compile_policy({
+        "id": 1,
+        "description": "dropped",
+        "policyItems": [{"users": ["alice"], "accesses": [{"type": "admin", "isAllowed": True}]}],
+    })
+    assert "description" not in compiled
+    assert compiled["policyItems"][0]["_access_mask"] == access_mask(["admin"])
+    assert compile_policy({"id": 2, "isEnabled": False}) is None
@@ -0,0 +1,185 @@
+"""Tests of policy item condition compilation and of condition-keyed authorization caching."""
+
+import pytest
+
+from app.service.cache import (
+    MAX_CONDITION_VARIANTS,
+    cache_authorization,
+    clear_cache,
+    get_cached_authorization,
+    is_authorization_cached,
+)
+from app.service.policy_conditions import (
+    CURRENT_TIME,
+    SECURE_TRANSPORT,
+    SOURCE_IP,
+    ConditionContext,
+    IpRangeCondition,
+    SecureTransportCondition,
+    TimeWindowCondition,
+    UnsupportedCondition,
+    compile_conditions,
+)
+
+# 2026-10-19 - понедельник
+MONDAY_NOON = "2026-10-19T12:00:00Z"
+
+
+def _context(**conditions: str) -> ConditionContext:
+    return ConditionContext({key: [value] for key, value in conditions.items()})
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def test_compile_conditions_types() -> None:
+    compiled = compile_conditions([
+        {"type": "ip-range", "values": ["10.0.0.0/8"]},
+        {"type": "time-window", "values": ["09:00-18:00"]},
+        {"type": "secure-transport", "values": ["true"]},
+        {"type": "geo-location", "values": ["RU"]},
+    ])
+    assert [type(condition) for condition in compiled] == [
+        IpRangeCondition, TimeWindowCondition, SecureTransportCondition, UnsupportedCondition,
+    ]
+    assert compile_conditions(None) == ()
+
+
+def test_malformed_condition_never_matches() -> None:
+    (condition,) = compile_conditions([{"type": "time-window", "values": ["whenever"]}])
+    assert isinstance(condition, UnsupportedCondition)
+    assert not condition.matches(_context(**{CURRENT_TIME: MONDAY_NOON}))
+
+
+@pytest.mark.parametrize(
+    ("source_ip", "expected"),
+    [
+        ("10.1.2.3", True),
+        ("10.2.0.1", False),
+        ("192.168.5.5", True),
+        ("::ffff:10.1.0.9", True),
+        ("2001:db8::1", True),
+        ("not-an-ip", False),
+    ],
+)
+def test_ip_range(source_ip: str, expected: bool) -> None:
+    (condition,) = compile_conditions([
+        {"type": "ip-range", "values": ["10.1.*", "192.168.5.0/24", "2001:db8::/32"]},
+    ])
+    assert condition.matches(_context(**{SOURCE_IP: source_ip})) is expected
+
+
+def test_ip_range_without_source_ip() -> None:
+    (condition,) = compile_conditions([{"type": "ip-range", "values": ["0.0.0.0/0"]}])
+    assert not condition.matches(ConditionContext(None))
+
+
+@pytest.mark.parametrize(
+    ("window", "moment", "expected"),
+    [
+        ("Mon-Fri 09:00-18:00", MONDAY_NOON, True),
+        ("Mon-Fri 09:00-18:00", "2026-10-18T12:00:00Z", False),  # воскресенье
+        ("Mon-Fri 09:00-18:00", "2026-10-19T18:00:00Z", False),  # конец окна не включается
+        ("Sat,Sun 10:00-14:00", "2026-10-18T11:00:00Z", True),
+        ("22:00-06:00", "2026-10-19T23:30:00Z", True),
+        ("22:00-06:00", "2026-10-19T05:59:00Z", True),
+        ("22:00-06:00", MONDAY_NOON, False),
+        ("Fri 22:00-06:00", "2026-10-24T03:00:00Z", True),  # ночь с пятницы на субботу
+        ("Fri 22:00-06:00", "2026-10-25T03:00:00Z", False),
+        ("09:00-18:00", "2026-10-19T14:00:00+03:00", True),  # 11:00 UTC
+        ("09:00-18:00", "2026-10-19T10:00:00+03:00", False),  # 07:00 UTC
+    ],
+)
+def test_time_window(window: str, moment: str, expected: bool) -> None:
+    (condition,) = compile_conditions([{"type": "time-window", "values": [window]}])
+    assert condition.matches(_context(**{CURRENT_TIME: moment})) is expected
+
+
+def test_secure_transport() -> None:
+    (condition,) = compile_conditions([{"type": "secure-transport", "values": ["true"]}])
+    assert condition.matches(_context(**{SECURE_TRANSPORT: "TRUE"}))
+    assert not condition.matches(_context(**{SECURE_TRANSPORT: "false"}))
+    assert not condition.matches(ConditionContext({}))
+
+
+def test_context_records_used_inputs() -> None:
+    context = _context(**{SOURCE_IP: "10.0.0.1", CURRENT_TIME: MONDAY_NOON})
+    assert context.used == set()
+    context.source_ip()
+    assert context.used == {SOURCE_IP}
+    # Время в ключе кэша обрезается до минуты
+    later = _context(**{CURRENT_TIME: "2026-10-19T12:00:59Z"})
+    assert context.cache_values((CURRENT_TIME,)) == later.cache_values((CURRENT_TIME,))
+
+
+def _cache(allowed: bool, context: ConditionContext | None) -> None:
+    cache_authorization("svc", "user", "bucket", "key", "read", allowed, True, 7, context)
+
+
+def _get(context: ConditionContext | None):
+    return get_cached_authorization("svc", "user", "bucket", "key", "read", context)
+
+
+def test_unconditional_decision_is_shared() -> None:
+    _cache(True, ConditionContext({}))
+    assert _get(_context(**{SOURCE_IP: "10.0.0.1"})) == (True, True, 7)
+    assert _get(None) == (True, True, 7)
+
+
+def test_decision_is_keyed_by_consulted_inputs() -> None:
+    context = _context(**{SOURCE_IP: "10.0.0.1"})
+    context.source_ip()
+    _cache(True, context)
+
+    assert _get(_context(**{SOURCE_IP: "10.0.0.1", SECURE_TRANSPORT: "true"})) == (True, True, 7)
+    assert _get(_context(**{SOURCE_IP: "10.0.0.2"})) is None
+    assert _get(None) is None
+
+    other = _context(**{SOURCE_IP: "10.0.0.2"})
+    other.source_ip()
+    _cache(False, other)
+    assert _get(_context(**{SOURCE_IP: "10.0.0.1"})) == (True, True, 7)
+    assert _get(_context(**{SOURCE_IP: "10.0.0.2"})) == (False, True, 7)
+
+
+def test_new_input_resets_variants() -> None:
+    by_ip = _context(**{SOURCE_IP: "10.0.0.1"})
+    by_ip.source_ip()
+    _cache(True, by_ip)
+
+    by_ip_and_time = _context(**{SOURCE_IP: "10.0.0.1", CURRENT_TIME: MONDAY_NOON})
+    by_ip_and_time.source_ip()
+    by_ip_and_time.minute()
+    _cache(False, by_ip_and_time)
+
+    # Прежнее решение не учитывало время - после расширения набора входов оно сброшено
+    assert _get(_context(**{SOURCE_IP: "10.0.0.1"})) is None
+    assert _get(_context(**{SOURCE_IP: "10.0.0.1", CURRENT_TIME: MONDAY_NOON})) == (False, True, 7)
+
+
+def test_variants_are_bounded() -> None:
+    for i in range(MAX_CONDITION_VARIANTS + 1):
+        context = _context(**{SOURCE_IP: f"10.0.{i // 256}.{i % 256}"})
+        context.source_ip()
+        _cache(True, context)
+    assert _get(_context(**{SOURCE_IP: "10.0.0.0"})) is None
+    last = MAX_CONDITION_VARIANTS
+    assert _get(_context(**{SOURCE_IP: f"10.0.{last // 256}.{last % 256}"})) == (True, True, 7)
+
+
+def test_is_authorization_cached_matches_lookup() -> None:
+    context = _context(**{SOURCE_IP: "10.0.0.1"})
+    context.source_ip()
+    _cache(True, context)
+
+    def cached(source_ip: str | None) -> bool:
+        probe = _context(**{SOURCE_IP: source_ip}) if source_ip else None
+        return is_authorization_cached("svc", "user", "bucket", "key", "read", probe)
+
+    assert cached("10.0.0.1")
+    assert not cached("10.0.0.2")
+    assert not cached(None)
@@ -0,0 +1,109 @@
+"""Tests of policy validity schedule parsing and of the policy timeline."""
+
+import math
+from datetime import datetime, timezone
+
+from app.service.policy_schedule import (
+    PolicyTimeline,
+    is_policy_active,
+    parse_validity_schedules,
+)
+
+
+def _ts(value: str) -> float:
+    return datetime.strptime(value, "%Y/%m/%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+JAN = _ts("2026/01/01 00:00:00")
+FEB = _ts("2026/02/01 00:00:00")
+MAR = _ts("2026/03/01 00:00:00")
+APR = _ts("2026/04/01 00:00:00")
+
+
+def _policy(policy_id: int, *intervals: tuple[float, float]) -> dict:
+    return {"id": policy_id, "_validity": intervals}
+
+
+def test_closed_interval_in_utc() -> None:
+    schedules = [{"startTime": "2026/01/01 00:00:00", "endTime": "2026/02/01 00:00:00"}]
+    assert parse_validity_schedules(schedules) == ((JAN, FEB),)
+
+
+def test_open_ends() -> None:
+    assert parse_validity_schedules([{"endTime": "2026/02/01 00:00:00"}]) == ((-math.inf, FEB),)
+    assert parse_validity_schedules([{"startTime": "2026/01/01 00:00:00", "endTime": ""}]) == ((JAN, math.inf),)
+    assert parse_validity_schedules([{}]) == ((-math.inf, math.inf),)
+
+
+def test_time_zone() -> None:
+    schedules = [{"startTime": "2026/01/01 03:00:00", "timeZone": "Europe/Moscow"}]
+    assert parse_validity_schedules(schedules) == ((JAN, math.inf),)
+
+
+def test_unsupported_schedules_never_activate() -> None:
+    schedules = [
+        {"startTime": "2026/01/01 00:00:00", "recurrences": [{"schedule": {"hour": "9"}}]},
+        {"startTime": "01.01.2026"},
+        {"startTime": "2026/01/01 00:00:00", "timeZone": "Mars/Olympus"},
+        {"startTime": "2026/02/01 00:00:00", "endTime": "2026/01/01 00:00:00"},
+        "not a schedule",
+    ]
+    intervals = parse_validity_schedules(schedules)
+    assert intervals == ()
+    # Политика с расписаниями, ни одно из которых не действует, неактивна
+    assert not is_policy_active({"_validity": intervals}, JAN)
+
+
+def test_policy_without_schedules_is_always_active() -> None:
+    assert is_policy_active({"id": 1}, JAN)
+    assert is_policy_active({"id": 1, "_validity": None}, -1e12)
+
+
+def test_timeline_without_schedules_returns_same_list() -> None:
+    policies = [{"id": 1}, {"id": 2, "_validity": None}]
+    timeline = PolicyTimeline(policies)
+    assert timeline.scheduled == 0
+    assert timeline.active_at(JAN) is policies
+    assert timeline.next_boundary(JAN) is None
+
+
+def test_active_at_with_open_ended_intervals() -> None:
+    always = {"id": 0}
+    until_feb = _policy(1, (-math.inf, FEB))
+    from_mar = _policy(2, (MAR, math.inf))
+    feb_to_mar = _policy(3, (FEB, MAR))
+    timeline = PolicyTimeline([always, until_feb, from_mar, feb_to_mar])
+
+    assert timeline.scheduled == 3
+    assert timeline.boundaries == [FEB, MAR]
+    assert timeline.active_at(JAN) == [always, until_feb]
+    # Начало интервала включается, конец - нет
+    assert timeline.active_at(FEB) == [always, feb_to_mar]
+    assert timeline.active_at(MAR) == [always, from_mar]
+    assert timeline.active_at(APR) == [always, from_mar]
+
+
+def test_next_boundary_with_open_ended_intervals() -> None:
+    timeline = PolicyTimeline([
+        _policy(1, (-math.inf, FEB)),
+        _policy(2, (MAR, math.inf)),
+        _policy(3, (-math.inf, math.inf)),
+    ])
+    assert timeline.boundaries == [FEB, MAR]
+    assert timeline.next_boundary(JAN) == FEB
+    # Граница строго после момента
+    assert timeline.next_boundary(FEB) == MAR
+    assert timeline.next_boundary(FEB + 1) == MAR
+    assert timeline.next_boundary(MAR) is None
+    assert timeline.next_boundary(APR) is None
+
+
+def test_multiple_intervals_of_one_policy() -> None:
+    policy = _policy(1, (JAN, FEB), (MAR, APR))
+    timeline = PolicyTimeline([policy])
+    assert timeline.boundaries == [JAN, FEB, MAR, APR]
+    assert timeline.active_at(JAN) == [policy]
+    assert timeline.active_at(FEB) == []
+    assert timeline.active_at(MAR) == [policy]
+    assert timeline.active_at(APR) == []
+    assert timeline.next_boundary(FEB) == MAR
@@ -0,0 +1,48 @@
+"""Tests of the S3 action registry and of action to Ranger access type mapping."""
+
+import pytest
+
+from app.service.authorizer import map_action_to_access_type
+from app.service.constants import S3AccessType, S3ResourceType
+from app.service.s3_actions import S3Action, S3ActionRegistry, s3_action_registry
+
+
+@pytest.mark.parametrize(
+    ("action", "object_path", "expected"),
+    [
+        ("s3:GetObject", "file.txt", S3AccessType.READ),
+        ("s3:PutObject", "dir/file.txt", S3AccessType.WRITE),
+        ("s3:ListBucket", None, S3AccessType.LIST),
+        ("s3:DeleteBucket", None, S3AccessType.DELETE),
+        ("admin:ServerInfo", None, S3AccessType.ADMIN),
+        ("kms:CreateKey", None, S3AccessType.ADMIN),
+    ],
+)
+def test_map_action_to_access_type(action: str, object_path: str | None, expected: S3AccessType) -> None:
+    assert map_action_to_access_type(action, object_path) is expected
+
+
+def test_object_action_requires_object_key() -> None:
+    with pytest.raises(ValueError, match="requires an object key"):
+        map_action_to_access_type("s3:GetObject", None)
+    with pytest.raises(ValueError):
+        map_action_to_access_type("s3:PutObject", "")
+
+
+def test_unmapped_action_is_denied_and_reported() -> None:
+    assert map_action_to_access_type("s3:NoSuchAction", "file.txt") is None
+    assert s3_action_registry.get_stats()["unmapped"]["s3:NoSuchAction"] >= 1
+
+
+def test_registry_prefixes_and_resource_levels() -> None:
+    registry = S3ActionRegistry({
+        "read": {"object": ["s3:GetObject"]},
+        "admin": {"service": ["admin:*", "admin:Heal*"]},
+        "list": {"bucket": ["s3:ListBucket"]},
+    })
+    assert registry.lookup("s3:GetObject") == S3Action(S3AccessType.READ, S3ResourceType.OBJECT)
+    assert registry.lookup("s3:ListBucket") == S3Action(S3AccessType.LIST, S3ResourceType.BUCKET)
+    assert registry.lookup("admin:HealFormat").access is S3AccessType.ADMIN
+    assert registry.get_stats()["prefixes"] == ["admin:Heal*", "admin:*"]
+    assert registry.lookup("s3:PutObject") is None
+    assert registry.get_stats()["unmapped"] == {"s3:PutObject": 1}
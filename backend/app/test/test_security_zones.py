@@ -0,0 +1,145 @@
+"""Tests of security zone resolution and of zone-partitioned policy loading."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.service.cache import clear_policy_cache, get_policies, set_policies
+from app.service.policy_loader import load_policies
+from app.service.security_zones import UNZONED, ZoneIndex, resolve_zone, set_zones
+
+SERVICE = "minio-zones-test"
+
+ZONES = [
+    {
+        "name": "analytics",
+        "services": {SERVICE: {"resources": [{"bucket": ["analytics", "reports-*"]}]}},
+    },
+    {
+        "name": "hr",
+        "services": {SERVICE: {"resources": [{"bucket": ["shared"], "object": ["shared/hr/*"]}]}},
+    },
+    {
+        "name": "foreign",
+        "services": {"other-service": {"resources": [{"bucket": ["shared"]}]}},
+    },
+]
+
+
+def _policy(policy_id: int, zone: str | None = None) -> dict:
+    policy = {
+        "id": policy_id,
+        "name": f"p{policy_id}",
+        "isEnabled": True,
+        "resources": {"bucket": {"values": ["*"]}},
+        "policyItems": [],
+    }
+    if zone is not None:
+        policy["zoneName"] = zone
+    return policy
+
+
+@pytest.fixture(autouse=True)
+def _clean_policies():
+    clear_policy_cache()
+    yield
+    clear_policy_cache()
+
+
+@pytest.mark.parametrize(
+    ("bucket", "object_path", "expected"),
+    [
+        ("analytics", None, "analytics"),
+        ("analytics", "any/key", "analytics"),
+        ("reports-2026", "q3.csv", "analytics"),
+        ("shared", "shared/hr/salaries.csv", "hr"),
+        ("shared", "shared/public/readme.txt", UNZONED),
+        ("shared", None, UNZONED),
+        ("logs", "app.log", UNZONED),
+    ],
+)
+def test_zone_index_resolve(bucket: str, object_path: str | None, expected: str) -> None:
+    assert ZoneIndex(ZONES, SERVICE).resolve(bucket, object_path) == expected
+
+
+def test_zone_index_only_takes_zones_of_its_service() -> None:
+    index = ZoneIndex(ZONES, SERVICE)
+    assert index.zone_names == ["analytics", "hr"]
+    assert ZoneIndex(ZONES, "other-service").resolve("shared", None) == "foreign"
+
+
+def test_zone_index_memoizes_buckets() -> None:
+    index = ZoneIndex(ZONES, SERVICE)
+    index.resolve("reports-1", None)
+    index.resolve("reports-1", "x")
+    index.resolve("logs", None)
+    assert index.get_stats()["resolved_buckets"] == 2
+
+
+def test_resolve_zone_without_loaded_zones() -> None:
+    assert resolve_zone("service-without-zones", "analytics", None) is None
+    set_zones(SERVICE, ZONES)
+    assert resolve_zone(SERVICE, "analytics", None) == "analytics"
+
+
+def test_policies_are_partitioned_by_zone() -> None:
+    unzoned, analytics, hr = _policy(1), _policy(2, "analytics"), _policy(3, "hr")
+    set_policies(SERVICE, [unzoned, analytics, hr])
+    assert get_policies(SERVICE) == [unzoned, analytics, hr]
+    assert get_policies(SERVICE, UNZONED) == [unzoned]
+    assert get_policies(SERVICE, "analytics") == [analytics]
+    assert get_policies(SERVICE, "missing") == []
+
+
+class _FakeRanger:
+    def __init__(self, zones: list[dict] | None, policies: list[dict]):
+        self.zones = zones
+        self.policies = policies
+        self.policy_fetches = 0
+
+    async def get_servicedef(self, name: str) -> None:
+        return None
+
+    async def get_security_zones(self) -> list[dict] | None:
+        return self.zones
+
+    async def iter_policies(self, service: str, fetch_stats=None):
+        self.policy_fetches += 1
+        for policy in self.policies:
+            yield policy
+
+
+def test_load_with_zones(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_SECURITY_ZONES_ENABLED", True)
+    ranger = _FakeRanger(ZONES, [_policy(1), _policy(2, "analytics")])
+    asyncio.run(load_policies(ranger, SERVICE))
+    zone = resolve_zone(SERVICE, "analytics", None)
+    assert [policy["id"] for policy in get_policies(SERVICE, zone)] == [2]
+
+
+def test_failed_zone_fetch_keeps_previous_policies(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_SECURITY_ZONES_ENABLED", True)
+    asyncio.run(load_policies(_FakeRanger(ZONES, [_policy(1)]), SERVICE))
+
+    ranger = _FakeRanger(None, [_policy(1), _policy(2)])
+    with pytest.raises(RuntimeError, match="Security zones"):
+        asyncio.run(load_policies(ranger, SERVICE))
+    assert ranger.policy_fetches == 0
+    assert [policy["id"] for policy in get_policies(SERVICE)] == [1]
+
+
+def test_failed_first_zone_fetch_fails_closed(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_SECURITY_ZONES_ENABLED", True)
+    with pytest.raises(RuntimeError):
+        asyncio.run(load_policies(_FakeRanger(None, [_policy(1)]), "minio-never-loaded"))
+    # Ни одной политики - authorizer отказывает
+    assert get_policies("minio-never-loaded") == []
+
+
+def test_zones_disabled_by_default() -> None:
+    assert settings.RANGER_SECURITY_ZONES_ENABLED is False
+    ranger = _FakeRanger(None, [_policy(1, "analytics")])
+    asyncio.run(load_policies(ranger, "minio-no-zones"))
+    assert resolve_zone("minio-no-zones", "analytics", None) is None
+    assert [policy["id"] for policy in get_policies("minio-no-zones")] == [1]
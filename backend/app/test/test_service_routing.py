@@ -0,0 +1,109 @@
+"""Tests of bucket to Ranger service routing and of the per-service policy loader schedule."""
+
+import asyncio
+
+import pytest
+
+from app.core.config import Settings, settings
+from app.service import policy_loader
+from app.service.policy_loader import _next_delay, get_loader_stats, request_refresh
+from app.service.service_router import ServiceRouter
+
+ROUTES = {
+    "analytics": "minio-analytics",
+    "logs-*": "minio-logs",
+    "logs-audit-*": "minio-audit",
+    "logs-audit-2026": "minio-analytics",
+}
+
+
+@pytest.mark.parametrize(
+    ("bucket", "expected"),
+    [
+        ("analytics", "minio-analytics"),
+        ("analytics-2", "minio-default"),
+        ("logs-app", "minio-logs"),
+        ("logs-", "minio-logs"),
+        ("logs", "minio-default"),
+        ("logs-audit-2025", "minio-audit"),  # длинный префикс важнее короткого
+        ("logs-audit-2026", "minio-analytics"),  # точное имя важнее префикса
+        ("", "minio-default"),
+    ],
+)
+def test_resolve(bucket: str, expected: str) -> None:
+    assert ServiceRouter(ROUTES, "minio-default").resolve(bucket) == expected
+
+
+def test_resolution_is_memoized_and_bounded(monkeypatch) -> None:
+    router = ServiceRouter(ROUTES, "minio-default")
+    monkeypatch.setattr(ServiceRouter, "MAX_RESOLVED", 2)
+    for bucket in ("a", "b", "c"):
+        router.resolve(bucket)
+    assert list(router._resolved) == ["c"]
+    assert router.resolve("c") == "minio-default"
+
+
+def test_routes_and_services_from_settings() -> None:
+    configured = Settings(
+        RANGER_SERVICE_NAME="minio-default",
+        RANGER_SERVICE_NAMES_RAW="minio-extra, minio-logs",
+        RANGER_SERVICE_ROUTES_RAW="analytics=minio-analytics, logs-*=minio-logs, broken, =nobody",
+    )
+    assert configured.RANGER_SERVICE_ROUTES == {"analytics": "minio-analytics", "logs-*": "minio-logs"}
+    assert configured.RANGER_SERVICE_NAMES == ["minio-default", "minio-extra", "minio-logs", "minio-analytics"]
+
+
+def test_next_delay_backoff(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_REFRESH_JITTER", 0)
+    monkeypatch.setattr(settings, "RANGER_REFRESH_MAX_BACKOFF", 900)
+    assert _next_delay(60, 0) == 60
+    assert _next_delay(60, 1) == 120
+    assert _next_delay(60, 3) == 480
+    assert _next_delay(60, 4) == 900
+    assert _next_delay(60, 50) == 900
+
+
+def test_next_delay_jitter(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_REFRESH_JITTER", 0.1)
+    delays = [_next_delay(100, 0) for _ in range(200)]
+    assert all(90 <= delay <= 110 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+class _FakeRanger:
+    def __init__(self) -> None:
+        self.loads = 0
+
+    async def get_servicedef(self, name: str) -> None:
+        return None
+
+    async def iter_policies(self, service: str, fetch_stats=None):
+        self.loads += 1
+        for policy in ():
+            yield policy
+
+
+def test_triggers_are_debounced(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "RANGER_REFRESH_DEBOUNCE", 0.05)
+    monkeypatch.setattr(settings, "RANGER_REFRESH_MIN_INTERVAL", 0)
+    monkeypatch.setattr(settings, "RANGER_SECURITY_ZONES_ENABLED", False)
+    service = "minio-debounce-test"
+
+    async def scenario() -> None:
+        ranger = _FakeRanger()
+        policy_loader.start_policy_loader(ranger, interval=3600, service_names=[service])
+        try:
+            await asyncio.sleep(0.02)
+            assert ranger.loads == 1  # загрузка при старте
+            for _ in range(3):
+                assert request_refresh(service) == [service]
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)
+            assert ranger.loads == 2
+            stats = get_loader_stats()[service]
+            assert stats["trigger_count"] == 3
+            assert stats["last_reason"] == "triggered"
+        finally:
+            policy_loader.stop_policy_loader()
+
+    asyncio.run(scenario())
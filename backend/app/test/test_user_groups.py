@@ -0,0 +1,63 @@
+"""Tests of user group lookups: not-found users versus Ranger failures."""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.service import user_groups
+from app.service.user_groups import (
+    UserGroupsUnavailable,
+    clear_user_groups_cache,
+    get_user_groups_roles_from_ranger,
+)
+
+
+class _FakeRanger:
+    def __init__(self) -> None:
+        self.users: dict[str, dict] = {}
+        self.error: Exception | None = None
+
+    async def get_user(self, username: str) -> dict | None:
+        if self.error is not None:
+            raise self.error
+        return self.users.get(username)
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    clear_user_groups_cache()
+    yield
+    clear_user_groups_cache()
+
+
+def _lookup(ranger: _FakeRanger, username: str):
+    return asyncio.run(get_user_groups_roles_from_ranger(ranger, username))
+
+
+def test_missing_user_is_cached_as_group_less() -> None:
+    ranger = _FakeRanger()
+    assert _lookup(ranger, "ghost") == ([], [])
+    assert user_groups._user_groups_cache["ghost"] == ([], [])
+
+
+def test_ranger_error_serves_last_known_groups() -> None:
+    ranger = _FakeRanger()
+    ranger.users["alice"] = {"groupNameList": ["analytics"], "userRoleList": ["ROLE_USER"]}
+    assert _lookup(ranger, "alice") == (["analytics"], ["ROLE_USER"])
+
+    user_groups._user_groups_cache.clear()
+    ranger.error = httpx.ConnectError("Ranger is down")
+    assert _lookup(ranger, "alice") == (["analytics"], ["ROLE_USER"])
+    # Ошибка не кэшируется: следующий запрос снова спросит Ranger
+    assert "alice" not in user_groups._user_groups_cache
+    assert user_groups._user_groups_stale["alice"] == (["analytics"], ["ROLE_USER"])
+
+
+def test_ranger_error_without_known_groups() -> None:
+    ranger = _FakeRanger()
+    ranger.error = httpx.ReadTimeout("slow")
+    with pytest.raises(UserGroupsUnavailable):
+        _lookup(ranger, "bob")
+    assert "bob" not in user_groups._user_groups_cache
+    assert "bob" not in user_groups._user_groups_stale
@@ -0,0 +1,92 @@
+"""
+Микробенчмарк построения и сериализации audit-записей.
+
+Запуск: python -m scripts.bench_audit [количество записей]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from app.service import json_codec
+from app.service.audit_record import audit_record_builder, encode_audit_batch
+
+BATCH_SIZE = 500
+
+
+def build_reference_record(**fields) -> dict:
+    """Прежний способ: uuid4 + datetime.isoformat + полный dict на каждую запись."""
+    return {
+        "id": str(uuid.uuid4()),
+        "evtTime": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+        "policy": fields["policy"],
+        "policyVersion": 1,
+        "access": fields["access"],
+        "enforcer": "ranger-acl",
+        "repo": fields["repo"],
+        "repoType": 1,
+        "sess": "",
+        "reqUser": fields["reqUser"],
+        "resource": fields["resource"],
+        "cliIP": fields["cliIP"],
+        "result": 1,
+        "agentHost": "localhost",
+        "logType": "RangerAudit",
+        "resType": "path",
+        "reason": "",
+        "action": fields["access"],
+        "seq_num": 1,
+        "event_count": 1,
+        "event_dur_ms": 0,
+        "tags": [],
+        "cluster": "",
+        "zone": "",
+    }
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(f"{name:<40} {count / elapsed:>12,.0f} records/s  ({elapsed * 1e6 / count:.2f} us/record)")
+
+
+def main(count: int) -> None:
+    fields = {
+        "policy": 1,
+        "access": "read",
+        "repo": "analytics",
+        "reqUser": "user1",
+        "resource": "/analytics/file.txt",
+        "cliIP": "10.0.0.1",
+    }
+
+    start = time.perf_counter()
+    reference = [build_reference_record(**fields) for _ in range(count)]
+    report("build (uuid4 + datetime)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    records = [
+        audit_record_builder.build(
+            policyVersion=1, sess="", result=1, agentHost="localhost", action="read", **fields
+        )
+        for _ in range(count)
+    ]
+    report("build (template + counter id)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, count, BATCH_SIZE):
+        json.dumps(reference[i:i + BATCH_SIZE]).encode()
+    report("serialize batch (json.dumps)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, count, BATCH_SIZE):
+        json_codec.dumps(records[i:i + BATCH_SIZE])
+    report("serialize batch (json_codec.dumps)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, count, BATCH_SIZE):
+        encode_audit_batch(records[i:i + BATCH_SIZE])
+    report("serialize batch (encode_audit_batch)", count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
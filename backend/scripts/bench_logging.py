@@ -0,0 +1,91 @@
+"""
+Микробенчмарк стоимости логирования на горячем пути проверки доступа.
+
+Прогоняет PolicyChecker.check_access по набору политик (совпадает последняя)
+при уровнях INFO и DEBUG, с выводом через QueueHandler/QueueListener
+(как в приложении) и через синхронный StreamHandler.
+
+Запуск: python -m scripts.bench_logging [количество запросов]
+"""
+import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from app.service.policy_parser import PolicyChecker
+
+POLICY_COUNT = 50
+
+
+def make_policies(count: int) -> list[dict]:
+    policies = [
+        {
+            "id": i,
+            "name": f"policy-{i}",
+            "isEnabled": True,
+            "isAuditEnabled": True,
+            "resources": {"bucket": {"values": [f"bucket-{i}"], "isExcludes": False, "isRecursive": False}},
+            "policyItems": [{"users": [f"user-{i}"], "accesses": [{"type": "read", "isAllowed": True}]}],
+        }
+        for i in range(count - 1)
+    ]
+    policies.append({
+        "id": count,
+        "name": "analytics",
+        "isEnabled": True,
+        "isAuditEnabled": True,
+        "resources": {"bucket": {"values": ["analytics"], "isExcludes": False, "isRecursive": False}},
+        "policyItems": [{"groups": ["analytics"], "accesses": [{"type": "read", "isAllowed": True}]}],
+    })
+    return policies
+
+
+def configure(level: int, use_queue: bool, stream) -> QueueListener | None:
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(level)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    if not use_queue:
+        root.addHandler(handler)
+        return None
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(queue_handler)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+
+def run(name: str, count: int, level: int, use_queue: bool, policies: list[dict], stream) -> None:
+    listener = configure(level, use_queue, stream)
+    start = time.perf_counter()
+    for _ in range(count):
+        PolicyChecker.check_access(
+            policies=policies,
+            user="user1",
+            user_groups=["analytics"],
+            user_roles=["ROLE_USER"],
+            bucket="analytics",
+            object_path="dir/file.txt",
+            access_type="read",
+        )
+    elapsed = time.perf_counter() - start
+    if listener is not None:
+        listener.stop()
+    print(f"{name:<32} {count / elapsed:>10,.0f} req/s  ({elapsed * 1e6 / count:.2f} us/request)")
+
+
+def main(count: int) -> None:
+    policies = make_policies(POLICY_COUNT)
+    with open(os.devnull, "w") as stream:
+        run("INFO, queue handler", count, logging.INFO, True, policies, stream)
+        run("DEBUG, queue handler", count, logging.DEBUG, True, policies, stream)
+        run("DEBUG, sync stream handler", count, logging.DEBUG, False, policies, stream)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,48 @@
+"""
+Микробенчмарк стоимости записи метрик на горячем пути.
+
+Запуск: python -m scripts.bench_metrics [количество наблюдений]
+"""
+import sys
+import time
+
+from app.service.metrics import CACHE_REQUESTS, CHECK_DECISIONS, HistogramFamily
+
+
+def report(name: str, count: int, elapsed: float) -> None:
+    print(f"{name:<36} {elapsed * 1e9 / count:>8.1f} ns/observation")
+
+
+def main(count: int) -> None:
+    histogram = HistogramFamily("bench_seconds", "Benchmark histogram", ("stage",)).labels("total")
+    values = [(i % 1000) / 100_000 for i in range(count)]
+
+    start = time.perf_counter()
+    for value in values:
+        histogram.observe(value)
+    report("histogram.observe", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        CHECK_DECISIONS.inc(("allowed", "read"))
+    report("counter.inc (labels tuple)", count, time.perf_counter() - start)
+
+    labels = ("authorization", "hit")
+    start = time.perf_counter()
+    for _ in range(count):
+        CACHE_REQUESTS.inc(labels)
+    report("counter.inc (constant labels)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        time.perf_counter()
+    report("time.perf_counter (for scale)", count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(count):
+        pass
+    report("empty loop (baseline)", count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)